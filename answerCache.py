@@ -0,0 +1,170 @@
+from collections import OrderedDict
+import hashlib
+import os
+import threading
+import time
+import numpy as np
+from data_pipeline.embeddingCache import normalize_text
+from data_pipeline.keywordIndex import ticket_ids_in
+
+ANSWER_CACHE_THRESHOLD = float(os.getenv('ANSWER_CACHE_THRESHOLD', '0.92'))
+ANSWER_CACHE_TTL = float(os.getenv('ANSWER_CACHE_TTL', '3600'))
+ANSWER_CACHE_MAX_ENTRIES = int(os.getenv('ANSWER_CACHE_MAX_ENTRIES', '1000'))
+
+class AnswerCache:
+    """Cache of LLM answers keyed by question, matched exactly or by embedding similarity.
+
+    A lookup first tries the hash of the normalized question, then the most
+    similar cached question whose cosine similarity is at least threshold.
+    Entries expire after ttl seconds, the least recently used entry is dropped
+    past max_entries, and everything is cleared when the vector index the
+    answers were built from changes.
+
+    Questions naming ticket IDs are only matched exactly: "How was IT-1005
+    resolved?" and the same question about IT-1006 embed almost identically
+    but need different answers. The unit vectors of the other cached
+    questions live in a matrix preallocated to max_entries rows, so a
+    semantic lookup is a single matrix-vector product.
+    """
+
+    def __init__(self, threshold=ANSWER_CACHE_THRESHOLD, ttl=ANSWER_CACHE_TTL, max_entries=ANSWER_CACHE_MAX_ENTRIES):
+        self.threshold = threshold
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._matrix = None
+        self._occupied = np.zeros(max_entries, dtype=bool)
+        self._row_keys = [None] * max_entries
+        self._free_rows = list(range(max_entries - 1, -1, -1))
+        self._index_version = None
+        self._lock = threading.Lock()
+        self.stats = {
+            'exact_hits': 0,
+            'semantic_hits': 0,
+            'misses': 0,
+            'invalidations': 0,
+            'seconds_saved': 0.0,
+        }
+
+    @staticmethod
+    def _key(question):
+        return hashlib.sha256(normalize_text(question).encode('utf-8')).hexdigest()
+
+    @staticmethod
+    def _unit(vector):
+        vector = np.asarray(vector, dtype='float32').ravel()
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def _remove(self, key):
+        row = self._entries.pop(key)['row']
+        if row is not None:
+            self._occupied[row] = False
+            self._row_keys[row] = None
+            self._free_rows.append(row)
+
+    def _clear(self):
+        self._entries.clear()
+        self._occupied[:] = False
+        self._row_keys = [None] * self.max_entries
+        self._free_rows = list(range(self.max_entries - 1, -1, -1))
+
+    def _add_row(self, key, unit):
+        """Put unit in a free matrix row for key and return the row, or None if it has no vector."""
+        if unit is None or not self._free_rows:
+            return None
+        if self._matrix is None or self._matrix.shape[1] != len(unit):
+            # First vector, or a model with another dimension: earlier rows cannot be compared any more
+            self._matrix = np.zeros((self.max_entries, len(unit)), dtype='float32')
+            for entry in self._entries.values():
+                entry['row'] = None
+            self._occupied[:] = False
+            self._row_keys = [None] * self.max_entries
+            self._free_rows = list(range(self.max_entries - 1, -1, -1))
+        row = self._free_rows.pop()
+        self._matrix[row] = unit
+        self._occupied[row] = True
+        self._row_keys[row] = key
+        return row
+
+    def _check_version(self, index_version):
+        if index_version != self._index_version:
+            if self._entries:
+                self.stats['invalidations'] += 1
+            self._clear()
+            self._index_version = index_version
+
+    def _expire(self, now):
+        expired = [key for key, entry in self._entries.items() if now - entry['created'] > self.ttl]
+        for key in expired:
+            self._remove(key)
+
+    def _hit(self, key, entry, kind):
+        self._entries.move_to_end(key)
+        self.stats[f'{kind}_hits'] += 1
+        self.stats['seconds_saved'] += entry['llm_seconds']
+        return {'answer': entry['answer'], 'ticket_ids': list(entry['ticket_ids']), 'cached': kind}
+
+    def lookup(self, question, vector=None, index_version=None):
+        """Return {'answer', 'ticket_ids', 'cached'} for a cached match, or None."""
+        key = self._key(question)
+        with self._lock:
+            self._check_version(index_version)
+            self._expire(time.time())
+
+            entry = self._entries.get(key)
+            if entry is not None:
+                return self._hit(key, entry, 'exact')
+
+            if vector is not None and self._matrix is not None and self._occupied.any() and not ticket_ids_in(question):
+                scores = self._matrix @ self._unit(vector)
+                scores[~self._occupied] = -np.inf
+                best = int(np.argmax(scores))
+                if scores[best] >= self.threshold:
+                    key = self._row_keys[best]
+                    return self._hit(key, self._entries[key], 'semantic')
+
+            self.stats['misses'] += 1
+            return None
+
+    def store(self, question, vector, answer, ticket_ids, llm_seconds=0.0, index_version=None):
+        """Cache an answer. Questions naming ticket IDs, or stored without a vector, only serve exact lookups."""
+        key = self._key(question)
+        unit = self._unit(vector) if vector is not None and not ticket_ids_in(question) else None
+        with self._lock:
+            self._check_version(index_version)
+            if key in self._entries:
+                self._remove(key)
+            while len(self._entries) >= self.max_entries:
+                self._remove(next(iter(self._entries)))
+            self._entries[key] = {
+                'row': self._add_row(key, unit),
+                'answer': answer,
+                'ticket_ids': list(ticket_ids),
+                'created': time.time(),
+                'llm_seconds': llm_seconds,
+            }
+
+    def clear(self):
+        with self._lock:
+            self._clear()
+
+    def get_stats(self):
+        with self._lock:
+            stats = dict(self.stats)
+            stats['entries'] = len(self._entries)
+        hits = stats['exact_hits'] + stats['semantic_hits']
+        lookups = hits + stats['misses']
+        stats['hit_rate'] = hits / lookups if lookups else 0.0
+        return stats
+
+_answer_cache = None
+_answer_cache_lock = threading.Lock()
+
+def get_answer_cache():
+    global _answer_cache
+    if _answer_cache is None:
+        with _answer_cache_lock:
+            if _answer_cache is None:
+                _answer_cache = AnswerCache()
+    return _answer_cache
@@ -1,44 +1,326 @@
-from flask import Flask, request, jsonify, send_from_directory
+from flask import Flask, Response, g, request, jsonify, send_from_directory, stream_with_context
 from flask_cors import CORS
-from llm import query_llm
-from main import extract_ticket_ids, find_ticket_by_id
+import json
+import os
+import re
+import time
+from llm import build_context, extract_ticket_ids, query_llm, retrieve, stream_llm, ticket_ids_from
+from data_pipeline.contextAssembler import get_context_stats
+from llmGateway import get_gateway, LLMError
+from answerCache import get_answer_cache
+from data_pipeline.reranker import get_reranker
+from data_pipeline.embedding import get_retriever, VECTOR_DB_DIR
+from data_pipeline.keywordIndex import ticket_ids_in
+from data_pipeline import metrics
+from data_pipeline.metrics import debug, record_stage, stage
+from data_pipeline.ticketStore import get_ticket_store
+from triage import parse_item, parse_jsonl, triage, TRIAGE_MAX_ITEMS
+
+STATIC_MAX_AGE = int(os.getenv('STATIC_MAX_AGE', '3600'))
+# Requests carrying this header get a Server-Timing response header with their per-stage timings.
+# Streamed responses send their headers before any stage runs, so their timings are logged instead.
+TRACE_HEADER = 'X-Trace'
 
 app = Flask(__name__)
 CORS(app)
 
+_ready = False
+
+def warm_up():
+    """Load the embedding and re-ranking models, FAISS index and ticket store so the first request does not pay for them."""
+    global _ready
+    get_retriever().warm()
+    get_ticket_store().warm()
+    reranker = get_reranker()
+    if reranker is not None:
+        reranker.warm()
+    _ready = True
+
+@app.before_request
+def start_request():
+    if not request.path.startswith('/api/'):
+        return
+    g.start = time.perf_counter()
+    g.trace = metrics.start_trace() if request.headers.get(TRACE_HEADER) else None
+    g.profiler = metrics.maybe_profile()
+
+@app.after_request
+def finish_request(response):
+    start = g.pop('start', None)
+    if start is None:
+        return response
+    trace = g.pop('trace', None)
+    endpoint = request.endpoint or 'unknown'
+    if response.is_streamed:
+        # The body (SSE events, triage lines) runs after the headers are sent, so time it and
+        # end its trace once the server closes it. Server-Timing could only carry the stages
+        # finished before the headers, none for the streaming endpoints, so the trace is logged.
+        response.call_on_close(lambda: finish_stream(start, trace, endpoint))
+        return response
+    elapsed = time.perf_counter() - start
+    metrics.observe('triage_request_seconds', elapsed, endpoint=endpoint)
+    if trace is not None:
+        response.headers['Server-Timing'] = metrics.server_timing(metrics.end_trace(trace), elapsed)
+    return response
+
+def finish_stream(start, trace, endpoint):
+    elapsed = time.perf_counter() - start
+    metrics.observe('triage_request_seconds', elapsed, endpoint=endpoint)
+    if trace is not None:
+        debug(f"{endpoint} stages: {metrics.server_timing(metrics.end_trace(trace), elapsed)}")
+
+@app.teardown_request
+def cleanup_request(error=None):
+    # Runs even when the view raised, so a trace or profiler is never left running on this thread
+    trace = g.pop('trace', None)
+    if trace is not None:
+        metrics.end_trace(trace)
+    profiler = g.pop('profiler', None)
+    if profiler is not None:
+        debug(f"Saved profile to {metrics.save_profile(profiler, request.endpoint or 'request')}")
+
 @app.route('/')
 def serve_index():
-    return send_from_directory('user-interface', 'index.html')
+    # Always revalidate the page itself so a new deploy's scripts are picked up
+    return send_from_directory('user-interface', 'index.html', max_age=0)
 
 @app.route('/<path:path>')
 def serve_static(path):
-    return send_from_directory('user-interface', path)
+    return send_from_directory('user-interface', path, max_age=STATIC_MAX_AGE)
+
+@app.route('/api/ready', methods=['GET'])
+def ready():
+    """Readiness probe: 200 once warm_up has finished and an index is loaded, 503 until then."""
+    retriever = get_retriever()
+    if _ready and retriever.index is not None:
+        return jsonify({'status': 'ready'})
+    return jsonify({'status': 'starting'}), 503
 
 @app.route('/api/health', methods=['GET'])
 def health():
-    return jsonify({'status': 'ok'})
+    reranker = get_reranker()
+    return jsonify({
+        'status': 'ok',
+        'retriever': get_retriever().get_stats(),
+        'answer_cache': get_answer_cache().get_stats(),
+        'llm': get_gateway().get_stats(),
+        'reranker': reranker.get_stats() if reranker is not None else None,
+        'context': get_context_stats(),
+        'stages': metrics.get_stage_summary(),
+    })
+
+@app.route('/api/metrics', methods=['GET'])
+def prometheus_metrics():
+    """Stage and request latency histograms plus ingestion counters, in the Prometheus text format."""
+    return Response(metrics.render_prometheus(VECTOR_DB_DIR), mimetype='text/plain; version=0.0.4')
+
+def _day(value):
+    """A day number from a request: an int or a numeric string."""
+    if isinstance(value, (int, str)) and not isinstance(value, bool):
+        try:
+            return int(value)
+        except ValueError:
+            pass
+    raise ValueError(f"'days' must be a day number or [first, last], got {value!r}")
+
+def request_filters(data):
+    """Metadata filters from a question request: 'system' (name or list) and 'days' (day or [first, last]).
+
+    Raises ValueError with a message for the client when either is malformed.
+    """
+    filters = {}
+    system = data.get('system')
+    if system:
+        if not (isinstance(system, str) or isinstance(system, list) and all(isinstance(name, str) for name in system)):
+            raise ValueError("'system' must be a system name or a list of names")
+        filters['system'] = system
+    days = data.get('days')
+    if days is not None:
+        if isinstance(days, list):
+            if len(days) != 2:
+                raise ValueError("'days' range must be [first, last]")
+            first, last = _day(days[0]), _day(days[1])
+            if first > last:
+                raise ValueError(f"'days' range [{first}, {last}] is empty")
+            filters['days'] = (first, last)
+        else:
+            filters['days'] = _day(days)
+    return filters
+
+def question_vector(retriever, user_prompt, filters):
+    """Embedding of user_prompt for the answer cache's semantic match, or None when the match would not use it.
+
+    Filtered questions bypass the cache, and questions naming ticket IDs are
+    only matched exactly and answered by the ticket-ID fast path, so neither
+    is embedded here.
+    """
+    if filters or ticket_ids_in(user_prompt):
+        return None
+    return retriever.encode([user_prompt])[0]
+
+def lookup_answer(cache, user_prompt, vector, index_version, filters):
+    """Answer cache lookup, skipped for filtered questions, counted by result in /api/metrics."""
+    if filters:
+        return None
+    with stage('cache_lookup'):
+        cached = cache.lookup(user_prompt, vector, index_version)
+    metrics.increment('triage_answer_cache_total', result=cached['cached'] if cached is not None else 'miss')
+    return cached
+
+def answer_question(user_prompt, filters=None):
+    """Return (answer, ticket_ids), from the answer cache when a close enough question was already answered.
+
+    Ticket IDs come from the retrieved chunks' metadata when they have it,
+    otherwise from the ticket numbers cited in the answer. Filtered questions
+    bypass the cache, since its entries are not keyed by filter.
+    """
+    filters = filters or {}
+    retriever = get_retriever()
+    cache = get_answer_cache()
+    retriever.refresh()
+    vector = question_vector(retriever, user_prompt, filters)
+
+    cached = lookup_answer(cache, user_prompt, vector, retriever.index_version, filters)
+    if cached is not None:
+        debug(f"Answer cache hit ({cached['cached']})")
+        return cached['answer'], cached['ticket_ids']
+
+    records = retrieve(user_prompt, **filters)
+    relevant_chunks = build_context(records)
+    start = time.perf_counter()
+    response = query_llm(user_prompt, relevant_chunks)
+    llm_seconds = time.perf_counter() - start
+    debug(f"LLM response: {response}")
+
+    with stage('ticket_extract'):
+        cleaned_response, cited_ids = extract_ticket_ids(response)
+    ticket_ids = ticket_ids_from(records) or cited_ids
+    # An empty answer would be served to every similar question until the entry expired
+    if not filters and cleaned_response.strip():
+        cache.store(user_prompt, vector, cleaned_response, ticket_ids, llm_seconds, retriever.index_version)
+    return cleaned_response, ticket_ids
 
 @app.route('/api/question', methods=['POST'])
 def ask_question():
     data = request.get_json()
     user_prompt = data.get('question', '')
-    print(f"Received question: {user_prompt}")
+    debug(f"Received question: {user_prompt}")
+    try:
+        filters = request_filters(data)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
 
-    response = query_llm(user_prompt)
-    print(f"LLM response: {response}")
+    try:
+        cleaned_response, ticket_ids = answer_question(user_prompt, filters)
+    except LLMError as e:
+        return jsonify({'error': str(e)}), 503
 
-    cleaned_response, ticket_ids = extract_ticket_ids(response)
-
-    tickets = []
-    for ticket_id in ticket_ids:
-        ticket = find_ticket_by_id(ticket_id)
-        if ticket:
-            tickets.append(ticket)
+    with stage('ticket_lookup'):
+        tickets = get_ticket_store().get_many(ticket_ids)
 
     return jsonify({
         'answer': cleaned_response,
         'tickets': tickets
     })
 
+def sse_event(event, data):
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+@app.route('/api/question/stream', methods=['POST'])
+def ask_question_stream():
+    """Server-Sent Events version of /api/question.
+
+    Sends a 'tickets' event with the tickets behind the retrieved chunks as
+    soon as retrieval finishes, 'token' events as the LLM produces text, and
+    a final 'done' event with the cleaned answer and its tickets.
+    Failures are reported as an 'error' event.
+    """
+    data = request.get_json()
+    user_prompt = data.get('question', '')
+    try:
+        filters = request_filters(data)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    debug(f"Received streaming question: {user_prompt}")
+
+    def events():
+        retriever = get_retriever()
+        cache = get_answer_cache()
+        retriever.refresh()
+        vector = question_vector(retriever, user_prompt, filters)
+
+        cached = lookup_answer(cache, user_prompt, vector, retriever.index_version, filters)
+        if cached is not None:
+            with stage('ticket_lookup'):
+                tickets = get_ticket_store().get_many(cached['ticket_ids'])
+            yield sse_event('tickets', {'tickets': tickets})
+            yield sse_event('token', {'text': cached['answer']})
+            yield sse_event('done', {'answer': cached['answer'], 'tickets': tickets})
+            return
+
+        records = retrieve(user_prompt, **filters)
+        relevant_chunks = build_context(records)
+        retrieved_ids = ticket_ids_from(records) or list(dict.fromkeys(re.findall(r'IT-\d+', "\n".join(relevant_chunks))))[:3]
+        with stage('ticket_lookup'):
+            tickets = get_ticket_store().get_many(retrieved_ids)
+        yield sse_event('tickets', {'tickets': tickets})
+
+        start = time.perf_counter()
+        pieces = []
+        try:
+            for text in stream_llm(user_prompt, relevant_chunks):
+                pieces.append(text)
+                yield sse_event('token', {'text': text})
+        except LLMError as e:
+            yield sse_event('error', {'error': str(e)})
+            return
+        llm_seconds = time.perf_counter() - start
+        record_stage('llm', llm_seconds)
+
+        with stage('ticket_extract'):
+            cleaned_response, cited_ids = extract_ticket_ids("".join(pieces))
+        ticket_ids = ticket_ids_from(records) or cited_ids
+        if not filters and cleaned_response.strip():
+            cache.store(user_prompt, vector, cleaned_response, ticket_ids, llm_seconds, retriever.index_version)
+        with stage('ticket_lookup'):
+            tickets = get_ticket_store().get_many(ticket_ids)
+        yield sse_event('done', {'answer': cleaned_response, 'tickets': tickets})
+
+    return Response(stream_with_context(events()), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+@app.route('/api/triage/batch', methods=['POST'])
+def triage_batch():
+    """Answer many questions in one request, streaming one JSON line per question as it finishes.
+
+    Takes a JSON list of questions or ticket objects, {"questions": [...]},
+    or a JSONL body. The last line is {"summary": {...}} with counts and
+    throughput. Results arrive in completion order; match them up by 'id'.
+    """
+    try:
+        if request.is_json:
+            data = request.get_json()
+            questions = data.get('questions') if isinstance(data, dict) else data
+            if not isinstance(questions, list):
+                raise ValueError("'questions' must be a list")
+            items = [parse_item(item, position) for position, item in enumerate(questions)]
+        else:
+            items = parse_jsonl(request.get_data(as_text=True).splitlines())
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    if len(items) > TRIAGE_MAX_ITEMS:
+        return jsonify({'error': f"At most {TRIAGE_MAX_ITEMS} questions per batch"}), 413
+    debug(f"Received triage batch of {len(items)} questions")
+
+    def lines():
+        stats = {}
+        for result in triage(items, stats=stats):
+            yield json.dumps(result) + "\n"
+        yield json.dumps({'summary': stats}) + "\n"
+
+    return Response(stream_with_context(lines()), mimetype='application/x-ndjson',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
 if __name__ == '__main__':
+    warm_up()
     app.run(debug=True, port=5000)
\ No newline at end of file
@@ -0,0 +1,95 @@
+# Recall@k, latency and memory of each index type against the exact flat index.
+# Uses clustered random vectors shaped like MiniLM embeddings (384 dimensions).
+#
+# python -m benchmarks.ann_index --sizes 10000 100000 1000000 --types flat ivf_flat ivf_pq hnsw
+
+import argparse
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from data_pipeline.indexFactory import build_index, index_memory_bytes, set_search_params, INDEX_TYPES
+
+def synthetic_corpus(count, dimension, clusters, seed=0):
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(clusters, dimension)).astype('float32')
+    assignments = rng.integers(0, clusters, size=count)
+    vectors = centers[assignments] + 0.3 * rng.normal(size=(count, dimension)).astype('float32')
+    return vectors.astype('float32')
+
+def synthetic_queries(vectors, count, seed=1):
+    rng = np.random.default_rng(seed)
+    picks = vectors[rng.integers(0, len(vectors), size=count)]
+    return (picks + 0.1 * rng.normal(size=picks.shape)).astype('float32')
+
+def measure(index, queries, top_k):
+    latencies = []
+    results = []
+    for query in queries:
+        start = time.perf_counter()
+        _, ids = index.search(query.reshape(1, -1), top_k)
+        latencies.append(time.perf_counter() - start)
+        results.append(ids[0])
+    return np.array(results), np.array(latencies) * 1000
+
+def recall_at_k(results, truth):
+    hits = [len(set(r.tolist()) & set(t.tolist())) for r, t in zip(results, truth)]
+    return float(np.mean(hits)) / truth.shape[1]
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10000, 100000])
+    parser.add_argument("--types", nargs="+", default=list(INDEX_TYPES), choices=INDEX_TYPES)
+    parser.add_argument("--dimension", type=int, default=384)
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--top-k", type=int, default=10)
+    parser.add_argument("--nprobe", type=int, nargs="+", default=[8, 32])
+    parser.add_argument("--ef-search", type=int, nargs="+", default=[32, 128])
+    args = parser.parse_args()
+
+    print(f"{'vectors':>9} {'index':<9} {'param':<12} {'build s':>8} {'recall@k':>9} "
+          f"{'p50 ms':>8} {'p99 ms':>8} {'memory MB':>10}")
+
+    for size in args.sizes:
+        vectors = synthetic_corpus(size, args.dimension, clusters=max(10, size // 1000))
+        queries = synthetic_queries(vectors, args.queries)
+        ids = np.arange(size, dtype='int64')
+        truth = None
+
+        for index_type in ['flat'] + [t for t in args.types if t != 'flat']:
+            start = time.perf_counter()
+            index = build_index(vectors, index_type)
+            index.add_with_ids(vectors, ids)
+            build_seconds = time.perf_counter() - start
+            memory_mb = index_memory_bytes(index) / 2 ** 20
+
+            if index_type == 'ivf_flat' or index_type == 'ivf_pq':
+                settings = [('nprobe', value) for value in args.nprobe]
+            elif index_type == 'hnsw':
+                settings = [('efSearch', value) for value in args.ef_search]
+            else:
+                settings = [('', None)]
+
+            for name, value in settings:
+                if name == 'nprobe':
+                    set_search_params(index, nprobe=value)
+                elif name == 'efSearch':
+                    set_search_params(index, ef_search=value)
+
+                results, latencies = measure(index, queries, args.top_k)
+                if truth is None:
+                    truth = results
+                if index_type == 'flat' and 'flat' not in args.types:
+                    continue
+
+                param = f"{name}={value}" if name else "exact"
+                print(f"{size:>9} {index_type:<9} {param:<12} {build_seconds:>8.2f} "
+                      f"{recall_at_k(results, truth):>9.3f} {np.percentile(latencies, 50):>8.3f} "
+                      f"{np.percentile(latencies, 99):>8.3f} {memory_mb:>10.1f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,133 @@
+# Check the streaming chunker against split_document and time it on synthetic multi-megabyte documents.
+#
+# The golden check runs first and exits non-zero on any difference:
+#   - iter_chunk_spans gives the same chunks as split_document, whether the text
+#     arrives line by line, in random pieces or in one piece,
+#   - every (start, end) span covers exactly the words of its chunk,
+#   - chunk_documents writes the same chunks to the store.
+# Then each document size is chunked line by line and as one piece, by characters and by tokens.
+# The golden cases also run under pytest as tests/test_text_chunking.py.
+#
+# python -m benchmarks.chunking --sizes-mb 1 4 16 --max-chunk-size 2000 --overlap 200
+
+import argparse
+import random
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from data_pipeline.chunkStore import ChunkStore
+from data_pipeline.textChunking import chunk_documents, iter_chunk_spans, split_document
+
+WORDS = ("vpn client password reset token outlook profile printer spooler driver sharepoint access denied "
+         "laptop wifi dhcp lease dns cache policy sync mfa user device network error 0x80070005 IT-48213").split()
+
+def synthetic_text(rng, size):
+    """Cleaned-PDF-like text of about size characters: sentences of varied length, short lines, no blank lines.
+
+    A few sentences run to thousands of words without punctuation, as table
+    dumps do, so the word-level fallback is exercised too.
+    """
+    parts = []
+    total = 0
+    while total < size:
+        if rng.random() < 0.002:
+            count = rng.randint(500, 3000)
+        else:
+            count = rng.randint(3, 40)
+        sentence = " ".join(rng.choice(WORDS) for _ in range(count)) + rng.choice(".!?")
+        parts.append(sentence)
+        parts.append(rng.choice([" ", " ", "  ", "\n", " \n"]))
+        total += len(sentence) + 1
+    return "".join(parts)
+
+def random_pieces(rng, text):
+    pieces = []
+    i = 0
+    while i < len(text):
+        j = i + rng.randint(1, 500)
+        pieces.append(text[i:j])
+        i = j
+    return pieces
+
+def check_spans(text, spans):
+    stripped = text.strip()
+    for chunk, start, end in spans:
+        if stripped[start:end].split() != chunk.split():
+            return False
+    return True
+
+def golden(trials, seed=0):
+    rng = random.Random(seed)
+    failures = 0
+    for trial in range(trials):
+        text = synthetic_text(rng, rng.choice([100, 3000, 50_000, 300_000]))
+        max_size = rng.choice([80, 500, 2000, 4000])
+        overlap = rng.choice([0, 50, 200])
+        expected = split_document(text.strip(), max_size, overlap)
+        for name, pieces in (("lines", text.splitlines(keepends=True)),
+                             ("random pieces", random_pieces(rng, text)),
+                             ("one piece", [text])):
+            spans = list(iter_chunk_spans(pieces, max_size, overlap))
+            if [chunk for chunk, _, _ in spans] != expected:
+                print(f"trial {trial}: {name} chunks differ from split_document (max {max_size}, overlap {overlap})")
+                failures += 1
+            elif not check_spans(text, spans):
+                print(f"trial {trial}: {name} spans do not match their chunks")
+                failures += 1
+
+    # chunk_documents end to end, through extracted_text.txt and the chunk store
+    documents = [synthetic_text(rng, rng.choice([500, 20_000, 200_000])) for _ in range(5)]
+    with tempfile.TemporaryDirectory() as workdir:
+        input_file = Path(workdir) / "extracted_text.txt"
+        with open(input_file, 'w', encoding='utf-8') as f:
+            for i, document in enumerate(documents):
+                f.write(f"DOCUMENT: doc_{i}.pdf\n{document}\n")
+        chunk_documents(input_file, Path(workdir) / "chunks", 2000, 200)
+        store = ChunkStore(Path(workdir) / "chunks")
+        written = {}
+        for record in store.iter_records():
+            written.setdefault(record['source'], []).append(record['text'])
+        store.close()
+    for i, document in enumerate(documents):
+        if written.get(f"doc_{i}.pdf") != split_document(document.strip(), 2000, 200):
+            print(f"chunk_documents: doc_{i}.pdf differs from split_document")
+            failures += 1
+    return failures
+
+def timed(pieces, max_size, overlap, sizing):
+    start = time.perf_counter()
+    chunks = sum(1 for _ in iter_chunk_spans(pieces, max_size, overlap, sizing))
+    return chunks, time.perf_counter() - start
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes-mb", type=float, nargs="+", default=[1, 4, 16])
+    parser.add_argument("--max-chunk-size", type=int, default=2000)
+    parser.add_argument("--overlap", type=int, default=200)
+    parser.add_argument("--max-tokens", type=int, default=500, help="max_chunk_size for token sizing")
+    parser.add_argument("--golden-trials", type=int, default=40)
+    args = parser.parse_args()
+
+    failures = golden(args.golden_trials)
+    if failures:
+        print(f"Golden check FAILED: {failures} mismatches")
+        sys.exit(1)
+    print(f"Golden check passed ({args.golden_trials} trials)\n")
+
+    rng = random.Random(1)
+    print(f"{'MB':>6} {'sizing':>7} {'input':>10} {'chunks':>7} {'seconds':>8} {'MB/s':>7}")
+    for size_mb in args.sizes_mb:
+        text = synthetic_text(rng, int(size_mb * (1 << 20)))
+        megabytes = len(text) / (1 << 20)
+        for sizing, max_size, overlap in (("chars", args.max_chunk_size, args.overlap),
+                                          ("tokens", args.max_tokens, args.overlap // 4)):
+            for name, pieces in (("lines", text.splitlines(keepends=True)), ("one piece", [text])):
+                chunks, seconds = timed(pieces, max_size, overlap, sizing)
+                print(f"{megabytes:>6.1f} {sizing:>7} {name:>10} {chunks:>7} {seconds:>8.2f} {megabytes / seconds:>7.1f}")
+
+if __name__ == "__main__":
+    main()
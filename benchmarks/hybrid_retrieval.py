@@ -0,0 +1,88 @@
+# Compare vector-only retrieval against hybrid BM25 + vector retrieval.
+# Requires a built index (run option 1 in main.py first).
+#
+# Queries are drawn from the indexed chunks themselves: keyword queries take a
+# few words from a chunk, ticket queries name an IT-<n> ID the chunk mentions.
+# A query is a hit when its source chunk (or, for ticket queries, any chunk
+# mentioning the ID) is in the top k.
+#
+# python -m benchmarks.hybrid_retrieval --queries 300 --top-k 3
+
+import argparse
+import random
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from data_pipeline.embedding import get_retriever
+from data_pipeline.keywordIndex import ticket_ids_in, tokenize
+
+def make_queries(records, count, words, seed=0):
+    rng = random.Random(seed)
+    mentions = {}
+    for record in records:
+        for ticket_id in ticket_ids_in(record['text']):
+            mentions.setdefault(ticket_id, set()).add(record['id'])
+
+    queries = []
+    for _ in range(count):
+        record = rng.choice(records)
+        ticket_ids = ticket_ids_in(record['text'])
+        if ticket_ids and rng.random() < 0.3:
+            ticket_id = rng.choice(ticket_ids)
+            queries.append(('ticket', f"What was the resolution for {ticket_id}?", mentions[ticket_id]))
+            continue
+        tokens = [t for t in tokenize(record['text']) if not t.startswith('it-')]
+        if not tokens:
+            continue
+        picked = rng.sample(tokens, min(words, len(tokens)))
+        queries.append(('keyword', " ".join(picked), {record['id']}))
+    return queries
+
+def evaluate(retriever, queries, top_k, mode):
+    latencies = []
+    hits = {}
+    reciprocal_ranks = []
+    for kind, query, relevant in queries:
+        start = time.perf_counter()
+        records = retriever.search_batch_records([query], top_k, mode=mode)[0]
+        latencies.append((time.perf_counter() - start) * 1000)
+        ranks = [rank for rank, record in enumerate(records, 1) if record['id'] in relevant]
+        hits.setdefault(kind, []).append(bool(ranks))
+        reciprocal_ranks.append(1 / ranks[0] if ranks else 0.0)
+    return hits, np.array(latencies), float(np.mean(reciprocal_ranks))
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--queries", type=int, default=300)
+    parser.add_argument("--top-k", type=int, default=3)
+    parser.add_argument("--words", type=int, default=5, help="words per keyword query")
+    args = parser.parse_args()
+
+    retriever = get_retriever()
+    if not retriever.warm():
+        print("No index found. Run option 1 in main.py first.")
+        sys.exit(1)
+    if retriever.keyword_index is None:
+        print("No keyword index found. Re-run ingestion to build it.")
+        sys.exit(1)
+
+    records = list(retriever.chunk_store.iter_records())
+    queries = make_queries(records, args.queries, args.words)
+    retriever.search(queries[0][1], args.top_k)
+
+    print(f"{len(queries)} queries over {len(records)} chunks, top {args.top_k}")
+    print(f"{'mode':<8} {'hit@k':>7} {'keyword':>8} {'ticket':>7} {'MRR':>6} {'p50 ms':>8} {'p95 ms':>8}")
+    for mode in ('vector', 'hybrid'):
+        hits, latencies, mrr = evaluate(retriever, queries, args.top_k, mode)
+        overall = np.mean([hit for kind in hits for hit in hits[kind]])
+        by_kind = {kind: np.mean(values) for kind, values in hits.items()}
+        print(f"{mode:<8} {overall:>7.3f} {by_kind.get('keyword', 0):>8.3f} {by_kind.get('ticket', 0):>7.3f} "
+              f"{mrr:>6.3f} {np.percentile(latencies, 50):>8.2f} {np.percentile(latencies, 95):>8.2f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,309 @@
+# End-to-end load test of /api/question with no model download and no Gemini calls.
+#
+# Builds a synthetic ticket export in the format generate_test_content/prepareTickets.py
+# writes and ingests it one chunk per ticket. Then it starts the app with the hash
+# embedder (EMBED_BACKEND=hash) and the fake LLM (LLM_BACKEND=fake), and drives
+# /api/question at each concurrency level. For each level it reports throughput,
+# p50/p95/p99 latency and the peak RSS of every server process. Everything runs
+# in a temporary directory.
+#
+# Results are written as JSON. Pass --baseline with an earlier result file to
+# print the change per level.
+#
+# python -m benchmarks.load_test --tickets 5000 --concurrency 1 4 16 --requests 200 --llm-latency 0.5
+# python -m benchmarks.load_test --server gunicorn --workers 4 --output load_test_results/after.json --baseline load_test_results/before.json
+
+import argparse
+import http.client
+import json
+import os
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from contextlib import redirect_stdout
+from io import StringIO
+from pathlib import Path
+
+import numpy as np
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from benchmarks.pdf_extraction import synthetic_tickets
+from generate_test_content.prepareTickets import create_json_export
+
+FLASK_SERVER = "import app; app.warm_up(); app.app.run(host='127.0.0.1', port={port}, threaded=True)"
+
+def build_corpus(workdir, tickets, per_day, seed=0):
+    rng = random.Random(seed)
+    days = max(1, tickets // per_day)
+    tickets_by_day = {day: synthetic_tickets(rng, day, per_day) for day in range(1, days + 1)}
+    bucket = workdir / "document_bucket"
+    bucket.mkdir(parents=True, exist_ok=True)
+    with redirect_stdout(StringIO()):
+        create_json_export(tickets_by_day, str(bucket))
+    return [ticket for day in tickets_by_day.values() for ticket in day]
+
+def make_questions(tickets, count, seed=0):
+    """Questions built from ticket issues plus a random suffix, so no two are identical."""
+    rng = random.Random(seed)
+    questions = []
+    for i in range(count):
+        ticket = rng.choice(tickets)
+        issue = rng.choice(ticket['issue'].split(". ")).rstrip(".")
+        questions.append(f"{ticket['system']}: {issue}? (case {i})")
+    return questions
+
+def server_env(args, workdir):
+    env = dict(os.environ)
+    env.update({
+        'PYTHONPATH': str(ROOT),
+        'EMBED_BACKEND': 'hash',
+        'LLM_BACKEND': 'fake',
+        'FAKE_LLM_LATENCY': str(args.llm_latency),
+        'FAKE_LLM_TOKENS_PER_SECOND': str(args.llm_tokens_per_second),
+        'RERANK': '0',
+        'DEBUG_PRINTS': '0',
+        'EMBED_CACHE_PATH': str(workdir / "embedding_cache" / "embeddings.sqlite"),
+    })
+    if not args.answer_cache:
+        env['ANSWER_CACHE_TTL'] = '0'
+    return env
+
+def ingest(workdir, env):
+    subprocess.run([sys.executable, '-c', "from data_pipeline.ticketChunking import ingest_tickets; ingest_tickets()"],
+                   cwd=workdir, env=env, check=True, stdout=subprocess.DEVNULL)
+
+def start_server(args, workdir, env):
+    if args.server == 'gunicorn':
+        env = dict(env, SERVE_BIND=f"127.0.0.1:{args.port}", SERVE_WORKERS=str(args.workers),
+                   SERVE_THREADS=str(args.threads))
+        command = [sys.executable, str(ROOT / "serve.py")]
+    else:
+        command = [sys.executable, '-c', FLASK_SERVER.format(port=args.port)]
+    log = open(workdir / "server.log", 'w')
+    process = subprocess.Popen(command, cwd=workdir, env=env, stdout=log, stderr=subprocess.STDOUT)
+
+    deadline = time.monotonic() + args.startup_timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"Server exited during startup, see {workdir / 'server.log'}")
+        try:
+            status, _ = request(args.port, 'GET', '/api/ready')
+            if status == 200:
+                return process
+        except OSError:
+            pass
+        time.sleep(0.2)
+    process.terminate()
+    raise RuntimeError(f"Server not ready after {args.startup_timeout}s")
+
+def request(port, method, path, body=None, connection=None):
+    conn = connection or http.client.HTTPConnection('127.0.0.1', port, timeout=120)
+    try:
+        headers = {'Content-Type': 'application/json'} if body is not None else {}
+        conn.request(method, path, body=json.dumps(body) if body is not None else None, headers=headers)
+        response = conn.getresponse()
+        return response.status, response.read()
+    finally:
+        if connection is None:
+            conn.close()
+
+def process_tree(pid):
+    """pid and all its descendants, read from /proc."""
+    pids = [pid]
+    for current in pids:
+        try:
+            with open(f"/proc/{current}/task/{current}/children") as f:
+                pids.extend(int(child) for child in f.read().split())
+        except OSError:
+            pass
+    return pids
+
+def rss_mb(pid):
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith('VmRSS:'):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return None
+
+class RSSSampler(threading.Thread):
+    """Record the peak RSS of every process in the server's tree while a level runs."""
+
+    def __init__(self, pid, interval=0.2):
+        super().__init__(daemon=True)
+        self.pid = pid
+        self.interval = interval
+        self.peak = {}
+        self._stop_event = threading.Event()
+
+    def sample(self):
+        for pid in process_tree(self.pid):
+            rss = rss_mb(pid)
+            if rss is not None:
+                self.peak[pid] = max(self.peak.get(pid, 0.0), rss)
+
+    def run(self):
+        while not self._stop_event.wait(self.interval):
+            self.sample()
+
+    def stop(self):
+        self._stop_event.set()
+        self.join()
+        self.sample()
+        return self.peak
+
+def run_level(port, questions, concurrency):
+    """Send every question, concurrency at a time over keep-alive connections. Returns (latencies, errors, seconds)."""
+    latencies = []
+    errors = []
+    lock = threading.Lock()
+    pending = iter(questions)
+
+    def worker():
+        connection = http.client.HTTPConnection('127.0.0.1', port, timeout=120)
+        while True:
+            with lock:
+                question = next(pending, None)
+            if question is None:
+                break
+            start = time.perf_counter()
+            try:
+                status, _ = request(port, 'POST', '/api/question', {'question': question}, connection)
+            except (OSError, http.client.HTTPException) as e:
+                status = type(e).__name__
+                connection.close()
+                connection = http.client.HTTPConnection('127.0.0.1', port, timeout=120)
+            elapsed = time.perf_counter() - start
+            with lock:
+                if status == 200:
+                    latencies.append(elapsed)
+                else:
+                    errors.append(status)
+        connection.close()
+
+    threads = [threading.Thread(target=worker) for _ in range(concurrency)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return latencies, errors, time.perf_counter() - start
+
+def summarize(concurrency, latencies, errors, seconds, peak_rss):
+    latencies_ms = np.array(latencies) * 1000
+    percentile = lambda q: float(np.percentile(latencies_ms, q)) if len(latencies_ms) else None
+    return {
+        'concurrency': concurrency,
+        'requests': len(latencies) + len(errors),
+        'errors': len(errors),
+        'error_kinds': sorted({str(error) for error in errors}),
+        'seconds': seconds,
+        'throughput_rps': len(latencies) / seconds if seconds else 0.0,
+        'p50_ms': percentile(50),
+        'p95_ms': percentile(95),
+        'p99_ms': percentile(99),
+        'rss_mb': {str(pid): round(rss, 1) for pid, rss in sorted(peak_rss.items())},
+    }
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT, capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def compare(levels, baseline_path):
+    with open(baseline_path, 'r', encoding='utf-8') as f:
+        baseline = {level['concurrency']: level for level in json.load(f)['levels']}
+    print(f"\nAgainst {baseline_path}:")
+    for level in levels:
+        before = baseline.get(level['concurrency'])
+        if before is None:
+            continue
+        change = lambda key: (f"{(level[key] / before[key] - 1) * 100:+.1f}%"
+                              if level[key] is not None and before[key] else "n/a")
+        print(f"  concurrency {level['concurrency']:>3}: throughput {change('throughput_rps')}, "
+              f"p50 {change('p50_ms')}, p95 {change('p95_ms')}, p99 {change('p99_ms')}")
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--tickets", type=int, default=5000)
+    parser.add_argument("--tickets-per-day", type=int, default=50)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 16])
+    parser.add_argument("--requests", type=int, default=200, help="requests per concurrency level")
+    parser.add_argument("--llm-latency", type=float, default=0.5)
+    parser.add_argument("--llm-tokens-per-second", type=float, default=0)
+    parser.add_argument("--answer-cache", action="store_true", help="Leave the answer cache on")
+    parser.add_argument("--server", choices=("flask", "gunicorn"), default="flask")
+    parser.add_argument("--workers", type=int, default=2, help="gunicorn workers")
+    parser.add_argument("--threads", type=int, default=8, help="gunicorn threads per worker")
+    parser.add_argument("--port", type=int, default=5057)
+    parser.add_argument("--startup-timeout", type=float, default=120)
+    parser.add_argument("--output", default=None, help="Result JSON (default load_test_results/<timestamp>.json)")
+    parser.add_argument("--baseline", default=None, help="Earlier result JSON to compare against")
+    parser.add_argument("--keep", action="store_true", help="Keep the working directory")
+    args = parser.parse_args()
+
+    workdir = Path(tempfile.mkdtemp(prefix="triage_load_test_"))
+    process = None
+    try:
+        tickets = build_corpus(workdir, args.tickets, args.tickets_per_day)
+        env = server_env(args, workdir)
+        start = time.perf_counter()
+        ingest(workdir, env)
+        print(f"Ingested {len(tickets)} tickets in {time.perf_counter() - start:.1f}s")
+
+        start = time.perf_counter()
+        process = start_server(args, workdir, env)
+        print(f"{args.server} server ready in {time.perf_counter() - start:.1f}s")
+
+        levels = []
+        print(f"{'conc':>5} {'reqs':>6} {'errors':>6} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}  RSS MB per process")
+        for level, concurrency in enumerate(args.concurrency):
+            questions = make_questions(tickets, args.requests, seed=level)
+            sampler = RSSSampler(process.pid)
+            sampler.start()
+            latencies, errors, seconds = run_level(args.port, questions, concurrency)
+            result = summarize(concurrency, latencies, errors, seconds, sampler.stop())
+            levels.append(result)
+            fmt = lambda value: f"{value:>8.1f}" if value is not None else f"{'-':>8}"
+            print(f"{concurrency:>5} {result['requests']:>6} {result['errors']:>6} {result['throughput_rps']:>8.2f} "
+                  f"{fmt(result['p50_ms'])} {fmt(result['p95_ms'])} {fmt(result['p99_ms'])}  "
+                  f"{' '.join(f'{rss:.0f}' for rss in result['rss_mb'].values())}")
+    finally:
+        if process is not None:
+            process.terminate()
+            try:
+                process.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                process.kill()
+        if args.keep:
+            print(f"Working directory kept at {workdir}")
+        else:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    results = {
+        'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'commit': git_commit(),
+        'config': {key: value for key, value in vars(args).items() if key not in ('output', 'baseline', 'keep')},
+        'levels': levels,
+    }
+    output = Path(args.output or f"load_test_results/{time.strftime('%Y%m%d-%H%M%S')}.json")
+    output.parent.mkdir(parents=True, exist_ok=True)
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(results, f, indent=2)
+    print(f"Saved results to {output}")
+
+    if args.baseline:
+        compare(levels, args.baseline)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+# Time sequential vs process-pool PDF extraction on a synthetic ticket bucket.
+# Builds the PDFs with the same layout as generate_test_content/prepareTickets.py.
+#
+# python -m benchmarks.pdf_extraction --files 2000 --workers 1 4 8
+
+import argparse
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from data_pipeline.readPDF import extract_bucket
+from generate_test_content.prepareTickets import create_pdf_for_day
+
+SYSTEMS = ["VPN", "Outlook", "Active Directory", "SharePoint", "Printer", "Wi-Fi", "Teams", "Laptop"]
+ISSUES = [
+    "User cannot connect after the latest client update.",
+    "Application crashes on launch with an unknown error.",
+    "Password reset email never arrives.",
+    "Device shows offline even though the network is up.",
+    "Access denied when opening the shared folder.",
+]
+RESOLUTIONS = [
+    "Reinstalled the client and cleared cached credentials.",
+    "Reset the user's MFA registration and re-enrolled the device.",
+    "Updated the driver and restarted the print spooler service.",
+    "Re-added the user to the security group and forced a policy sync.",
+    "Renewed the DHCP lease and flushed the DNS cache.",
+]
+
+def synthetic_tickets(rng, day, count):
+    return [
+        {
+            'id': f"IT-{day * 1000 + i}",
+            'system': rng.choice(SYSTEMS),
+            'issue': " ".join(rng.choice(ISSUES) for _ in range(rng.randint(1, 3))),
+            'resolution': " ".join(rng.choice(RESOLUTIONS) for _ in range(rng.randint(1, 3))),
+        }
+        for i in range(count)
+    ]
+
+def build_bucket(directory, files, tickets_per_file):
+    rng = random.Random(0)
+    for day in range(1, files + 1):
+        create_pdf_for_day(day, synthetic_tickets(rng, day, tickets_per_file), str(directory))
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--files", type=int, default=2000)
+    parser.add_argument("--tickets-per-file", type=int, default=6)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, os.cpu_count() or 1])
+    parser.add_argument("--keep", action="store_true", help="Keep the generated bucket")
+    args = parser.parse_args()
+
+    workdir = Path(tempfile.mkdtemp(prefix="triage_pdf_bench_"))
+    bucket = workdir / "document_bucket"
+    bucket.mkdir()
+
+    print(f"Generating {args.files} PDFs in {bucket} ...")
+    build_bucket(bucket, args.files, args.tickets_per_file)
+
+    baseline = None
+    for workers in args.workers:
+        output_dir = workdir / f"raw_text_{workers}"
+        start = time.perf_counter()
+        processed, failed = extract_bucket(bucket, output_dir, workers)
+        elapsed = time.perf_counter() - start
+
+        text = (output_dir / "extracted_text.txt").read_text(encoding='utf-8')
+        if baseline is None:
+            baseline = text
+        identical = "identical" if text == baseline else "DIFFERENT"
+        print(f"workers={workers:<3} {processed} files in {elapsed:.2f}s  "
+              f"({processed / elapsed:,.1f} files/sec, {len(failed)} failed, output {identical})")
+
+    if args.keep:
+        print(f"Bucket kept at {workdir}")
+    else:
+        shutil.rmtree(workdir)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+# Cost and benefit of cross-encoder re-ranking at several candidate depths.
+# Requires a built index (run option 1 in main.py first).
+#
+# Queries come from the indexed chunks as in benchmarks.hybrid_retrieval. For each
+# depth, reports hit@k of the first-stage retriever and after re-ranking,
+# re-rank milliseconds per query, and the tokens of the assembled context.
+#
+# python -m benchmarks.rerank_cost --queries 200 --depths 10 20 50 --top-k 3
+
+import argparse
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from benchmarks.hybrid_retrieval import make_queries
+from data_pipeline.embedding import get_retriever
+from data_pipeline.contextAssembler import assemble_context, estimate_tokens, CONTEXT_TOKEN_BUDGET
+from data_pipeline.reranker import Reranker
+
+def hit(records, relevant, top_k):
+    return any(record['id'] in relevant for record in records[:top_k])
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--depths", type=int, nargs="+", default=[10, 20, 50])
+    parser.add_argument("--top-k", type=int, default=3)
+    parser.add_argument("--budget", type=int, default=CONTEXT_TOKEN_BUDGET)
+    args = parser.parse_args()
+
+    retriever = get_retriever()
+    if not retriever.warm():
+        print("No index found. Run option 1 in main.py first.")
+        sys.exit(1)
+
+    records = list(retriever.chunk_store.iter_records())
+    queries = make_queries(records, args.queries, words=5)
+    reranker = Reranker()
+    reranker.warm()
+
+    baseline = [retriever.search_records(query, args.top_k) for _, query, _ in queries]
+    baseline_hits = np.mean([hit(found, relevant, args.top_k) for found, (_, _, relevant) in zip(baseline, queries)])
+    baseline_tokens = np.mean([sum(estimate_tokens(r['text']) for r in found) for found in baseline])
+    print(f"{len(queries)} queries over {len(records)} chunks, top {args.top_k}, budget {args.budget} tokens")
+    print(f"{'depth':>6} {'first hit@k':>12} {'rerank hit@k':>13} {'rerank ms/q':>12} {'p95 ms':>8} {'passages':>9} {'tokens':>7}")
+    print(f"{'none':>6} {baseline_hits:>12.3f} {'-':>13} {'-':>12} {'-':>8} {args.top_k:>9} {baseline_tokens:>7.0f}")
+
+    for depth in args.depths:
+        first_hits = []
+        reranked_hits = []
+        latencies = []
+        passages = []
+        tokens = []
+        for _, query, relevant in queries:
+            candidates = retriever.search_records(query, depth)
+            first_hits.append(hit(candidates, relevant, args.top_k))
+            start = time.perf_counter()
+            ranked = reranker.rerank(query, candidates)
+            latencies.append((time.perf_counter() - start) * 1000)
+            reranked_hits.append(hit(ranked, relevant, args.top_k))
+            packed, stats = assemble_context(ranked, args.budget)
+            passages.append(len(packed))
+            tokens.append(stats['context_tokens'])
+        print(f"{depth:>6} {np.mean(first_hits):>12.3f} {np.mean(reranked_hits):>13.3f} {np.mean(latencies):>12.1f} "
+              f"{np.percentile(latencies, 95):>8.1f} {np.mean(passages):>9.1f} {np.mean(tokens):>7.0f}")
+
+if __name__ == "__main__":
+    main()
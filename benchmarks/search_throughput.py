@@ -0,0 +1,78 @@
+# Compare per-query search against search_batch and the micro-batcher.
+# Requires a built index (run option 1 in main.py first).
+#
+# python -m benchmarks.search_throughput --queries 256 --threads 16
+
+import argparse
+import random
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from data_pipeline.batching import MicroBatcher
+from data_pipeline.embedding import get_retriever
+
+SAMPLE_QUESTIONS = [
+    "VPN won't connect after password change",
+    "Outlook keeps asking for credentials",
+    "How do I reset a user's MFA token in Azure AD?",
+    "Printer on floor 3 shows offline",
+    "Laptop cannot join the corporate Wi-Fi",
+    "SharePoint site returns access denied",
+    "Teams calls drop after a few minutes",
+    "Account locked out repeatedly",
+]
+
+def make_queries(n):
+    rng = random.Random(0)
+    return [f"{rng.choice(SAMPLE_QUESTIONS)} ({i})" for i in range(n)]
+
+def report(label, n, elapsed):
+    print(f"{label:<28} {n} queries in {elapsed:.3f}s  ->  {n / elapsed:,.1f} queries/sec")
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--queries", type=int, default=256)
+    parser.add_argument("--top-k", type=int, default=3)
+    parser.add_argument("--threads", type=int, default=16)
+    parser.add_argument("--window-ms", type=float, default=5)
+    parser.add_argument("--max-batch", type=int, default=32)
+    args = parser.parse_args()
+
+    retriever = get_retriever()
+    if not retriever.warm():
+        print("No index found. Run option 1 in main.py first.")
+        sys.exit(1)
+
+    queries = make_queries(args.queries)
+    retriever.search(queries[0], args.top_k)
+
+    start = time.perf_counter()
+    for q in queries:
+        retriever.search(q, args.top_k)
+    report("sequential per-query", len(queries), time.perf_counter() - start)
+
+    start = time.perf_counter()
+    for i in range(0, len(queries), args.max_batch):
+        retriever.search_batch(queries[i:i + args.max_batch], args.top_k)
+    report(f"search_batch({args.max_batch})", len(queries), time.perf_counter() - start)
+
+    with ThreadPoolExecutor(args.threads) as pool:
+        start = time.perf_counter()
+        list(pool.map(lambda q: retriever.search(q, args.top_k), queries))
+        report(f"{args.threads} threads, per-query", len(queries), time.perf_counter() - start)
+
+    batcher = MicroBatcher(retriever.search_batch, args.window_ms, args.max_batch)
+    with ThreadPoolExecutor(args.threads) as pool:
+        start = time.perf_counter()
+        list(pool.map(lambda q: batcher.search(q, args.top_k), queries))
+        report(f"{args.threads} threads, micro-batched", len(queries), time.perf_counter() - start)
+    batcher.close()
+
+    print(f"Micro-batcher: {batcher.stats['batches']} batches, largest {batcher.stats['largest_batch']}")
+
+if __name__ == "__main__":
+    main()
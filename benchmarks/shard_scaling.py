@@ -0,0 +1,79 @@
+# Scatter-gather search throughput as the corpus is split over 1..N shard worker processes.
+# Uses clustered random vectors shaped like MiniLM embeddings (384 dimensions).
+# Each shard worker gets --threads FAISS threads, so N shards use about N * threads cores.
+#
+# python -m benchmarks.shard_scaling --size 200000 --shards 1 2 4 8 --type flat
+
+import argparse
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from benchmarks.ann_index import synthetic_corpus, synthetic_queries
+from data_pipeline.indexFactory import INDEX_TYPES
+from data_pipeline.shardedIndex import ShardedSearcher, write_shards
+
+def measure(searcher, queries, top_k, batch_size):
+    start = time.perf_counter()
+    results = []
+    for i in range(0, len(queries), batch_size):
+        results.append(searcher.search(queries[i:i + batch_size], top_k)[1])
+    batched_seconds = time.perf_counter() - start
+
+    latencies = []
+    for query in queries[:100]:
+        start = time.perf_counter()
+        searcher.search(query.reshape(1, -1), top_k)
+        latencies.append((time.perf_counter() - start) * 1000)
+    return np.vstack(results), len(queries) / batched_seconds, np.array(latencies)
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--size", type=int, default=200000)
+    parser.add_argument("--shards", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--type", default="flat", choices=INDEX_TYPES)
+    parser.add_argument("--dimension", type=int, default=384)
+    parser.add_argument("--queries", type=int, default=1000)
+    parser.add_argument("--batch", type=int, default=32)
+    parser.add_argument("--top-k", type=int, default=10)
+    parser.add_argument("--threads", type=int, default=1, help="FAISS threads per shard worker")
+    args = parser.parse_args()
+
+    vectors = synthetic_corpus(args.size, args.dimension, clusters=max(10, args.size // 1000))
+    queries = synthetic_queries(vectors, args.queries)
+    ids = np.arange(args.size, dtype='int64')
+    rng = np.random.default_rng(0)
+    shard_hash = rng.integers(0, 1 << 30, size=args.size)
+
+    print(f"{args.size} {args.type} vectors, {args.queries} queries in batches of {args.batch}, top {args.top_k}")
+    print(f"{'shards':>6} {'build s':>8} {'start s':>8} {'batched q/s':>12} {'speedup':>8} {'p50 ms':>8} {'p99 ms':>8} {'overlap':>8}")
+
+    baseline = None
+    baseline_results = None
+    for num_shards in args.shards:
+        with tempfile.TemporaryDirectory() as directory:
+            start = time.perf_counter()
+            write_shards(directory, vectors, ids, shard_hash % num_shards, num_shards, args.type, 'l2', 'float32')
+            build_seconds = time.perf_counter() - start
+
+            start = time.perf_counter()
+            searcher = ShardedSearcher(directory, threads=args.threads)
+            start_seconds = time.perf_counter() - start
+            try:
+                results, qps, latencies = measure(searcher, queries, args.top_k, args.batch)
+            finally:
+                searcher.close()
+
+        if baseline is None:
+            baseline, baseline_results = qps, results
+        overlap = np.mean([len(set(a) & set(b)) / args.top_k for a, b in zip(results, baseline_results)])
+        print(f"{num_shards:>6} {build_seconds:>8.1f} {start_seconds:>8.2f} {qps:>12,.0f} {qps / baseline:>7.2f}x "
+              f"{np.percentile(latencies, 50):>8.2f} {np.percentile(latencies, 99):>8.2f} {overlap:>8.3f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,130 @@
+# Measure cold start of the serving path: import time, time to first answered request and baseline RSS.
+#
+# Uses the same offline setup as benchmarks.load_test: a synthetic ticket corpus, the
+# hash embedder and the fake LLM. Each run starts a fresh server process. It reports
+# seconds until /api/ready answers, seconds until the first /api/question is answered,
+# and the RSS of the server processes once ready. Runs are repeated with the
+# memory-mapped snapshot on and off (SNAPSHOT=0). Import time is measured separately
+# for app, in a fresh interpreter, along with which heavy modules the import pulled in.
+#
+# python -m benchmarks.startup --tickets 20000 --runs 3
+# python -m benchmarks.startup --embed-backend sentence-transformers --output startup.json
+
+import argparse
+import json
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from benchmarks.load_test import build_corpus, ingest, process_tree, request, rss_mb, server_env, start_server
+
+HEAVY_MODULES = ("torch", "sentence_transformers", "transformers", "pypdf", "google.genai", "faiss", "reportlab")
+
+IMPORT_PROBE = """
+import json, sys, time
+start = time.perf_counter()
+import app
+seconds = time.perf_counter() - start
+with open('/proc/self/status') as f:
+    rss = next(int(line.split()[1]) for line in f if line.startswith('VmRSS:')) / 1024
+print(json.dumps({'seconds': seconds, 'rss_mb': rss, 'loaded': [m for m in %r if m in sys.modules]}))
+"""
+
+def measure_import(env, workdir, runs):
+    results = []
+    for _ in range(runs):
+        output = subprocess.run([sys.executable, '-c', IMPORT_PROBE % (HEAVY_MODULES,)], cwd=workdir, env=env,
+                                capture_output=True, text=True, check=True).stdout
+        results.append(json.loads(output.strip().splitlines()[-1]))
+    return {
+        'seconds': float(np.median([r['seconds'] for r in results])),
+        'rss_mb': float(np.median([r['rss_mb'] for r in results])),
+        'heavy_modules_loaded': results[-1]['loaded'],
+    }
+
+def measure_boot(args, workdir, env):
+    start = time.perf_counter()
+    process = start_server(args, workdir, env)
+    ready = time.perf_counter() - start
+    try:
+        status, _ = request(args.port, 'POST', '/api/question', {'question': "VPN client cannot connect"})
+        first_answer = time.perf_counter() - start
+        if status != 200:
+            raise RuntimeError(f"First question failed with HTTP {status}")
+        rss = {pid: rss_mb(pid) for pid in process_tree(process.pid)}
+        return {
+            'ready_seconds': ready,
+            'first_answer_seconds': first_answer,
+            'rss_mb': {str(pid): round(value, 1) for pid, value in rss.items() if value is not None},
+        }
+    finally:
+        process.terminate()
+        try:
+            process.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            process.kill()
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--tickets", type=int, default=20000)
+    parser.add_argument("--tickets-per-day", type=int, default=50)
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--embed-backend", choices=("hash", "sentence-transformers"), default="hash")
+    parser.add_argument("--server", choices=("flask", "gunicorn"), default="flask")
+    parser.add_argument("--workers", type=int, default=2, help="gunicorn workers")
+    parser.add_argument("--threads", type=int, default=8, help="gunicorn threads per worker")
+    parser.add_argument("--port", type=int, default=5058)
+    parser.add_argument("--startup-timeout", type=float, default=300)
+    parser.add_argument("--output", default=None, help="Write the results as JSON")
+    parser.add_argument("--keep", action="store_true", help="Keep the working directory")
+    args = parser.parse_args()
+    # Read by load_test.server_env: an instant LLM so the first answer measures the server, not the model
+    args.llm_latency = 0.0
+    args.llm_tokens_per_second = 0
+    args.answer_cache = False
+
+    workdir = Path(tempfile.mkdtemp(prefix="triage_startup_"))
+    try:
+        build_corpus(workdir, args.tickets, args.tickets_per_day)
+        env = server_env(args, workdir)
+        env['EMBED_BACKEND'] = args.embed_backend
+        ingest(workdir, env)
+
+        imports = measure_import(env, workdir, args.runs)
+        print(f"import app: {imports['seconds']:.2f}s, {imports['rss_mb']:.0f} MB RSS, "
+              f"heavy modules loaded: {', '.join(imports['heavy_modules_loaded']) or 'none'}")
+
+        boots = {}
+        print(f"{'snapshot':>9} {'ready s':>8} {'1st answer s':>13} {'RSS MB':>8}")
+        for label, snapshot in (("on", "1"), ("off", "0")):
+            runs = [measure_boot(args, workdir, dict(env, SNAPSHOT=snapshot)) for _ in range(args.runs)]
+            boots[label] = {
+                'ready_seconds': float(np.median([r['ready_seconds'] for r in runs])),
+                'first_answer_seconds': float(np.median([r['first_answer_seconds'] for r in runs])),
+                'rss_mb_total': float(np.median([sum(r['rss_mb'].values()) for r in runs])),
+                'runs': runs,
+            }
+            boot = boots[label]
+            print(f"{label:>9} {boot['ready_seconds']:>8.2f} {boot['first_answer_seconds']:>13.2f} "
+                  f"{boot['rss_mb_total']:>8.0f}")
+    finally:
+        if args.keep:
+            print(f"Working directory kept at {workdir}")
+        else:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump({'created': time.strftime('%Y-%m-%dT%H:%M:%S'), 'config': vars(args), 'import': imports,
+                       'boot': boots}, f, indent=2)
+        print(f"Saved results to {args.output}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+# Memory, latency and top-k agreement of cosine / reduced-precision indexes
+# against today's float32 L2 flat index.
+#
+# python -m benchmarks.vector_precision --size 100000 --index-type flat
+
+import argparse
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from benchmarks.ann_index import synthetic_corpus, synthetic_queries
+from data_pipeline.indexFactory import build_index, index_memory_bytes, prepare_vectors, INDEX_TYPES
+
+VARIANTS = [
+    ('l2', 'float32'),
+    ('cosine', 'float32'),
+    ('cosine', 'float16'),
+    ('cosine', 'int8'),
+]
+
+def run(index, queries, top_k):
+    start = time.perf_counter()
+    latencies = []
+    ids = []
+    for query in queries:
+        t = time.perf_counter()
+        _, row = index.search(query.reshape(1, -1), top_k)
+        latencies.append(time.perf_counter() - t)
+        ids.append(row[0])
+    return np.array(ids), np.array(latencies) * 1000, time.perf_counter() - start
+
+def agreement(ids, baseline):
+    return float(np.mean([len(set(a.tolist()) & set(b.tolist())) for a, b in zip(ids, baseline)])) / baseline.shape[1]
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--size", type=int, default=100000)
+    parser.add_argument("--dimension", type=int, default=384)
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--top-k", type=int, default=10)
+    parser.add_argument("--index-type", default='flat', choices=INDEX_TYPES)
+    parser.add_argument("--unnormalized", action="store_true",
+                        help="Skip normalizing the corpus (all-MiniLM-L6-v2 emits unit-length vectors)")
+    args = parser.parse_args()
+
+    vectors = synthetic_corpus(args.size, args.dimension, clusters=max(10, args.size // 1000))
+    if not args.unnormalized:
+        vectors = prepare_vectors(vectors, 'cosine')
+    queries = synthetic_queries(vectors, args.queries)
+    ids = np.arange(args.size, dtype='int64')
+
+    print(f"{'metric':<7} {'precision':<9} {'index MB':>9} {'p50 ms':>8} {'p99 ms':>8} {'top-k agree':>12}")
+
+    baseline = None
+    for metric, precision in VARIANTS:
+        prepared = prepare_vectors(vectors, metric)
+        index = build_index(prepared, args.index_type, metric, precision)
+        index.add_with_ids(prepared, ids)
+
+        results, latencies, _ = run(index, prepare_vectors(queries, metric), args.top_k)
+        if baseline is None:
+            baseline = results
+
+        print(f"{metric:<7} {precision:<9} {index_memory_bytes(index) / 2 ** 20:>9.1f} "
+              f"{np.percentile(latencies, 50):>8.3f} {np.percentile(latencies, 99):>8.3f} "
+              f"{agreement(results, baseline):>12.3f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+from concurrent.futures import Future
+import os
+import queue
+import threading
+import time
+from data_pipeline.embedding import get_retriever
+
+SEARCH_BATCH_WINDOW_MS = float(os.getenv('SEARCH_BATCH_WINDOW_MS', '5'))
+SEARCH_BATCH_MAX_SIZE = int(os.getenv('SEARCH_BATCH_MAX_SIZE', '32'))
+
+class MicroBatcher:
+    """Collects searches from concurrent request threads and runs them as one batch.
+
+    A batch is dispatched when max_batch_size requests are waiting or window_ms
+    has passed since the first request in the batch arrived, whichever is first.
+    """
+
+    def __init__(self, batch_fn, window_ms=SEARCH_BATCH_WINDOW_MS, max_batch_size=SEARCH_BATCH_MAX_SIZE):
+        self.batch_fn = batch_fn
+        self.window = window_ms / 1000.0
+        self.max_batch_size = max_batch_size
+        self._queue = queue.Queue()
+        self._closed = False
+        self.stats = {'batches': 0, 'queries': 0, 'largest_batch': 0}
+        self._worker = threading.Thread(target=self._run, name="search-microbatcher", daemon=True)
+        self._worker.start()
+
+    def submit(self, query, top_k):
+        if self._closed:
+            raise RuntimeError("MicroBatcher is closed")
+        future = Future()
+        self._queue.put((query, top_k, future))
+        return future
+
+    def search(self, query, top_k, timeout=None):
+        return self.submit(query, top_k).result(timeout)
+
+    def close(self):
+        self._closed = True
+        self._queue.put(None)
+        self._worker.join()
+
+    def _collect(self, first):
+        batch = [first]
+        deadline = time.perf_counter() + self.window
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                break
+            try:
+                item = self._queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            if item is None:
+                self._queue.put(None)
+                break
+            batch.append(item)
+        return batch
+
+    def _run(self):
+        while True:
+            first = self._queue.get()
+            if first is None:
+                return
+
+            batch = self._collect(first)
+            queries = [query for query, _, _ in batch]
+            top_k = max(k for _, k, _ in batch)
+
+            try:
+                results = self.batch_fn(queries, top_k)
+            except Exception as e:
+                for _, _, future in batch:
+                    future.set_exception(e)
+                continue
+
+            for (_, k, future), result in zip(batch, results):
+                future.set_result(result[:k])
+
+            self.stats['batches'] += 1
+            self.stats['queries'] += len(batch)
+            self.stats['largest_batch'] = max(self.stats['largest_batch'], len(batch))
+
+_batcher = None
+_batcher_lock = threading.Lock()
+
+def get_batcher():
+    global _batcher
+    if _batcher is None:
+        with _batcher_lock:
+            if _batcher is None:
+                _batcher = MicroBatcher(get_retriever().search_batch_records)
+    return _batcher
+
+def batched_search_records(query, top_k, **filters):
+    """Route a single search through the shared micro-batcher, or directly when batching is disabled.
+
+    Filtered searches always go direct, since a batch shares one set of filters.
+    """
+    if filters or SEARCH_BATCH_WINDOW_MS <= 0 or SEARCH_BATCH_MAX_SIZE <= 1:
+        return get_retriever().search_records(query, top_k, **filters)
+    return get_batcher().search(query, top_k)
+
+def batched_search(query, top_k, **filters):
+    return [record['text'] for record in batched_search_records(query, top_k, **filters)]
@@ -0,0 +1,129 @@
+from pathlib import Path
+import json
+import os
+import numpy as np
+
+CHUNK_STORE_FILE = "chunks.jsonl"
+CHUNK_INDEX_FILE = "chunks.idx"
+
+# One fixed-width entry per chunk, sorted by id, pointing at its line in the JSONL file
+_INDEX_DTYPE = np.dtype([('id', '<i8'), ('offset', '<i8'), ('length', '<i8')])
+
+class ChunkStore:
+    """Read-only view of a chunk store directory.
+
+    Records live one per line in chunks.jsonl as
+    {"id", "source", "part", "start", "end", "text"}. chunks.idx is
+    memory-mapped and maps each id to its byte range, so a lookup reads just
+    the lines it needs instead of loading every chunk.
+    """
+
+    def __init__(self, directory):
+        self.directory = Path(directory)
+        self.data_path = self.directory / CHUNK_STORE_FILE
+        self.index_path = self.directory / CHUNK_INDEX_FILE
+
+        if self.index_path.exists() and self.index_path.stat().st_size > 0:
+            self._entries = np.memmap(self.index_path, dtype=_INDEX_DTYPE, mode='r')
+        else:
+            self._entries = np.zeros(0, dtype=_INDEX_DTYPE)
+        self._fd = os.open(self.data_path, os.O_RDONLY) if self.data_path.exists() else None
+
+    @classmethod
+    def exists(cls, directory):
+        directory = Path(directory)
+        return (directory / CHUNK_STORE_FILE).exists() and (directory / CHUNK_INDEX_FILE).exists()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, chunk_id):
+        return self._locate(chunk_id) is not None
+
+    def __del__(self):
+        self.close()
+
+    def close(self):
+        if getattr(self, '_fd', None) is not None:
+            os.close(self._fd)
+            self._fd = None
+
+    @property
+    def ids(self):
+        return np.asarray(self._entries['id'])
+
+    def _locate(self, chunk_id):
+        ids = self._entries['id']
+        pos = int(np.searchsorted(ids, chunk_id))
+        if pos < len(ids) and ids[pos] == chunk_id:
+            return pos
+        return None
+
+    def get_raw(self, chunk_id):
+        pos = self._locate(chunk_id)
+        if pos is None:
+            return None
+        entry = self._entries[pos]
+        return os.pread(self._fd, int(entry['length']), int(entry['offset']))
+
+    def get(self, chunk_id):
+        raw = self.get_raw(chunk_id)
+        return json.loads(raw) if raw is not None else None
+
+    def get_many(self, chunk_ids):
+        """Return the records for chunk_ids in order, skipping ids that are not in the store."""
+        records = []
+        for chunk_id in chunk_ids:
+            record = self.get(int(chunk_id))
+            if record is not None:
+                records.append(record)
+        return records
+
+    def texts(self, chunk_ids):
+        return [record['text'] for record in self.get_many(chunk_ids)]
+
+    def iter_records(self):
+        if self._fd is None:
+            return
+        with open(self.data_path, 'r', encoding='utf-8') as f:
+            for line in f:
+                yield json.loads(line)
+
+def write_chunk_store(directory, records, copy_from=None, keep_ids=()):
+    """Write a new chunk store in directory, replacing any existing one.
+
+    keep_ids are copied byte-for-byte from the copy_from store, then the new
+    records are appended. Records can be any iterable, so callers can stream.
+    """
+    directory = Path(directory)
+    directory.mkdir(parents=True, exist_ok=True)
+    data_tmp = directory / (CHUNK_STORE_FILE + ".tmp")
+    index_tmp = directory / (CHUNK_INDEX_FILE + ".tmp")
+
+    entries = []
+    offset = 0
+    with open(data_tmp, 'wb') as f:
+        if copy_from is not None:
+            for chunk_id in sorted(int(i) for i in keep_ids):
+                raw = copy_from.get_raw(chunk_id)
+                if raw is None:
+                    continue
+                f.write(raw)
+                entries.append((chunk_id, offset, len(raw)))
+                offset += len(raw)
+
+        for record in records:
+            raw = (json.dumps(record, ensure_ascii=False) + "\n").encode('utf-8')
+            f.write(raw)
+            entries.append((int(record['id']), offset, len(raw)))
+            offset += len(raw)
+
+    index = np.array(entries, dtype=_INDEX_DTYPE)
+    index.sort(order='id')
+    if len(index) > 1 and (np.diff(index['id']) == 0).any():
+        raise ValueError("Duplicate chunk ids in chunk store")
+    index.tofile(index_tmp)
+
+    os.replace(data_tmp, directory / CHUNK_STORE_FILE)
+    os.replace(index_tmp, directory / CHUNK_INDEX_FILE)
+    return len(index)
@@ -0,0 +1,178 @@
+import os
+import re
+import threading
+from data_pipeline.embeddingCache import normalize_text
+
+CONTEXT_TOKEN_BUDGET = int(os.getenv('CONTEXT_TOKEN_BUDGET', '1500'))
+CONTEXT_MAX_PASSAGES = int(os.getenv('CONTEXT_MAX_PASSAGES', '6'))
+# Sentences shorter than this ("Resolved.") are too generic to count as duplicates
+DEDUP_MIN_SENTENCE_CHARS = 30
+# Chunks whose offsets are at most this far apart are treated as adjacent
+ADJACENT_GAP_CHARS = 2
+
+_SENTENCE_BREAK = re.compile(r'(?<=[.!?])\s+')
+_TOKEN_PIECE = re.compile(r"\w+|[^\w\s]")
+
+def estimate_tokens(text):
+    """Fast local token estimate for BPE-style LLM tokenizers.
+
+    Counts one token per word or punctuation mark, plus one for every six
+    characters of a long word, which tracks subword splitting of identifiers,
+    paths and error codes better than a flat characters-per-token ratio.
+    """
+    return sum(1 + len(piece) // 6 for piece in _TOKEN_PIECE.findall(text))
+
+def _group(record):
+    # Per-ticket chunks all span their own ticket, so they are only merged with chunks of the same ticket
+    return record.get('source'), record.get('ticket_id')
+
+def _join_overlapping(first, second):
+    """Append second to first, dropping the longest run of words that ends first and starts second."""
+    first_words = first.split()
+    second_words = second.split()
+    for size in range(min(len(first_words), len(second_words)), 0, -1):
+        if first_words[-size:] == second_words[:size]:
+            return ' '.join(first_words + second_words[size:])
+    return first + ' ' + second
+
+def merge_spans(records):
+    """Merge chunks of the same document whose stored offsets overlap or touch.
+
+    Returns merged records in rank order, each placed where its best-ranked
+    member was. Merged text keeps the words of the overlap only once.
+    """
+    merged = []
+    by_group = {}
+    for record in records:
+        start, end = record.get('start'), record.get('end')
+        group = by_group.setdefault(_group(record), [])
+        target = None
+        if start is not None and end is not None:
+            for candidate in group:
+                if start <= candidate['end'] + ADJACENT_GAP_CHARS and candidate['start'] <= end + ADJACENT_GAP_CHARS:
+                    target = candidate
+                    break
+        if target is None:
+            entry = dict(record, merged_ids=[record['id']])
+            group.append(entry)
+            merged.append(entry)
+            continue
+
+        if target['start'] <= start and end <= target['end']:
+            pass
+        elif start <= target['start'] and target['end'] <= end:
+            target['text'] = record['text']
+        elif start < target['start']:
+            target['text'] = _join_overlapping(record['text'], target['text'])
+        else:
+            target['text'] = _join_overlapping(target['text'], record['text'])
+        target['start'] = min(target['start'], start)
+        target['end'] = max(target['end'], end)
+        target['merged_ids'].append(record['id'])
+    return merged
+
+def dedupe_sentences(texts, min_chars=DEDUP_MIN_SENTENCE_CHARS):
+    """Drop sentences already seen in an earlier (better ranked) passage. Returns (texts, sentences removed)."""
+    seen = set()
+    removed = 0
+    result = []
+    for text in texts:
+        kept = []
+        for sentence in _SENTENCE_BREAK.split(text):
+            key = normalize_text(sentence)
+            if len(key) >= min_chars:
+                if key in seen:
+                    removed += 1
+                    continue
+                seen.add(key)
+            kept.append(sentence)
+        if kept:
+            result.append(' '.join(kept))
+    return result, removed
+
+def _truncate_to_budget(text, budget):
+    """Longest prefix of whole sentences within budget tokens, or '' if even the first sentence is too long."""
+    kept = []
+    used = 0
+    for sentence in _SENTENCE_BREAK.split(text):
+        tokens = estimate_tokens(sentence)
+        if used + tokens > budget:
+            break
+        kept.append(sentence)
+        used += tokens
+    return ' '.join(kept)
+
+def assemble_context(records, token_budget=CONTEXT_TOKEN_BUDGET, max_passages=CONTEXT_MAX_PASSAGES):
+    """Turn ranked chunk records into the passages sent to the LLM.
+
+    Overlapping or adjacent chunks of the same document are merged, repeated
+    sentences are removed, and passages are taken in rank order while they
+    fit token_budget. The first passage that does not fit is cut at a
+    sentence boundary if that leaves something useful. Returns (passages,
+    stats) where stats counts tokens and what was merged, deduplicated or cut.
+    """
+    merged = merge_spans(records)
+    texts, duplicates = dedupe_sentences([record['text'] for record in merged])
+
+    passages = []
+    used = 0
+    truncated = 0
+    for text in texts:
+        if len(passages) >= max_passages:
+            break
+        tokens = estimate_tokens(text)
+        if used + tokens <= token_budget:
+            passages.append(text)
+            used += tokens
+            continue
+        remaining = token_budget - used
+        if remaining >= 50 or not passages:
+            cut = _truncate_to_budget(text, remaining) or text[:remaining * 4]
+            passages.append(cut)
+            used += estimate_tokens(cut)
+            truncated += 1
+        break
+
+    stats = {
+        'chunks_in': len(records),
+        'passages_out': len(passages),
+        'merged_chunks': len(records) - len(merged),
+        'duplicate_sentences': duplicates,
+        'truncated': truncated,
+        'context_tokens': used,
+    }
+    _record(stats)
+    return passages, stats
+
+_stats = {
+    'requests': 0,
+    'context_tokens_total': 0,
+    'prompt_tokens_total': 0,
+    'last_prompt_tokens': 0,
+    'merged_chunks': 0,
+    'duplicate_sentences': 0,
+    'truncated': 0,
+}
+_stats_lock = threading.Lock()
+
+def _record(stats):
+    with _stats_lock:
+        _stats['requests'] += 1
+        _stats['context_tokens_total'] += stats['context_tokens']
+        _stats['merged_chunks'] += stats['merged_chunks']
+        _stats['duplicate_sentences'] += stats['duplicate_sentences']
+        _stats['truncated'] += stats['truncated']
+
+def record_prompt_tokens(tokens):
+    """Count the estimated size of a full prompt (system instruction, context and question) as sent to the LLM."""
+    with _stats_lock:
+        _stats['prompt_tokens_total'] += tokens
+        _stats['last_prompt_tokens'] = tokens
+
+def get_context_stats():
+    with _stats_lock:
+        stats = dict(_stats)
+    requests = stats['requests']
+    stats['avg_context_tokens'] = stats['context_tokens_total'] / requests if requests else 0.0
+    stats['avg_prompt_tokens'] = stats['prompt_tokens_total'] / requests if requests else 0.0
+    return stats
@@ -1,63 +1,443 @@
 from pathlib import Path
-import faiss
+import hashlib
+import json
 import numpy as np
-import pickle
-from sentence_transformers import SentenceTransformer
+import os
+import shutil
+import threading
+import time
+from data_pipeline.embeddingCache import get_embedding_cache
+from data_pipeline.hashEmbedder import HashEmbedder
+from data_pipeline.metrics import flush_ingest_metrics, record_ingest, stage
+from data_pipeline.chunkStore import ChunkStore, CHUNK_STORE_FILE, CHUNK_INDEX_FILE
+from data_pipeline.keywordIndex import KeywordIndex, reciprocal_rank_fusion, write_keyword_index, KEYWORD_INDEX_FILE
+from data_pipeline.metadataIndex import MetadataIndex, write_metadata_index, METADATA_INDEX_FILE
+from data_pipeline.snapshot import write_snapshot
+from data_pipeline.shardedIndex import ShardedSearcher, load_shard_manifest, SHARD_DIR, SHARD_MANIFEST, SHARDING_ENABLED
+from data_pipeline.indexFactory import (build_index, index_type_of, metric_of, precision_of, prepare_vectors,
+                                        filtered_search_params, read_index, set_search_params, write_index, INDEX_TYPE, METRIC, PRECISION, NPROBE, EF_SEARCH)
 
-MODEL = "all-MiniLM-L6-v2"
-chunks = []
+# 'hash' swaps the model for HashEmbedder, for load tests and offline runs. Its vectors are not
+# comparable with MiniLM's, so it gets its own model name (and embedding cache entries) and needs its own index.
+EMBED_BACKEND = os.getenv('EMBED_BACKEND', 'sentence-transformers')
+MODEL = "hash-embedder" if EMBED_BACKEND == 'hash' else "all-MiniLM-L6-v2"
+VECTOR_DB_DIR = "vector_db"
+INDEX_FILE = "embeddings.index"
+EMBED_CHECKPOINT_DIR = "embedding_checkpoints"
+EMBED_BATCH_SIZE = int(os.getenv('EMBED_BATCH_SIZE', '512'))
+EMBED_PROCESSES = int(os.getenv('EMBED_PROCESSES', '1'))
+ENCODE_BATCH_SIZE = 32
+RETRIEVAL_MODE = os.getenv('RETRIEVAL_MODE', 'hybrid')
+HYBRID_CANDIDATES = int(os.getenv('HYBRID_CANDIDATES', '20'))
+RRF_K = int(os.getenv('RRF_K', '60'))
+# Arrays unpacked into vector_db/snapshot after each ingestion so the server can memory-map them at boot
+SNAPSHOT_SOURCES = (KEYWORD_INDEX_FILE, METADATA_INDEX_FILE)
+
+def load_model(model_name=MODEL):
+    if EMBED_BACKEND == 'hash':
+        return HashEmbedder(model_name)
+    # Imported on first use: sentence_transformers brings in torch, which dominates import time and memory
+    from sentence_transformers import SentenceTransformer
+    return SentenceTransformer(model_name)
 
 def load_chunks(chunk_directory):
-    for file in chunk_directory.iterdir():
-        if file.is_file() and file.name != "_chunking_summary.txt":
-            with open(file, 'r', encoding='utf-8') as current_file:
-                content = current_file.read()
-                chunks.append(content)
+    """Return (ids, texts) for every chunk in the chunk store at chunk_directory."""
+    ids = []
+    texts = []
+    for record in ChunkStore(chunk_directory).iter_records():
+        ids.append(record['id'])
+        texts.append(record['text'])
+
+    return ids, texts
+
+def _fingerprint(texts, model_name):
+    digest = hashlib.sha256(model_name.encode('utf-8'))
+    for text in texts:
+        digest.update(text.encode('utf-8'))
+        digest.update(b'\0')
+    return digest.hexdigest()[:16]
+
+def chunk_embeddings(chunks, batch_size=EMBED_BATCH_SIZE, processes=EMBED_PROCESSES,
+                     checkpoint_dir=EMBED_CHECKPOINT_DIR, model_name=MODEL):
+    """Encode chunks in batches, streaming each finished batch to an on-disk .npy checkpoint.
+
+    If a run is interrupted, calling again with the same chunks resumes after
+    the last completed batch. Chunks already in the embedding cache are not
+    re-encoded. With processes > 1 each batch is spread over a
+    sentence-transformers multi-process pool. The checkpoint is deleted once
+    every chunk is encoded.
+    """
+    chunks = list(chunks)
+    if not chunks:
+        dimension = load_model(model_name).get_sentence_embedding_dimension()
+        return np.zeros((0, dimension), dtype='float32')
+
+    cache = get_embedding_cache(model_name)
+    model = None
+    pool = None
+
+    def encode(texts):
+        # The model is only loaded once a batch has cache misses
+        nonlocal model, pool
+        if model is None:
+            model = load_model(model_name)
+            if processes > 1 and EMBED_BACKEND != 'hash':
+                pool = model.start_multi_process_pool(['cpu'] * processes)
+        if pool is not None:
+            return model.encode_multi_process(texts, pool, batch_size=ENCODE_BATCH_SIZE)
+        return model.encode(texts, batch_size=ENCODE_BATCH_SIZE)
 
-    return chunks
+    checkpoint_dir = Path(checkpoint_dir)
+    checkpoint_dir.mkdir(parents=True, exist_ok=True)
+    fingerprint = _fingerprint(chunks, model_name)
+    data_path = checkpoint_dir / f"{fingerprint}.npy"
+    progress_path = checkpoint_dir / f"{fingerprint}.json"
 
-def chunk_embeddings(chunks):
-    model = SentenceTransformer(MODEL)
-    embeddings = model.encode(chunks)
+    done = 0
+    embeddings = None
+    if data_path.exists() and progress_path.exists():
+        with open(progress_path, 'r', encoding='utf-8') as f:
+            done = json.load(f)['done']
+        embeddings = np.lib.format.open_memmap(data_path, mode='r+')
+        if embeddings.shape[0] != len(chunks):
+            done = 0
+            embeddings = None
+        else:
+            print(f"Resuming embedding at chunk {done}/{len(chunks)}")
 
-    print(f"Embedding shape: {embeddings.shape}")
-    for index, embedding in enumerate(embeddings):
-        print(f"Embedding {index+1}: {embedding[:5]}")
+    start = time.perf_counter()
+    encoded = 0
+    try:
+        while done < len(chunks):
+            end = min(done + batch_size, len(chunks))
+            batch = chunks[done:end]
+            vectors = cache.encode(batch, encode) if cache is not None else encode(batch)
 
-    return embeddings
+            if embeddings is None:
+                embeddings = np.lib.format.open_memmap(data_path, mode='w+', dtype='float32',
+                                                       shape=(len(chunks), vectors.shape[1]))
+            embeddings[done:end] = vectors
+            embeddings.flush()
+            done = end
+            _write_json_atomic(progress_path, {'done': done})
 
-def save_embeddings(embeddings, chunks):
-    directory = Path("vector_db")
+            encoded += len(batch)
+            elapsed = time.perf_counter() - start
+            print(f"Embedded {done}/{len(chunks)} chunks ({encoded / elapsed:.1f} chunks/sec)")
+    finally:
+        if pool is not None:
+            model.stop_multi_process_pool(pool)
+    record_ingest('embed', time.perf_counter() - start, encoded)
+
+    result = np.array(embeddings)
+    del embeddings
+    data_path.unlink()
+    progress_path.unlink()
+
+    print(f"Embedding shape: {result.shape}")
+    if cache is not None:
+        stats = cache.get_stats()
+        print(f"Embedding cache: {stats['memory_hits'] + stats['disk_hits']} hits, {stats['misses']} misses")
+    return result
+
+def _write_json_atomic(path, data):
+    tmp_path = path.with_suffix(path.suffix + ".tmp")
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(data, f)
+    os.replace(tmp_path, path)
+
+def save_embeddings(embeddings, ids, chunk_directory="chunks", index_type=INDEX_TYPE, metric=METRIC, precision=PRECISION):
+    directory = Path(VECTOR_DB_DIR)
     directory.mkdir(parents=True, exist_ok=True)
-    dimension = embeddings.shape[1]
+    start = time.perf_counter()
+    embeddings = prepare_vectors(embeddings, metric)
 
-    index = faiss.IndexFlatL2(dimension)
-    index.add(embeddings)
+    index = build_index(embeddings, index_type, metric, precision)
+    index.add_with_ids(embeddings, np.asarray(ids, dtype='int64'))
 
-    faiss.write_index(index, str(directory / "embeddings.index"))
+    chunk_directory = Path(chunk_directory)
+    if chunk_directory.resolve() != directory.resolve():
+        for name in (CHUNK_STORE_FILE, CHUNK_INDEX_FILE):
+            shutil.copyfile(chunk_directory / name, directory / name)
+    write_keyword_index(directory)
+    write_metadata_index(directory)
+    write_snapshot(directory, SNAPSHOT_SOURCES)
 
-    with open(str(directory / "chunks.pk1"), "wb") as f:
-        pickle.dump(chunks, f)
+    # Written last so a Retriever watching the index mtime sees matching chunks
+    write_index(index, directory / INDEX_FILE)
+    record_ingest('index_write', time.perf_counter() - start, len(ids))
+    flush_ingest_metrics(directory)
 
-    print(f"Saved {len(chunks)} embeddings")
+    print(f"Saved {len(ids)} embeddings")
 
-def embed_and_save():
-    directory = Path("chunks")
-    chunks = load_chunks(directory)
+def embed_and_save(chunk_directory="chunks"):
+    ids, chunks = load_chunks(chunk_directory)
     embeddings = chunk_embeddings(chunks)
-    save_embeddings(embeddings, chunks)
+    save_embeddings(embeddings, ids, chunk_directory)
 
-def search(query, top_k):
-    model = SentenceTransformer(MODEL)
-    directory = Path("vector_db")
-    directory.mkdir(parents=True, exist_ok=True)
+class Retriever:
+    """Keeps the embedding model, FAISS index and chunk store resident in the process.
+
+    The model is loaded once. The index, chunk store and keyword index are
+    reopened whenever the index file's mtime changes, so a rebuild from
+    main.py is picked up without restarting the server. Chunk texts are read
+    from the store only for the rows a search returns.
+
+    In 'hybrid' mode a query naming a ticket ID (IT-12345) goes straight to
+    the chunks that mention it without being embedded, and other queries fuse
+    the vector and BM25 rankings with reciprocal-rank fusion. 'vector' mode
+    uses the FAISS index alone.
+
+    Searches can be filtered by chunk metadata (system, days). The matching
+    ids are passed to FAISS as an ID selector and mask the BM25 scores, so
+    filtering happens inside the search rather than by discarding results.
+    """
+
+    def __init__(self, directory=VECTOR_DB_DIR, model_name=MODEL):
+        self.directory = Path(directory)
+        self.model_name = model_name
+        self.model = None
+        self.index = None
+        self.chunk_store = None
+        self.keyword_index = None
+        self.metadata_index = None
+        self.mode = RETRIEVAL_MODE
+        self._index_mtime = None
+        self.nprobe = NPROBE
+        self.ef_search = EF_SEARCH
+        self._lock = threading.RLock()
+        self.stats = {
+            'model_load_seconds': 0.0,
+            'index_load_seconds': 0.0,
+            'index_loads': 0,
+            'queries': 0,
+            'ticket_id_queries': 0,
+            'batches': 0,
+            'query_seconds_total': 0.0,
+            'last_query_seconds': 0.0,
+        }
+
+    @property
+    def index_version(self):
+        """Changes whenever a different index file is loaded; None until one is."""
+        return self._index_mtime
+
+    @property
+    def index_path(self):
+        return self.directory / INDEX_FILE
+
+    def _load_model(self):
+        start = time.perf_counter()
+        self.model = load_model(self.model_name)
+        self.stats['model_load_seconds'] = time.perf_counter() - start
+
+    def _open_shards(self, index_mtime):
+        """ShardedSearcher over the shards built from the current index, or None to use the index directly."""
+        if not SHARDING_ENABLED:
+            return None
+        manifest = load_shard_manifest(self.directory)
+        if manifest is None:
+            print("VECTOR_SHARDS is set but no shards were built, searching the main index")
+            return None
+        if manifest.get('source_mtime') != index_mtime:
+            print("Shards are older than the main index, searching the main index until they are rebuilt")
+            return None
+        return ShardedSearcher(self.directory, self.nprobe, self.ef_search)
+
+    def _load_index(self, version):
+        start = time.perf_counter()
+        index = self._open_shards(version[0])
+        if index is None:
+            index = read_index(self.index_path)
+            set_search_params(index, self.nprobe, self.ef_search)
+        chunk_store = ChunkStore(self.directory)
+        keyword_index = KeywordIndex(self.directory) if KeywordIndex.exists(self.directory) else None
+        metadata_index = MetadataIndex(self.directory) if MetadataIndex.exists(self.directory) else None
+
+        previous = self.index
+        self.index = index
+        self.chunk_store = chunk_store
+        self.keyword_index = keyword_index
+        self.metadata_index = metadata_index
+        self._index_mtime = version
+        self.stats['index_load_seconds'] = time.perf_counter() - start
+        self.stats['index_loads'] += 1
+        if isinstance(previous, ShardedSearcher):
+            previous.close()
+        print(f"Loaded index with {index.ntotal} vectors in {self.stats['index_load_seconds']:.2f}s")
+
+    def _version(self):
+        """mtime of the index file, plus that of the shard manifest when sharding is on."""
+        mtime = os.stat(self.index_path).st_mtime_ns
+        shard_manifest = self.directory / SHARD_DIR / SHARD_MANIFEST
+        shard_mtime = None
+        if SHARDING_ENABLED and shard_manifest.exists():
+            shard_mtime = os.stat(shard_manifest).st_mtime_ns
+        return (mtime, shard_mtime)
+
+    def refresh(self):
+        """Load the model on first use and reload the index if the file on disk changed."""
+        with self._lock:
+            if self.model is None:
+                self._load_model()
 
-    query_embedding = model.encode([query])
-    index = faiss.read_index(str(directory / "embeddings.index"))
+            try:
+                version = self._version()
+            except FileNotFoundError:
+                return False
 
-    with open(str(directory / "chunks.pk1"), "rb") as f:
-        chunks = pickle.load(f)
-    
-    distances, indicies = index.search(query_embedding, top_k)
+            if version != self._index_mtime:
+                self._load_index(version)
+
+            return True
+
+    def warm(self):
+        return self.refresh()
+
+    def close_shards(self):
+        """Stop this process's shard workers and drop the index, so the next refresh() starts new ones.
+
+        Shard connections must not cross a fork: processes sharing them would
+        read each other's replies. serve.py calls this in the gunicorn master
+        after warming up, and each worker opens its own shards.
+        """
+        with self._lock:
+            if isinstance(self.index, ShardedSearcher):
+                self.index.close()
+                self.index = None
+                self._index_mtime = None
+
+    def set_search_params(self, nprobe=None, ef_search=None):
+        """Tune recall against latency at query time (nprobe for IVF, efSearch for HNSW)."""
+        with self._lock:
+            if nprobe is not None:
+                self.nprobe = nprobe
+            if ef_search is not None:
+                self.ef_search = ef_search
+            if self.index is not None and not isinstance(self.index, ShardedSearcher):
+                set_search_params(self.index, self.nprobe, self.ef_search)
+
+    def encode(self, texts):
+        """Embed texts with the resident model, going through the shared embedding cache when enabled."""
+        if self.model is None:
+            self.refresh()
+        cache = get_embedding_cache(self.model_name)
+        with stage('embed'):
+            if cache is None:
+                return self.model.encode(texts)
+            return cache.encode(texts, self.model.encode)
+
+    def search(self, query, top_k, **filters):
+        return self.search_batch([query], top_k, **filters)[0]
+
+    def search_batch(self, queries, top_k, **filters):
+        """Encode all queries in one model call and run a single FAISS search over them."""
+        return [[record['text'] for record in records] for records in self.search_batch_records(queries, top_k, **filters)]
+
+    def search_records(self, query, top_k, **filters):
+        return self.search_batch_records([query], top_k, **filters)[0]
+
+    def search_batch_records(self, queries, top_k, mode=None, system=None, days=None):
+        """Like search_batch, but return full chunk records (id, source, part, offsets, text, and any metadata).
+
+        system and days restrict the search to matching chunks; see MetadataIndex.select.
+        """
+        if not queries:
+            return []
+
+        start = time.perf_counter()
+
+        if not self.refresh():
+            print(f"Index not found: {self.index_path}")
+            return [[] for _ in queries]
+
+        with self._lock:
+            index = self.index
+            chunk_store = self.chunk_store
+            keyword_index = self.keyword_index
+            metadata_index = self.metadata_index
+        hybrid = (mode or self.mode) == 'hybrid' and keyword_index is not None
+
+        allowed = None
+        if system is not None or days is not None:
+            if metadata_index is None:
+                print("Index has no chunk metadata, ignoring filters")
+            else:
+                allowed = metadata_index.select(system=system, days=days)
+                if not len(allowed):
+                    return [[] for _ in queries]
+
+        ranked = [None] * len(queries)
+        if hybrid:
+            for i, query in enumerate(queries):
+                hits = keyword_index.search_ticket(query, top_k, allowed)
+                if hits:
+                    ranked[i] = [chunk_id for chunk_id, _ in hits]
+        pending = [i for i, ids in enumerate(ranked) if ids is None]
+
+        if pending:
+            candidates = max(top_k, HYBRID_CANDIDATES) if hybrid else top_k
+            query_embeddings = prepare_vectors(self.encode([queries[i] for i in pending]), metric_of(index))
+            with stage('search'):
+                if isinstance(index, ShardedSearcher):
+                    distances, indicies = index.search(query_embeddings, candidates, allowed)
+                else:
+                    params = filtered_search_params(index, allowed) if allowed is not None else None
+                    distances, indicies = index.search(query_embeddings, candidates, params=params)
+                for i, row in zip(pending, indicies):
+                    vector_ids = [int(chunk_id) for chunk_id in row if chunk_id >= 0]
+                    if hybrid:
+                        keyword_ids = [chunk_id for chunk_id, _ in keyword_index.search(queries[i], candidates, allowed)]
+                        ranked[i] = reciprocal_rank_fusion([vector_ids, keyword_ids], RRF_K)[:top_k]
+                    else:
+                        ranked[i] = vector_ids[:top_k]
+
+        with stage('chunk_fetch'):
+            results = [chunk_store.get_many(ids) for ids in ranked]
+
+        elapsed = time.perf_counter() - start
+        with self._lock:
+            self.stats['queries'] += len(queries)
+            self.stats['ticket_id_queries'] += len(queries) - len(pending)
+            self.stats['batches'] += 1
+            self.stats['query_seconds_total'] += elapsed
+            self.stats['last_query_seconds'] = elapsed
+
+        return results
+
+    def get_stats(self):
+        with self._lock:
+            stats = dict(self.stats)
+            stats['index_loaded'] = self.index is not None
+            stats['num_vectors'] = self.index.ntotal if self.index is not None else 0
+            if isinstance(self.index, ShardedSearcher):
+                stats['shards'] = self.index.num_shards
+                stats['shard_counts'] = self.index.manifest['counts']
+            elif self.index is not None:
+                stats['index_type'] = index_type_of(self.index)
+                stats['metric'] = metric_of(self.index)
+                stats['precision'] = precision_of(self.index)
+            stats['retrieval_mode'] = self.mode
+            stats['keyword_index_chunks'] = len(self.keyword_index) if self.keyword_index is not None else 0
+        stats['avg_query_seconds'] = stats['query_seconds_total'] / stats['queries'] if stats['queries'] else 0.0
+        cache = get_embedding_cache(self.model_name)
+        if cache is not None:
+            stats['embedding_cache'] = cache.get_stats()
+        return stats
+
+_retriever = None
+_retriever_lock = threading.Lock()
+
+def get_retriever():
+    global _retriever
+    if _retriever is None:
+        with _retriever_lock:
+            if _retriever is None:
+                _retriever = Retriever()
+    return _retriever
+
+def search(query, top_k):
+    return get_retriever().search(query, top_k)
 
-    return [chunks[i] for i in indicies[0]]
\ No newline at end of file
+def search_batch(queries, top_k):
+    return get_retriever().search_batch(queries, top_k)
@@ -0,0 +1,187 @@
+from collections import OrderedDict
+from pathlib import Path
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+import numpy as np
+
+EMBED_CACHE_ENABLED = os.getenv('EMBED_CACHE', '1') != '0'
+EMBED_CACHE_PATH = os.getenv('EMBED_CACHE_PATH', 'embedding_cache/embeddings.sqlite')
+EMBED_CACHE_MAX_BYTES = int(os.getenv('EMBED_CACHE_MAX_BYTES', str(1 << 30)))
+EMBED_CACHE_MEMORY_ITEMS = int(os.getenv('EMBED_CACHE_MEMORY_ITEMS', '10000'))
+
+def normalize_text(text):
+    # all-MiniLM-L6-v2 is uncased and ignores runs of whitespace, so these variants embed identically
+    return ' '.join(text.split()).lower()
+
+class EmbeddingCache:
+    """Two-tier embedding cache keyed by (model name, SHA-256 of normalized text).
+
+    An in-memory LRU sits in front of a SQLite table. When the table grows
+    past max_bytes, the least recently used rows are evicted until it is
+    back under 90% of the limit.
+    """
+
+    def __init__(self, model_name, path=EMBED_CACHE_PATH, max_bytes=EMBED_CACHE_MAX_BYTES,
+                 memory_items=EMBED_CACHE_MEMORY_ITEMS):
+        self.model_name = model_name
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+        self.memory_items = memory_items
+
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self._evict_lock = threading.Lock()
+        self._local = threading.local()
+        self.stats = {'memory_hits': 0, 'disk_hits': 0, 'misses': 0, 'evicted': 0}
+
+        conn = self._connection()
+        conn.execute("CREATE TABLE IF NOT EXISTS embeddings (key BLOB PRIMARY KEY, vector BLOB NOT NULL, last_used REAL NOT NULL)")
+        conn.execute("CREATE INDEX IF NOT EXISTS embeddings_last_used ON embeddings (last_used)")
+        conn.commit()
+        self._disk_bytes = conn.execute("SELECT COALESCE(SUM(LENGTH(vector)), 0) FROM embeddings").fetchone()[0]
+
+    def _connection(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(str(self.path), timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def key(self, text):
+        return hashlib.sha256(f"{self.model_name}\0{normalize_text(text)}".encode('utf-8')).digest()
+
+    def _remember(self, key, vector):
+        self._memory[key] = vector
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_items:
+            self._memory.popitem(last=False)
+
+    def get_many(self, keys):
+        """Return a list of vectors (or None) for keys, checking memory first and then disk."""
+        found = [None] * len(keys)
+        missing = []
+        with self._lock:
+            for i, key in enumerate(keys):
+                vector = self._memory.get(key)
+                if vector is not None:
+                    self._memory.move_to_end(key)
+                    found[i] = vector
+                    self.stats['memory_hits'] += 1
+                else:
+                    missing.append(i)
+
+        if not missing:
+            return found
+
+        conn = self._connection()
+        wanted = {}
+        for i in missing:
+            wanted.setdefault(keys[i], []).append(i)
+        unique = list(wanted)
+
+        rows = []
+        for start in range(0, len(unique), 500):
+            batch = unique[start:start + 500]
+            placeholders = ','.join('?' * len(batch))
+            rows.extend(conn.execute(f"SELECT key, vector FROM embeddings WHERE key IN ({placeholders})", batch).fetchall())
+
+        if rows:
+            conn.executemany("UPDATE embeddings SET last_used = ? WHERE key = ?", [(time.time(), key) for key, _ in rows])
+            conn.commit()
+
+        with self._lock:
+            for key, blob in rows:
+                vector = np.frombuffer(blob, dtype='float32')
+                self._remember(key, vector)
+                for i in wanted[key]:
+                    found[i] = vector
+                    self.stats['disk_hits'] += 1
+            self.stats['misses'] += sum(1 for i in missing if found[i] is None)
+
+        return found
+
+    def put_many(self, keys, vectors):
+        vectors = np.asarray(vectors, dtype='float32')
+        now = time.time()
+        rows = [(key, vector.tobytes(), now) for key, vector in zip(keys, vectors)]
+
+        conn = self._connection()
+        conn.executemany("INSERT OR REPLACE INTO embeddings VALUES (?, ?, ?)", rows)
+        conn.commit()
+
+        with self._lock:
+            for key, vector in zip(keys, vectors):
+                self._remember(key, vector.copy())
+            self._disk_bytes += sum(len(blob) for _, blob, _ in rows)
+            over_limit = self._disk_bytes > self.max_bytes
+
+        if over_limit:
+            self.evict()
+
+    def evict(self):
+        with self._evict_lock:
+            conn = self._connection()
+            target = int(self.max_bytes * 0.9)
+            evicted = 0
+            while self._disk_bytes > target:
+                rows = conn.execute("SELECT key, LENGTH(vector) FROM embeddings ORDER BY last_used LIMIT 1000").fetchall()
+                if not rows:
+                    break
+                conn.executemany("DELETE FROM embeddings WHERE key = ?", [(key,) for key, _ in rows])
+                with self._lock:
+                    self._disk_bytes -= sum(size for _, size in rows)
+                evicted += len(rows)
+            conn.commit()
+        with self._lock:
+            self.stats['evicted'] += evicted
+
+    def encode(self, texts, encode_fn):
+        """Embed texts, calling encode_fn only for texts that are not cached. Returns a float32 array."""
+        texts = list(texts)
+        keys = [self.key(text) for text in texts]
+        vectors = self.get_many(keys)
+
+        misses = {}
+        for i, vector in enumerate(vectors):
+            if vector is None:
+                misses.setdefault(keys[i], i)
+
+        if misses:
+            miss_keys = list(misses)
+            encoded = np.asarray(encode_fn([texts[misses[key]] for key in miss_keys]), dtype='float32')
+            self.put_many(miss_keys, encoded)
+            by_key = dict(zip(miss_keys, encoded))
+            vectors = [by_key[keys[i]] if vector is None else vector for i, vector in enumerate(vectors)]
+
+        return np.vstack(vectors) if vectors else np.zeros((0, 0), dtype='float32')
+
+    def get_stats(self):
+        with self._lock:
+            stats = dict(self.stats)
+            stats['memory_items'] = len(self._memory)
+            stats['disk_bytes'] = self._disk_bytes
+        lookups = stats['memory_hits'] + stats['disk_hits'] + stats['misses']
+        stats['hit_rate'] = (stats['memory_hits'] + stats['disk_hits']) / lookups if lookups else 0.0
+        return stats
+
+_caches = {}
+_caches_lock = threading.Lock()
+
+def get_embedding_cache(model_name):
+    """Shared cache for model_name, or None when EMBED_CACHE=0."""
+    if not EMBED_CACHE_ENABLED:
+        return None
+    cache = _caches.get(model_name)
+    if cache is None:
+        with _caches_lock:
+            cache = _caches.get(model_name)
+            if cache is None:
+                cache = EmbeddingCache(model_name)
+                _caches[model_name] = cache
+    return cache
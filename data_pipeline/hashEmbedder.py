@@ -0,0 +1,38 @@
+import hashlib
+import re
+import numpy as np
+
+HASH_EMBED_DIMENSION = 384
+_TOKEN = re.compile(r"\w+")
+
+class HashEmbedder:
+    """Deterministic stand-in for a SentenceTransformer that needs no model download.
+
+    Each lowercased word adds a signed one-hot, chosen by its hash, to the
+    text's vector, which is then L2-normalized. Texts sharing words get
+    similar vectors, so retrieval behaves plausibly and every run returns
+    the same results. Intended for load tests and offline development, not
+    for answer quality.
+    """
+
+    def __init__(self, model_name=None, dimension=HASH_EMBED_DIMENSION):
+        self.model_name = model_name
+        self.dimension = dimension
+
+    def get_sentence_embedding_dimension(self):
+        return self.dimension
+
+    def _embed(self, text):
+        vector = np.zeros(self.dimension, dtype='float32')
+        for token in _TOKEN.findall(text.lower()):
+            digest = int.from_bytes(hashlib.blake2b(token.encode('utf-8'), digest_size=8).digest(), 'little')
+            vector[digest % self.dimension] += 1.0 if digest & (1 << 63) else -1.0
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def encode(self, texts, batch_size=32, **kwargs):
+        if isinstance(texts, str):
+            return self._embed(texts)
+        if not len(texts):
+            return np.zeros((0, self.dimension), dtype='float32')
+        return np.vstack([self._embed(text) for text in texts])
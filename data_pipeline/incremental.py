@@ -0,0 +1,289 @@
+from pathlib import Path
+from functools import partial
+import faiss
+import hashlib
+import json
+import numpy as np
+import os
+import time
+from data_pipeline.readPDF import extract_documents, iter_pdf_text, list_pdfs
+from data_pipeline.textChunking import iter_chunk_spans, chunk_record, CHUNK_SIZING
+from data_pipeline.chunkStore import ChunkStore, write_chunk_store
+from data_pipeline.keywordIndex import write_keyword_index
+from data_pipeline.metadataIndex import write_metadata_index
+from data_pipeline.embedding import chunk_embeddings, VECTOR_DB_DIR, INDEX_FILE, SNAPSHOT_SOURCES
+from data_pipeline.snapshot import write_snapshot
+from data_pipeline.metrics import flush_ingest_metrics, record_ingest
+from data_pipeline.indexFactory import (build_index, index_type_of, metric_of, precision_of, prepare_vectors, remove_ids,
+                                        write_index, INDEX_TYPE, METRIC, PRECISION, PQ_NBITS)
+
+DOCUMENT_BUCKET_DIR = "document_bucket"
+MANIFEST_FILE = "manifest.json"
+MANIFEST_VERSION = 2
+# An IVF index trained on n vectors is retrained once it holds this many times n
+RETRAIN_GROWTH = float(os.getenv('RETRAIN_GROWTH', '4'))
+RETRAIN_READ_BATCH = 8192
+
+def file_sha256(path, block_size=1 << 20):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(block_size), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+def load_manifest(directory=VECTOR_DB_DIR):
+    manifest_path = Path(directory) / MANIFEST_FILE
+    if not manifest_path.exists():
+        return None
+    with open(manifest_path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+def _new_manifest(max_chunk_size, overlap, sizing):
+    return {
+        'version': MANIFEST_VERSION,
+        'max_chunk_size': max_chunk_size,
+        'overlap': overlap,
+        'sizing': sizing,
+        'next_id': 0,
+        'files': {},
+    }
+
+def _load_state(directory, max_chunk_size, overlap, sizing):
+    """Return the previous manifest, index and chunk store, or a fresh state if they can't be reused."""
+    manifest = load_manifest(directory)
+    index_path = directory / INDEX_FILE
+
+    reusable = (
+        manifest is not None
+        and manifest.get('version') == MANIFEST_VERSION
+        and manifest.get('max_chunk_size') == max_chunk_size
+        and manifest.get('overlap') == overlap
+        and manifest.get('sizing', 'chars') == sizing
+        and index_path.exists()
+        and ChunkStore.exists(directory)
+    )
+    if not reusable:
+        return _new_manifest(max_chunk_size, overlap, sizing), None, None
+
+    index = faiss.read_index(str(index_path))
+    # Manifests written before training sizes were recorded count from the index as it is now
+    manifest.setdefault('trained_on', index.ntotal)
+    manifest.setdefault('index_type', index_type_of(index))
+    return manifest, index, ChunkStore(directory)
+
+def _needs_retrain(index, manifest):
+    """Whether an IVF index has outgrown the vectors it was trained on.
+
+    Its lists (and PQ codebooks) were fit to the first ingest, which may
+    have been a single day's PDFs: too few vectors for the configured nlist,
+    or for IVF-PQ at all, in which case build_index fell back to IVF-Flat.
+    Vectors added later only fill those lists, so recall and speed drift.
+    """
+    index_type = index_type_of(index)
+    if index_type not in ('ivf_flat', 'ivf_pq'):
+        return False
+    if index.ntotal >= RETRAIN_GROWTH * max(1, manifest['trained_on']):
+        return True
+    # IVF-PQ requested but too few vectors to train it the first time
+    return manifest['index_type'] == 'ivf_pq' and index_type == 'ivf_flat' and index.ntotal >= 2 ** PQ_NBITS
+
+def _retrain(directory, index, index_type):
+    """Build a new index of index_type over every chunk in directory's store, trained on all of them.
+
+    Embeddings come from chunk_embeddings, so chunks embedded at ingestion
+    time are served from the embedding cache rather than re-encoded.
+    """
+    print(f"Retraining {index_type_of(index)} index on {index.ntotal} vectors as {index_type}")
+    store = ChunkStore(directory)
+    ids = []
+    vectors = []
+    texts = []
+    for record in store.iter_records():
+        ids.append(record['id'])
+        texts.append(record['text'])
+        if len(texts) == RETRAIN_READ_BATCH:
+            vectors.append(chunk_embeddings(texts))
+            texts = []
+    if texts:
+        vectors.append(chunk_embeddings(texts))
+    store.close()
+
+    vectors = np.vstack(vectors)
+    metric = metric_of(index)
+    rebuilt = build_index(vectors, index_type, metric, precision_of(index))
+    rebuilt.add_with_ids(prepare_vectors(vectors, metric), np.array(ids, dtype='int64'))
+    return rebuilt
+
+def _chunk_pdf(pdf_path, max_chunk_size, overlap, sizing):
+    """Stream a PDF page by page straight into the chunker. Runs inside a pool worker."""
+    try:
+        doc_chunks = list(iter_chunk_spans(iter_pdf_text(pdf_path), max_chunk_size, overlap, sizing))
+        return pdf_path, doc_chunks, None, None
+    except Exception as e:
+        return pdf_path, None, None, f"{type(e).__name__}: {e}"
+
+def _timed(iterable, stage, items):
+    """Yield from iterable, recording only the time spent waiting on it as one pass of an ingest stage."""
+    iterator = iter(iterable)
+    seconds = 0.0
+    try:
+        while True:
+            start = time.perf_counter()
+            item = next(iterator, None)
+            seconds += time.perf_counter() - start
+            if item is None:
+                return
+            yield item
+    finally:
+        record_ingest(stage, seconds, items)
+
+def _save_state(directory, manifest, index):
+    """Write everything derived from the chunk store, then the index and manifest."""
+    start = time.perf_counter()
+    write_keyword_index(directory)
+    write_metadata_index(directory)
+    write_snapshot(directory, SNAPSHOT_SOURCES)
+
+    write_index(index, directory / INDEX_FILE)
+    record_ingest('index_write', time.perf_counter() - start, index.ntotal)
+
+    tmp_path = directory / (MANIFEST_FILE + ".tmp")
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(tmp_path, directory / MANIFEST_FILE)
+    flush_ingest_metrics(directory)
+
+def incremental_ingest(bucket_dir=DOCUMENT_BUCKET_DIR, max_chunk_size=4000, overlap=200, vector_db_dir=VECTOR_DB_DIR, workers=None,
+                       index_type=INDEX_TYPE, metric=METRIC, precision=PRECISION, sizing=CHUNK_SIZING):
+    """Bring the vector index in line with the PDFs in bucket_dir, re-embedding only what changed.
+
+    Each PDF's SHA-256 is recorded in the manifest along with the FAISS IDs of
+    its chunks. Unchanged files are skipped, the vectors of modified and
+    deleted files are removed by ID, and the chunks of new and modified files
+    are embedded and added with fresh IDs. index_type, metric and precision
+    only apply when a new index is created; an existing index keeps its own.
+    An IVF index is retrained on the whole store once it has grown
+    RETRAIN_GROWTH times past the number of vectors it was trained on.
+
+    Changed files are processed one at a time as extraction yields them:
+    each document's chunks are written to the new chunk store and embedded
+    before the next one is read, so memory follows the largest document
+    rather than the whole batch.
+    """
+    bucket = Path(bucket_dir)
+    directory = Path(vector_db_dir)
+    manifest, index, chunk_store = _load_state(directory, max_chunk_size, overlap, sizing)
+    previous = manifest['files']
+
+    current = {file.name: file for file in list_pdfs(bucket)}
+
+    report = {
+        'files_skipped': 0, 'files_added': 0, 'files_modified': 0, 'files_removed': 0, 'files_failed': 0,
+        'chunks_skipped': 0, 'chunks_added': 0, 'chunks_removed': 0,
+    }
+
+    stale_ids = []
+    for name in previous:
+        if name not in current:
+            stale_ids.extend(previous[name]['chunk_ids'])
+            report['files_removed'] += 1
+
+    files = {}
+    changed = []
+    for name, path in current.items():
+        sha = file_sha256(path)
+        entry = previous.get(name)
+
+        if entry is not None and entry['sha256'] == sha:
+            files[name] = entry
+            report['files_skipped'] += 1
+            report['chunks_skipped'] += len(entry['chunk_ids'])
+        else:
+            changed.append((name, path, sha))
+
+    if not changed and not stale_ids:
+        print("Vector index is up to date")
+        _print_report(report)
+        return report
+
+    # Only unchanged files are known to be kept at this point; chunks of everything else are streamed below
+    keep_ids = [chunk_id for entry in files.values() for chunk_id in entry['chunk_ids']]
+    # Without an index to add to, embeddings are held until the end to train a new one on all of them
+    untrained = []
+    chunk_fn = partial(_chunk_pdf, max_chunk_size=max_chunk_size, overlap=overlap, sizing=sizing)
+
+    def changed_records():
+        # Pages stream straight into the chunker, so extraction and chunking are timed as one stage
+        extracted = _timed(extract_documents([path for _, path, _ in changed], workers, chunk_fn),
+                           'extract_chunk', len(changed))
+        for (name, path, sha), (_, doc_chunks, _, error) in zip(changed, extracted):
+            entry = previous.get(name)
+            if error:
+                print(f"Error extracting {name}: {error}")
+                report['files_failed'] += 1
+                if entry is not None:
+                    # Keep serving the previous version until the file extracts cleanly
+                    files[name] = entry
+                    yield from chunk_store.get_many(entry['chunk_ids'])
+                continue
+
+            if entry is not None:
+                stale_ids.extend(entry['chunk_ids'])
+                report['files_modified'] += 1
+            else:
+                report['files_added'] += 1
+
+            chunk_ids = list(range(manifest['next_id'], manifest['next_id'] + len(doc_chunks)))
+            manifest['next_id'] += len(doc_chunks)
+            files[name] = {'sha256': sha, 'chunk_ids': chunk_ids}
+            if not doc_chunks:
+                continue
+
+            records = [chunk_record(chunk_id, name, part, start, end, chunk_text)
+                       for part, (chunk_id, (chunk_text, start, end)) in enumerate(zip(chunk_ids, doc_chunks), 1)]
+            del doc_chunks
+            embeddings = chunk_embeddings([record['text'] for record in records])
+            ids = np.array(chunk_ids, dtype='int64')
+            if index is None:
+                untrained.append((embeddings, ids))
+            else:
+                index.add_with_ids(prepare_vectors(embeddings, metric_of(index)), ids)
+            report['chunks_added'] += len(records)
+            yield from records
+
+    write_chunk_store(directory, changed_records(), copy_from=chunk_store, keep_ids=keep_ids)
+
+    if untrained:
+        embeddings = np.vstack([embeddings for embeddings, _ in untrained])
+        index = build_index(embeddings, index_type, metric, precision)
+        index.add_with_ids(prepare_vectors(embeddings, metric_of(index)), np.concatenate([ids for _, ids in untrained]))
+        manifest['trained_on'] = len(embeddings)
+        manifest['index_type'] = index_type
+        del untrained, embeddings
+
+    if stale_ids:
+        if index is not None:
+            index = remove_ids(index, stale_ids)
+        report['chunks_removed'] = len(stale_ids)
+
+    if index is None:
+        # Nothing extracted into a fresh database: leave no index rather than an untrained one
+        print("No chunks to index")
+        _print_report(report)
+        return report
+
+    if _needs_retrain(index, manifest):
+        index = _retrain(directory, index, manifest['index_type'])
+        manifest['trained_on'] = index.ntotal
+
+    manifest['files'] = files
+    _save_state(directory, manifest, index)
+
+    _print_report(report)
+    return report
+
+def _print_report(report):
+    print(f"Files   skipped: {report['files_skipped']}  added: {report['files_added']}  "
+          f"modified: {report['files_modified']}  removed: {report['files_removed']}  failed: {report['files_failed']}")
+    print(f"Chunks  skipped: {report['chunks_skipped']}  added: {report['chunks_added']}  "
+          f"removed: {report['chunks_removed']}")
@@ -0,0 +1,206 @@
+import os
+import faiss
+import numpy as np
+
+INDEX_TYPE = os.getenv('INDEX_TYPE', 'flat')
+IVF_NLIST = int(os.getenv('IVF_NLIST', '1024'))
+PQ_M = int(os.getenv('PQ_M', '48'))
+PQ_NBITS = int(os.getenv('PQ_NBITS', '8'))
+HNSW_M = int(os.getenv('HNSW_M', '32'))
+HNSW_EF_CONSTRUCTION = int(os.getenv('HNSW_EF_CONSTRUCTION', '200'))
+NPROBE = int(os.getenv('NPROBE', '16'))
+EF_SEARCH = int(os.getenv('EF_SEARCH', '64'))
+METRIC = os.getenv('VECTOR_METRIC', 'l2')
+PRECISION = os.getenv('VECTOR_PRECISION', 'float32')
+INDEX_MMAP = os.getenv('INDEX_MMAP', '1') != '0'
+
+INDEX_TYPES = ('flat', 'ivf_flat', 'ivf_pq', 'hnsw')
+METRICS = {'l2': faiss.METRIC_L2, 'cosine': faiss.METRIC_INNER_PRODUCT}
+PRECISIONS = {
+    'float32': None,
+    'float16': faiss.ScalarQuantizer.QT_fp16,
+    'int8': faiss.ScalarQuantizer.QT_8bit,
+}
+
+# FAISS recommends at least this many training points per IVF list
+TRAIN_POINTS_PER_LIST = 39
+
+def _train_sample(vectors, sample_size, seed=0):
+    if len(vectors) <= sample_size:
+        return vectors
+    rng = np.random.default_rng(seed)
+    return vectors[rng.choice(len(vectors), sample_size, replace=False)]
+
+def prepare_vectors(vectors, metric=METRIC):
+    """Return float32 vectors ready to add or search, L2-normalized in place when metric is cosine."""
+    vectors = np.array(vectors, dtype='float32', order='C', copy=True)
+    if vectors.ndim == 1:
+        vectors = vectors.reshape(1, -1)
+    if metric == 'cosine':
+        faiss.normalize_L2(vectors)
+    return vectors
+
+def build_index(vectors, index_type=INDEX_TYPE, metric=METRIC, precision=PRECISION, nlist=IVF_NLIST,
+                pq_m=PQ_M, pq_nbits=PQ_NBITS, hnsw_m=HNSW_M, ef_construction=HNSW_EF_CONSTRUCTION):
+    """Create an empty ID-mapped index of index_type, trained on a sample of vectors if it needs training.
+
+    Vectors are only used for training; callers add them with add_with_ids
+    after passing them through prepare_vectors with the same metric.
+    precision selects float16 or int8 scalar-quantized storage for the flat,
+    IVF-Flat and HNSW variants; IVF-PQ is already compressed and ignores it.
+    IVF variants fall back to fewer lists, and IVF-PQ to IVF-Flat, when
+    there are too few vectors to train the requested configuration.
+    """
+    if index_type not in INDEX_TYPES:
+        raise ValueError(f"Unknown index type '{index_type}', expected one of {', '.join(INDEX_TYPES)}")
+    if metric not in METRICS:
+        raise ValueError(f"Unknown metric '{metric}', expected one of {', '.join(METRICS)}")
+    if precision not in PRECISIONS:
+        raise ValueError(f"Unknown precision '{precision}', expected one of {', '.join(PRECISIONS)}")
+
+    vectors = prepare_vectors(vectors, metric)
+    count, dimension = vectors.shape
+    faiss_metric = METRICS[metric]
+    qtype = PRECISIONS[precision]
+
+    if index_type == 'flat':
+        if qtype is None:
+            base = faiss.IndexFlat(dimension, faiss_metric)
+        else:
+            base = faiss.IndexScalarQuantizer(dimension, qtype, faiss_metric)
+            base.train(_train_sample(vectors, 100000))
+
+    elif index_type == 'hnsw':
+        if qtype is None:
+            base = faiss.IndexHNSWFlat(dimension, hnsw_m, faiss_metric)
+        else:
+            base = faiss.IndexHNSWSQ(dimension, qtype, hnsw_m, faiss_metric)
+            base.train(_train_sample(vectors, 100000))
+        base.hnsw.efConstruction = ef_construction
+
+    else:
+        nlist = max(1, min(nlist, count // TRAIN_POINTS_PER_LIST))
+        quantizer = faiss.IndexFlat(dimension, faiss_metric)
+
+        if index_type == 'ivf_pq' and (count < 2 ** pq_nbits or dimension % pq_m != 0):
+            print(f"Not enough vectors or incompatible PQ_M={pq_m} for IVF-PQ, using IVF-Flat")
+            index_type = 'ivf_flat'
+
+        if index_type == 'ivf_pq':
+            base = faiss.IndexIVFPQ(quantizer, dimension, nlist, pq_m, pq_nbits, faiss_metric)
+        elif qtype is None:
+            base = faiss.IndexIVFFlat(quantizer, dimension, nlist, faiss_metric)
+        else:
+            base = faiss.IndexIVFScalarQuantizer(quantizer, dimension, nlist, qtype, faiss_metric)
+
+        sample_size = max(nlist * TRAIN_POINTS_PER_LIST, 2 ** pq_nbits * TRAIN_POINTS_PER_LIST)
+        base.train(_train_sample(vectors, sample_size))
+
+    index = faiss.IndexIDMap2(base)
+    set_search_params(index)
+    return index
+
+def set_search_params(index, nprobe=NPROBE, ef_search=EF_SEARCH):
+    """Apply query-time knobs: nprobe for IVF indexes, efSearch for HNSW. Other index types are unchanged."""
+    try:
+        ivf = faiss.extract_index_ivf(index)
+    except RuntimeError:
+        ivf = None
+    if ivf is not None:
+        ivf.nprobe = min(nprobe, ivf.nlist)
+        return
+
+    base = _base_index(index)
+    if isinstance(base, faiss.IndexHNSW):
+        base.hnsw.efSearch = ef_search
+
+def filtered_search_params(index, ids):
+    """SearchParameters restricting a search to ids, keeping the index's current nprobe or efSearch.
+
+    The selector is applied inside the search, so a filter that matches few
+    vectors still returns up to k results instead of whatever survives
+    post-filtering.
+    """
+    selector = faiss.IDSelectorBatch(np.asarray(ids, dtype='int64'))
+    try:
+        ivf = faiss.extract_index_ivf(index)
+    except RuntimeError:
+        ivf = None
+    base = _base_index(index)
+    if ivf is not None:
+        params = faiss.SearchParametersIVF(sel=selector, nprobe=ivf.nprobe)
+    elif isinstance(base, faiss.IndexHNSW):
+        params = faiss.SearchParametersHNSW(sel=selector, efSearch=base.hnsw.efSearch)
+    else:
+        params = faiss.SearchParameters(sel=selector)
+    # The SWIG wrapper does not own sel, so keep the selector alive as long as params
+    params.referenced_objects = [selector]
+    return params
+
+def _base_index(index):
+    return faiss.downcast_index(index.index) if hasattr(index, 'index') else index
+
+def index_type_of(index):
+    base = _base_index(index)
+    if isinstance(base, faiss.IndexHNSW):
+        return 'hnsw'
+    if isinstance(base, faiss.IndexIVFPQ):
+        return 'ivf_pq'
+    if isinstance(base, faiss.IndexIVF):
+        return 'ivf_flat'
+    return 'flat'
+
+def metric_of(index):
+    return 'cosine' if index.metric_type == faiss.METRIC_INNER_PRODUCT else 'l2'
+
+def precision_of(index):
+    base = _base_index(index)
+    if isinstance(base, faiss.IndexHNSW):
+        base = faiss.downcast_index(base.storage)
+    sq = getattr(base, 'sq', None)
+    for name, qtype in PRECISIONS.items():
+        if sq is not None and qtype == sq.qtype:
+            return name
+    return 'float32'
+
+def index_memory_bytes(index):
+    return faiss.serialize_index(index).nbytes
+
+def remove_ids(index, ids):
+    """Remove ids from index, rebuilding it when the index type cannot delete in place (HNSW).
+
+    Returns the index to use afterwards, which may be a new object.
+    """
+    ids = np.asarray(ids, dtype='int64')
+    try:
+        index.remove_ids(ids)
+        return index
+    except RuntimeError:
+        pass
+
+    remove = set(ids.tolist())
+    keep = np.array([i for i in faiss.vector_to_array(index.id_map) if i not in remove], dtype='int64')
+    vectors = np.vstack([index.reconstruct(int(i)) for i in keep]) if len(keep) else np.zeros((0, index.d), dtype='float32')
+    print(f"Rebuilding {index_type_of(index)} index without {len(remove)} removed vectors")
+
+    rebuilt = build_index(vectors if len(keep) else np.zeros((1, index.d), dtype='float32'),
+                          index_type_of(index), metric_of(index), precision_of(index))
+    if len(keep):
+        rebuilt.add_with_ids(vectors, keep)
+    return rebuilt
+
+def read_index(path, mmap=INDEX_MMAP):
+    """Load an index for searching. With mmap the vector data stays in the page cache,
+    shared by every process that maps the same file instead of copied into each one."""
+    if mmap:
+        try:
+            return faiss.read_index(str(path), faiss.IO_FLAG_MMAP | faiss.IO_FLAG_READ_ONLY)
+        except RuntimeError as e:
+            print(f"Could not memory-map {path} ({e}), reading it into memory")
+    return faiss.read_index(str(path))
+
+def write_index(index, path):
+    """Write index next to path and rename it into place, so readers that mapped the old file keep a valid copy."""
+    tmp = f"{path}.tmp"
+    faiss.write_index(index, tmp)
+    os.replace(tmp, str(path))
@@ -0,0 +1,169 @@
+from pathlib import Path
+import os
+import re
+import numpy as np
+from data_pipeline.chunkStore import ChunkStore
+from data_pipeline.snapshot import load_snapshot
+
+KEYWORD_INDEX_FILE = "keywords.npz"
+BM25_K1 = float(os.getenv('BM25_K1', '1.2'))
+BM25_B = float(os.getenv('BM25_B', '0.75'))
+
+# Keeps error codes, versions and ticket IDs whole: "0x80070005", "win-11", "IT-12345"
+_TOKEN = re.compile(r"[a-z0-9]+(?:[-_.][a-z0-9]+)*")
+TICKET_ID = re.compile(r"\bIT-\d+\b", re.IGNORECASE)
+
+STOPWORDS = frozenset("""
+a an and are as at be but by can do does for from has have how i if in is it its my of on or our so that the
+their there this to was we what when where which who why will with you your
+""".split())
+
+def tokenize(text):
+    return [token for token in _TOKEN.findall(text.lower()) if token not in STOPWORDS]
+
+def ticket_ids_in(text):
+    return [match.upper() for match in TICKET_ID.findall(text)]
+
+def build_keyword_index(records):
+    """Build BM25 postings from chunk records ({'id', 'text', ...}).
+
+    Returns the arrays saved by write_keyword_index: a sorted vocabulary,
+    per-term offsets into the postings, and for each posting the document's
+    position in doc_ids plus its term frequency.
+    """
+    doc_ids = []
+    doc_lengths = []
+    postings = {}
+    for position, record in enumerate(records):
+        counts = {}
+        tokens = tokenize(record['text'])
+        for token in tokens:
+            counts[token] = counts.get(token, 0) + 1
+        for token, count in counts.items():
+            postings.setdefault(token, []).append((position, count))
+        doc_ids.append(int(record['id']))
+        doc_lengths.append(len(tokens))
+
+    terms = sorted(postings)
+    offsets = np.zeros(len(terms) + 1, dtype='int64')
+    docs = []
+    tfs = []
+    for i, term in enumerate(terms):
+        entries = postings[term]
+        offsets[i + 1] = offsets[i] + len(entries)
+        docs.extend(position for position, _ in entries)
+        tfs.extend(count for _, count in entries)
+
+    return {
+        'terms': np.array(terms, dtype='U'),
+        'offsets': offsets,
+        'postings_doc': np.array(docs, dtype='int32'),
+        'postings_tf': np.array(tfs, dtype='int32'),
+        'doc_ids': np.array(doc_ids, dtype='int64'),
+        'doc_lengths': np.array(doc_lengths, dtype='int32'),
+    }
+
+def write_keyword_index(directory):
+    """Rebuild the keyword index from the chunk store in directory."""
+    directory = Path(directory)
+    store = ChunkStore(directory)
+    arrays = build_keyword_index(store.iter_records())
+    store.close()
+
+    tmp_path = directory / (KEYWORD_INDEX_FILE + ".tmp.npz")
+    np.savez(tmp_path, **arrays)
+    os.replace(tmp_path, directory / KEYWORD_INDEX_FILE)
+    print(f"Saved keyword index with {len(arrays['terms'])} terms over {len(arrays['doc_ids'])} chunks")
+    return len(arrays['terms'])
+
+class KeywordIndex:
+    """BM25 search over the postings written by write_keyword_index."""
+
+    def __init__(self, directory, k1=BM25_K1, b=BM25_B):
+        data = load_snapshot(directory, KEYWORD_INDEX_FILE)
+        if data is None:
+            with np.load(Path(directory) / KEYWORD_INDEX_FILE) as npz:
+                data = {name: npz[name] for name in npz.files}
+        self.terms = data['terms']
+        self.offsets = data['offsets']
+        self.postings_doc = data['postings_doc']
+        self.postings_tf = data['postings_tf']
+        self.doc_ids = data['doc_ids']
+        self.doc_lengths = data['doc_lengths'].astype('float32')
+        self.k1 = k1
+        self.b = b
+        self.avg_length = float(self.doc_lengths.mean()) if len(self.doc_lengths) else 0.0
+
+    @classmethod
+    def exists(cls, directory):
+        return (Path(directory) / KEYWORD_INDEX_FILE).exists()
+
+    def __len__(self):
+        return len(self.doc_ids)
+
+    def _postings(self, term):
+        pos = int(np.searchsorted(self.terms, term))
+        if pos >= len(self.terms) or self.terms[pos] != term:
+            return None
+        start, end = self.offsets[pos], self.offsets[pos + 1]
+        return self.postings_doc[start:end], self.postings_tf[start:end]
+
+    def scores(self, query, allowed=None):
+        """BM25 score of every chunk for query, as an array aligned with doc_ids.
+
+        When allowed is given, chunks whose id is not in it score zero.
+        """
+        scores = np.zeros(len(self.doc_ids), dtype='float32')
+        if not len(self.doc_ids):
+            return scores
+        n = len(self.doc_ids)
+        for term in set(tokenize(query)):
+            postings = self._postings(term)
+            if postings is None:
+                continue
+            docs, tfs = postings
+            idf = np.log(1 + (n - len(docs) + 0.5) / (len(docs) + 0.5))
+            norm = self.k1 * (1 - self.b + self.b * self.doc_lengths[docs] / self.avg_length)
+            scores[docs] += idf * tfs * (self.k1 + 1) / (tfs + norm)
+        if allowed is not None:
+            scores[~np.isin(self.doc_ids, allowed)] = 0.0
+        return scores
+
+    def search(self, query, top_k, allowed=None):
+        """Return [(chunk_id, score)] for the top_k chunks with a non-zero score."""
+        return self._top(self.scores(query, allowed), top_k)
+
+    def search_ticket(self, query, top_k, allowed=None):
+        """Chunks that mention a ticket ID named in query, best BM25 match first. Empty if none is named."""
+        ticket_ids = ticket_ids_in(query)
+        if not ticket_ids:
+            return []
+        mentions = np.zeros(len(self.doc_ids), dtype=bool)
+        for ticket_id in ticket_ids:
+            postings = self._postings(ticket_id.lower())
+            if postings is not None:
+                mentions[postings[0]] = True
+        if not mentions.any():
+            return []
+        scores = self.scores(query, allowed)
+        if allowed is not None:
+            mentions &= np.isin(self.doc_ids, allowed)
+        # Ticket mentions outrank everything else while keeping BM25 order among themselves
+        scores = np.where(mentions, scores + 1.0, 0.0)
+        return self._top(scores, top_k)
+
+    def _top(self, scores, top_k):
+        k = min(top_k, int((scores > 0).sum()))
+        if k == 0:
+            return []
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top], kind='stable')]
+        return [(int(self.doc_ids[i]), float(scores[i])) for i in top]
+
+def reciprocal_rank_fusion(rankings, k=60):
+    """Fuse ranked lists of chunk ids by summing 1 / (k + rank). Returns ids, best first."""
+    fused = {}
+    for ranking in rankings:
+        for rank, chunk_id in enumerate(ranking):
+            fused[chunk_id] = fused.get(chunk_id, 0.0) + 1.0 / (k + rank + 1)
+    return sorted(fused, key=lambda chunk_id: -fused[chunk_id])
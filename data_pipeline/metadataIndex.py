@@ -0,0 +1,68 @@
+from pathlib import Path
+import os
+import numpy as np
+from data_pipeline.chunkStore import ChunkStore
+from data_pipeline.snapshot import load_snapshot
+
+METADATA_INDEX_FILE = "metadata.npz"
+
+def write_metadata_index(directory):
+    """Collect the filterable fields (system, day) of every chunk in directory's chunk store.
+
+    Chunks without them, such as PDF chunks, get an empty system and day -1
+    and so never match a filter.
+    """
+    directory = Path(directory)
+    store = ChunkStore(directory)
+    ids = []
+    systems = []
+    days = []
+    for record in store.iter_records():
+        ids.append(int(record['id']))
+        systems.append(str(record.get('system') or '').lower())
+        days.append(int(record['day']) if record.get('day') is not None else -1)
+    store.close()
+
+    vocabulary, codes = np.unique(np.array(systems, dtype='U'), return_inverse=True)
+    tmp_path = directory / (METADATA_INDEX_FILE + ".tmp.npz")
+    np.savez(tmp_path, ids=np.array(ids, dtype='int64'), systems=vocabulary,
+             system_codes=codes.astype('int32'), days=np.array(days, dtype='int32'))
+    os.replace(tmp_path, directory / METADATA_INDEX_FILE)
+
+class MetadataIndex:
+    """Column arrays of chunk metadata used to turn filters into the set of chunk ids to search."""
+
+    def __init__(self, directory):
+        data = load_snapshot(directory, METADATA_INDEX_FILE)
+        if data is None:
+            with np.load(Path(directory) / METADATA_INDEX_FILE) as npz:
+                data = {name: npz[name] for name in npz.files}
+        self.ids = data['ids']
+        self.systems = data['systems']
+        self.system_codes = data['system_codes']
+        self.days = data['days']
+
+    @classmethod
+    def exists(cls, directory):
+        return (Path(directory) / METADATA_INDEX_FILE).exists()
+
+    def __len__(self):
+        return len(self.ids)
+
+    def select(self, system=None, days=None):
+        """Ids of chunks matching every given filter.
+
+        system is a name or list of names, compared case-insensitively.
+        days is a single day or an inclusive (first, last) range.
+        """
+        mask = np.ones(len(self.ids), dtype=bool)
+        if system is not None:
+            names = [system] if isinstance(system, str) else list(system)
+            codes = [int(np.searchsorted(self.systems, name.lower())) for name in names]
+            codes = [code for code, name in zip(codes, names)
+                     if code < len(self.systems) and self.systems[code] == name.lower()]
+            mask &= np.isin(self.system_codes, codes)
+        if days is not None:
+            first, last = (days, days) if isinstance(days, int) else days
+            mask &= (self.days >= first) & (self.days <= last)
+        return self.ids[mask]
@@ -0,0 +1,236 @@
+from bisect import bisect_left
+from contextlib import contextmanager
+from pathlib import Path
+import contextvars
+import cProfile
+import json
+import os
+import random
+import threading
+import time
+
+METRICS_ENABLED = os.getenv('METRICS', '1') != '0'
+# Set DEBUG_PRINTS=0 to stop printing questions, answers and per-request details to stdout
+DEBUG_PRINTS = os.getenv('DEBUG_PRINTS', '1') != '0'
+# Fraction of requests run under cProfile, with stats dumped to PROFILE_DIR
+PROFILE_SAMPLE_RATE = float(os.getenv('PROFILE_SAMPLE_RATE', '0'))
+PROFILE_DIR = os.getenv('PROFILE_DIR', 'profiles')
+INGEST_METRICS_FILE = "ingest_metrics.json"
+# Upper bounds in seconds, from a chunk fetch up to a slow LLM call
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+HELP = {
+    'triage_stage_seconds': ('histogram', "Time spent in each stage of answering a question."),
+    'triage_request_seconds': ('histogram', "Time to handle an API request, by endpoint."),
+    'triage_answer_cache_total': ('counter', "Answer cache lookups by result."),
+    'triage_ingest_seconds_total': ('counter', "Time spent in each ingestion stage."),
+    'triage_ingest_items_total': ('counter', "Items processed by each ingestion stage (files, chunks or vectors)."),
+}
+
+def debug(*args):
+    if DEBUG_PRINTS:
+        print(*args)
+
+class Histogram:
+    """Cumulative-bucket latency histogram in the Prometheus layout. Callers hold the registry lock."""
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def percentile(self, q):
+        """Upper bound of the bucket holding the q-th percentile (q in 0-100), or None if empty."""
+        if not self.count:
+            return None
+        rank = q / 100 * self.count
+        seen = 0
+        for bound, count in zip(self.buckets, self.counts):
+            seen += count
+            if seen >= rank:
+                return bound
+        return float('inf')
+
+_histograms = {}
+_counters = {}
+_lock = threading.Lock()
+_trace = contextvars.ContextVar('trace', default=None)
+
+def _key(name, labels):
+    return name, tuple(sorted(labels.items()))
+
+def observe(name, value, **labels):
+    if not METRICS_ENABLED:
+        return
+    key = _key(name, labels)
+    with _lock:
+        histogram = _histograms.get(key)
+        if histogram is None:
+            histogram = _histograms[key] = Histogram()
+        histogram.observe(value)
+
+def increment(name, value=1, **labels):
+    if not METRICS_ENABLED:
+        return
+    key = _key(name, labels)
+    with _lock:
+        _counters[key] = _counters.get(key, 0) + value
+
+def record_stage(name, seconds):
+    """Record seconds spent in a request stage, and add it to the current request's trace if one is active."""
+    observe('triage_stage_seconds', seconds, stage=name)
+    trace = _trace.get()
+    if trace is not None:
+        trace.append((name, seconds))
+
+@contextmanager
+def stage(name):
+    """Time the enclosed block as request stage name (embed, search, chunk_fetch, llm, ...)."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_stage(name, time.perf_counter() - start)
+
+def start_trace():
+    """Collect the stages of the current request (thread or context). Returns a token for end_trace."""
+    return _trace.set([])
+
+def end_trace(token):
+    """Stop collecting and return [(stage, seconds)] in the order the stages finished."""
+    trace = _trace.get()
+    _trace.reset(token)
+    return trace or []
+
+def server_timing(trace, total=None):
+    """Format a trace as a Server-Timing header value, durations in milliseconds."""
+    entries = [f"{name};dur={seconds * 1000:.2f}" for name, seconds in trace]
+    if total is not None:
+        entries.append(f"total;dur={total * 1000:.2f}")
+    return ", ".join(entries)
+
+_profiling = threading.Lock()
+
+def maybe_profile(rate=PROFILE_SAMPLE_RATE):
+    """Start a cProfile for a sampled fraction of requests, one at a time. Returns the profiler or None."""
+    if rate <= 0 or random.random() >= rate or not _profiling.acquire(blocking=False):
+        return None
+    profiler = cProfile.Profile()
+    try:
+        profiler.enable()
+    except ValueError:
+        # Another profiler is already active in this process
+        _profiling.release()
+        return None
+    return profiler
+
+def save_profile(profiler, name, directory=PROFILE_DIR):
+    profiler.disable()
+    try:
+        directory = Path(directory)
+        directory.mkdir(parents=True, exist_ok=True)
+        path = directory / f"{time.strftime('%Y%m%d-%H%M%S')}-{int(time.time() * 1000) % 1000:03d}-{name}.prof"
+        profiler.dump_stats(path)
+        return path
+    finally:
+        _profiling.release()
+
+def record_ingest(stage, seconds, items=0):
+    """Count one pass of an ingestion stage (extract, chunk, embed, index_write)."""
+    increment('triage_ingest_seconds_total', seconds, stage=stage)
+    increment('triage_ingest_items_total', items, stage=stage)
+
+def flush_ingest_metrics(directory):
+    """Add this process's ingestion counters to the totals in directory and reset them.
+
+    Ingestion runs from main.py, not the server, so the counters are handed
+    over through a file next to the index that /api/metrics reads.
+    """
+    with _lock:
+        pending = {key: value for key, value in _counters.items() if key[0].startswith('triage_ingest_')}
+        for key in pending:
+            del _counters[key]
+    if not pending:
+        return
+    path = Path(directory) / INGEST_METRICS_FILE
+    totals = load_ingest_metrics(directory)
+    for (name, labels), value in pending.items():
+        stage_totals = totals.setdefault(dict(labels)['stage'], {})
+        field = 'seconds' if name == 'triage_ingest_seconds_total' else 'items'
+        stage_totals[field] = stage_totals.get(field, 0) + value
+    tmp_path = path.with_suffix(path.suffix + ".tmp")
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(totals, f, indent=2)
+    os.replace(tmp_path, path)
+
+def load_ingest_metrics(directory):
+    path = Path(directory) / INGEST_METRICS_FILE
+    if not path.exists():
+        return {}
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+def _labels(labels, extra=()):
+    pairs = list(labels) + list(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{value}"' for name, value in pairs) + "}"
+
+def _number(value):
+    return "+Inf" if value == float('inf') else repr(float(value))
+
+def render_prometheus(ingest_directory=None):
+    """All metrics in the Prometheus text exposition format."""
+    with _lock:
+        histograms = {key: (list(h.counts), h.sum, h.count, h.buckets) for key, h in _histograms.items()}
+        counters = dict(_counters)
+    if ingest_directory is not None:
+        for stage_name, totals in load_ingest_metrics(ingest_directory).items():
+            for field, name in (('seconds', 'triage_ingest_seconds_total'), ('items', 'triage_ingest_items_total')):
+                key = (name, (('stage', stage_name),))
+                counters[key] = counters.get(key, 0) + totals.get(field, 0)
+
+    lines = []
+    names = sorted({name for name, _ in histograms} | {name for name, _ in counters})
+    for name in names:
+        kind, help_text = HELP.get(name, ('untyped', name))
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} {kind}")
+        for (metric, labels), (counts, total, count, buckets) in sorted(histograms.items()):
+            if metric != name:
+                continue
+            cumulative = 0
+            for bound, bucket_count in zip(list(buckets) + [float('inf')], counts):
+                cumulative += bucket_count
+                lines.append(f"{name}_bucket{_labels(labels, [('le', _number(bound))])} {cumulative}")
+            lines.append(f"{name}_sum{_labels(labels)} {total!r}")
+            lines.append(f"{name}_count{_labels(labels)} {count}")
+        for (metric, labels), value in sorted(counters.items()):
+            if metric == name:
+                lines.append(f"{name}{_labels(labels)} {_number(value)}")
+    return "\n".join(lines) + "\n"
+
+def get_stage_summary():
+    """Count, mean and bucketed p50/p95/p99 seconds per request stage, for /api/health."""
+    with _lock:
+        items = [(dict(labels).get('stage'), h) for (name, labels), h in _histograms.items()
+                 if name == 'triage_stage_seconds']
+        return {
+            stage_name: {
+                'count': h.count,
+                'avg_seconds': h.sum / h.count if h.count else 0.0,
+                'p50_seconds': h.percentile(50),
+                'p95_seconds': h.percentile(95),
+                'p99_seconds': h.percentile(99),
+            }
+            for stage_name, h in items
+        }
@@ -1,18 +1,28 @@
 from pypdf import PdfReader
 from pathlib import Path
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
 import re
 import os
 import shutil
+import time
+from data_pipeline.metrics import record_ingest
 
-def extract_text_from_pdf(input_pdf):
+# Files submitted per pool worker ahead of the one being consumed
+EXTRACT_AHEAD = 2
+
+def iter_pdf_pages(input_pdf):
+    """Yield the raw text of each page as it is extracted."""
     with open(input_pdf, 'rb') as file:
         reader = PdfReader(file)
-
-        full_text = ""
-
         for page in reader.pages:
-            full_text += page.extract_text() or ""
+            yield page.extract_text() or ""
 
+def extract_text_from_pdf(input_pdf):
+    with open(input_pdf, 'rb') as file:
+        reader = PdfReader(file)
+        full_text = "".join(page.extract_text() or "" for page in reader.pages)
         metadata = extract_metadata(reader)
 
     return full_text, metadata
@@ -24,6 +34,34 @@ def clean_pdf_text(text):
 
     return cleaned_text
 
+def iter_clean_lines(pages):
+    """Incremental clean_pdf_text: yield cleaned, non-empty lines from a stream of page texts.
+
+    Pages are concatenated without a separator, as in extract_text_from_pdf, so
+    the unfinished last line of a page is carried over into the next one.
+    """
+    carry = ""
+    for page_text in pages:
+        lines = (carry + page_text).splitlines(keepends=True)
+        carry = ""
+        if lines and lines[-1] == lines[-1].splitlines()[0]:
+            carry = lines.pop()
+        for line in lines:
+            line = re.sub(r' +', ' ', line).strip()
+            if line:
+                yield line
+
+    line = re.sub(r' +', ' ', carry).strip()
+    if line:
+        yield line
+
+def iter_pdf_text(input_pdf):
+    """Stream the cleaned text of a PDF as pieces whose concatenation equals clean_pdf_text's output."""
+    first = True
+    for line in iter_clean_lines(iter_pdf_pages(input_pdf)):
+        yield line if first else '\n' + line
+        first = False
+
 def extract_metadata(reader):
     metadata = reader.metadata
             
@@ -37,35 +75,86 @@ def extract_metadata(reader):
         'num_pages': len(reader.pages)
     }
 
-def process_document_bucket():
-    document_bucket_dir = Path("document_bucket")
-    metadata_file = "raw_text/metadata.txt"
-    output_path = "raw_text/extracted_text.txt"
+def _extract_one(pdf_path):
+    """Extract and clean one PDF. Runs inside a pool worker, so errors are returned rather than raised."""
+    try:
+        extracted_text, metadata = extract_text_from_pdf(pdf_path)
+        return pdf_path, clean_pdf_text(extracted_text), metadata, None
+    except Exception as e:
+        return pdf_path, None, None, f"{type(e).__name__}: {e}"
+
+def extract_documents(pdf_paths, workers=None, extract_fn=_extract_one):
+    """Yield (path, cleaned_text, metadata, error) for each PDF, in the order given.
+
+    With more than one worker the files are extracted in a process pool; results
+    still come back in input order so output files are deterministic. At most
+    a few files per worker are in flight, so a slow consumer holds a bounded
+    number of finished results rather than the whole bucket. extract_fn must
+    be picklable and follow _extract_one's return shape.
+    """
+    pdf_paths = list(pdf_paths)
+    workers = workers or os.cpu_count() or 1
+    workers = min(workers, len(pdf_paths))
+
+    if workers <= 1:
+        for pdf_path in pdf_paths:
+            yield extract_fn(pdf_path)
+        return
+
+    remaining = iter(pdf_paths)
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        pending = deque(pool.submit(extract_fn, pdf_path) for pdf_path in islice(remaining, workers * EXTRACT_AHEAD))
+        while pending:
+            result = pending.popleft().result()
+            for pdf_path in islice(remaining, 1):
+                pending.append(pool.submit(extract_fn, pdf_path))
+            yield result
+
+def list_pdfs(document_bucket_dir):
+    return sorted(
+        file for file in Path(document_bucket_dir).iterdir()
+        if file.is_file() and file.suffix.lower() == '.pdf'
+    )
+
+def extract_bucket(document_bucket_dir="document_bucket", output_dir="raw_text", workers=None):
+    output_dir = Path(output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
     processed_count = 0
+    failed = []
+    start = time.perf_counter()
+
+    with open(output_dir / "metadata.txt", 'a', encoding='utf-8') as meta_out, \
+            open(output_dir / "extracted_text.txt", 'a', encoding='utf-8') as output_file:
+        for file, cleaned_text, metadata, error in extract_documents(list_pdfs(document_bucket_dir), workers):
+            if error:
+                print(f"Error extracting {file.name}: {error}")
+                failed.append(file.name)
+                continue
+
+            meta_out.write(f"\n{'='*80}\n")
+            meta_out.write(f"FILE: {file.name}\n")
+            meta_out.write(f"{'-'*80}\n")
+            for key, value in metadata.items():
+                meta_out.write(f"{key}: {value}\n")
+
+            output_file.write(f"\nDOCUMENT: {file.name}\n")
+            output_file.write(cleaned_text)
 
+            processed_count += 1
+            print("Files Processed: ", processed_count)
+
+    record_ingest('extract', time.perf_counter() - start, processed_count)
+    if failed:
+        print(f"Failed to extract {len(failed)} file(s): {', '.join(failed)}")
+    return processed_count, failed
+
+def process_document_bucket(workers=None):
     # Clear directories
     clear_directory("raw_text")
     clear_directory("chunks")
     clear_directory("vector_db")
 
-    for file in document_bucket_dir.iterdir():
-        if file.is_file() and file.suffix.lower() == '.pdf':
-            extracted_text, metadata = extract_text_from_pdf(file)
-            cleaned_text = clean_pdf_text(extracted_text)
-
-            with open(metadata_file, 'a', encoding='utf-8') as meta_out:
-                    meta_out.write(f"\n{'='*80}\n")
-                    meta_out.write(f"FILE: {file.name}\n")
-                    meta_out.write(f"{'-'*80}\n")
-                    for key, value in metadata.items():
-                        meta_out.write(f"{key}: {value}\n")
-
-            with open(output_path, 'a', encoding='utf-8') as output_file:
-                output_file.write(f"\nDOCUMENT: {file.name}\n")
-                output_file.write(cleaned_text)
-
-            processed_count += 1
-            print("Files Processed: ", processed_count)
+    return extract_bucket("document_bucket", "raw_text", workers)
 
 def clear_directory(directory_path):
     if not os.path.exists(directory_path):
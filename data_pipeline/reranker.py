@@ -0,0 +1,109 @@
+import os
+import threading
+import time
+from data_pipeline.metrics import stage
+
+RERANK_ENABLED = os.getenv('RERANK', '1') != '0'
+RERANK_MODEL = os.getenv('RERANK_MODEL', 'cross-encoder/ms-marco-MiniLM-L-6-v2')
+RERANK_CANDIDATES = int(os.getenv('RERANK_CANDIDATES', '20'))
+RERANK_MAX_CANDIDATES = int(os.getenv('RERANK_MAX_CANDIDATES', '80'))
+RERANK_MIN_SCORE = float(os.getenv('RERANK_MIN_SCORE', '0.0'))
+RERANK_BATCH_SIZE = int(os.getenv('RERANK_BATCH_SIZE', '32'))
+
+class Reranker:
+    """Scores (question, passage) pairs with a local cross-encoder, loaded on first use."""
+
+    def __init__(self, model_name=RERANK_MODEL, batch_size=RERANK_BATCH_SIZE):
+        self.model_name = model_name
+        self.batch_size = batch_size
+        self.model = None
+        self._lock = threading.Lock()
+        self.stats = {
+            'model_load_seconds': 0.0,
+            'queries': 0,
+            'pairs': 0,
+            'deepened': 0,
+            'seconds_total': 0.0,
+        }
+
+    def _load_model(self):
+        with self._lock:
+            if self.model is None:
+                from sentence_transformers import CrossEncoder
+                start = time.perf_counter()
+                self.model = CrossEncoder(self.model_name)
+                self.stats['model_load_seconds'] = time.perf_counter() - start
+
+    def warm(self):
+        if self.model is None:
+            self._load_model()
+
+    def score(self, query, passages):
+        if not passages:
+            return []
+        self.warm()
+        start = time.perf_counter()
+        with stage('rerank'):
+            scores = self.model.predict([(query, passage) for passage in passages], batch_size=self.batch_size)
+        with self._lock:
+            self.stats['pairs'] += len(passages)
+            self.stats['seconds_total'] += time.perf_counter() - start
+        return [float(score) for score in scores]
+
+    def rerank(self, query, records, scored=None):
+        """Return records best first, each with a 'rerank_score'.
+
+        scored maps chunk id to a score already computed for this query, so
+        records seen in an earlier, shallower pass are not scored again.
+        """
+        scored = {} if scored is None else scored
+        fresh = [record for record in records if record['id'] not in scored]
+        for record, score in zip(fresh, self.score(query, [record['text'] for record in fresh])):
+            scored[record['id']] = score
+        return sorted((dict(record, rerank_score=scored[record['id']]) for record in records),
+                      key=lambda record: -record['rerank_score'])
+
+    def retrieve(self, query, search_fn, candidates=RERANK_CANDIDATES, max_candidates=RERANK_MAX_CANDIDATES,
+                 min_score=RERANK_MIN_SCORE):
+        """Fetch candidates with search_fn(query, k), re-rank them, and fetch deeper if none look relevant.
+
+        The candidate depth doubles, up to max_candidates, while the best
+        score is below min_score. Most questions stop at the first depth, so
+        the deeper and slower passes are only paid for the hard ones.
+        """
+        scored = {}
+        depth = candidates
+        while True:
+            records = search_fn(query, depth)
+            ranked = self.rerank(query, records, scored)
+            best = ranked[0]['rerank_score'] if ranked else None
+            if best is None or best >= min_score or depth >= max_candidates or len(records) < depth:
+                break
+            depth = min(depth * 2, max_candidates)
+            with self._lock:
+                self.stats['deepened'] += 1
+        with self._lock:
+            self.stats['queries'] += 1
+        return ranked
+
+    def get_stats(self):
+        with self._lock:
+            stats = dict(self.stats)
+        stats['model'] = self.model_name
+        stats['avg_query_seconds'] = stats['seconds_total'] / stats['queries'] if stats['queries'] else 0.0
+        stats['avg_pairs_per_query'] = stats['pairs'] / stats['queries'] if stats['queries'] else 0.0
+        return stats
+
+_reranker = None
+_reranker_lock = threading.Lock()
+
+def get_reranker():
+    """Shared Reranker, or None when RERANK=0."""
+    global _reranker
+    if not RERANK_ENABLED:
+        return None
+    if _reranker is None:
+        with _reranker_lock:
+            if _reranker is None:
+                _reranker = Reranker()
+    return _reranker
@@ -0,0 +1,276 @@
+from pathlib import Path
+from multiprocessing.connection import answer_challenge, deliver_challenge, wait, Client, Connection
+import hashlib
+import json
+import os
+import socket
+import subprocess
+import sys
+import threading
+import time
+import faiss
+import numpy as np
+from data_pipeline.chunkStore import ChunkStore
+from data_pipeline.metrics import flush_ingest_metrics, record_ingest
+from data_pipeline.indexFactory import (build_index, filtered_search_params, index_type_of, metric_of, precision_of,
+                                        prepare_vectors, read_index, set_search_params, write_index,
+                                        INDEX_TYPE, METRIC, PRECISION, METRICS, NPROBE, EF_SEARCH)
+
+SHARD_DIR = "shards"
+SHARD_MANIFEST = "shards.json"
+VECTOR_SHARDS = int(os.getenv('VECTOR_SHARDS', '0'))
+# A single shard would only add a process hop, so sharding starts at two
+SHARDING_ENABLED = VECTOR_SHARDS > 1
+SHARD_BY = os.getenv('SHARD_BY', 'day')
+SHARD_THREADS = int(os.getenv('SHARD_THREADS', '1'))
+SHARD_START_TIMEOUT = float(os.getenv('SHARD_START_TIMEOUT', '300'))
+SHARD_KEYS = ('source', 'day')
+
+def shard_of(record, num_shards, by=SHARD_BY):
+    """Shard for a chunk record: its day for per-ticket chunks, otherwise a stable hash of its source document.
+
+    Every per-ticket chunk has the same source (the ticket export), so by='day'
+    (the default) spreads tickets round-robin by day and only hashes sources
+    for chunks without one, such as PDF chunks. by='source' hashes every
+    chunk by source. Chunks of the same document always land together, so a
+    document is never split across shards.
+    """
+    if by == 'day' and record.get('day') is not None:
+        return int(record['day']) % num_shards
+    digest = hashlib.sha1(str(record.get('source', '')).encode('utf-8')).digest()
+    return int.from_bytes(digest[:8], 'little') % num_shards
+
+def write_shards(directory, vectors, ids, assignment, num_shards, index_type=INDEX_TYPE, metric=METRIC,
+                 precision=PRECISION, by=SHARD_BY, source_mtime=None):
+    """Build one index per shard from vectors, where assignment[i] is the shard of ids[i]."""
+    shard_dir = Path(directory) / SHARD_DIR
+    shard_dir.mkdir(parents=True, exist_ok=True)
+    vectors = prepare_vectors(vectors, metric)
+    ids = np.asarray(ids, dtype='int64')
+    assignment = np.asarray(assignment)
+
+    counts = []
+    for shard in range(num_shards):
+        rows = np.flatnonzero(assignment == shard)
+        # An empty shard still needs a trained index of the right dimension
+        index = build_index(vectors[rows] if len(rows) else vectors[:1], index_type, metric, precision)
+        if len(rows):
+            index.add_with_ids(vectors[rows], ids[rows])
+        write_index(index, shard_dir / f"shard_{shard}.index")
+        counts.append(int(len(rows)))
+
+    manifest = {
+        'num_shards': num_shards,
+        'by': by,
+        'metric': metric,
+        'counts': counts,
+        'source_mtime': source_mtime,
+    }
+    tmp_path = shard_dir / (SHARD_MANIFEST + ".tmp")
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(tmp_path, shard_dir / SHARD_MANIFEST)
+    print(f"Wrote {num_shards} shards by {by}: {counts}")
+    return manifest
+
+def build_shards(directory, num_shards=VECTOR_SHARDS, by=SHARD_BY):
+    """Split the chunks of directory's vector database into num_shards shard indexes.
+
+    Embeddings come from chunk_embeddings, so chunks that were embedded at
+    ingestion time are served from the embedding cache rather than re-encoded.
+    Shards use the same index type, metric and precision as the main index.
+    """
+    if by not in SHARD_KEYS:
+        raise ValueError(f"Unknown shard key '{by}', expected one of {', '.join(SHARD_KEYS)}")
+    # Imported here because embedding imports this module for ShardedSearcher
+    from data_pipeline.embedding import chunk_embeddings, INDEX_FILE
+
+    directory = Path(directory)
+    index_path = directory / INDEX_FILE
+    main_index = read_index(index_path)
+    index_type, metric, precision = index_type_of(main_index), metric_of(main_index), precision_of(main_index)
+    del main_index
+
+    store = ChunkStore(directory)
+    ids = []
+    texts = []
+    assignment = []
+    for record in store.iter_records():
+        ids.append(record['id'])
+        texts.append(record['text'])
+        assignment.append(shard_of(record, num_shards, by))
+    store.close()
+
+    vectors = chunk_embeddings(texts)
+    start = time.perf_counter()
+    manifest = write_shards(directory, vectors, ids, assignment, num_shards, index_type, metric, precision, by,
+                            source_mtime=os.stat(index_path).st_mtime_ns)
+    record_ingest('index_write', time.perf_counter() - start, len(ids))
+    flush_ingest_metrics(directory)
+    return manifest
+
+def load_shard_manifest(directory):
+    path = Path(directory) / SHARD_DIR / SHARD_MANIFEST
+    if not path.exists():
+        return None
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+def _serve_shard(path, nprobe, ef_search, threads, conn):
+    """Worker loop: answer (vectors, k, allowed ids) requests on conn until it receives None or the coordinator goes away."""
+    faiss.omp_set_num_threads(threads)
+    try:
+        index = read_index(path)
+        set_search_params(index, nprobe, ef_search)
+    except Exception as e:
+        conn.send(e)
+        return
+    conn.send(index.ntotal)
+    while True:
+        try:
+            request = conn.recv()
+        except EOFError:
+            return
+        if request is None:
+            return
+        vectors, k, allowed = request
+        try:
+            params = filtered_search_params(index, allowed) if allowed is not None else None
+            conn.send(index.search(vectors, k, params=params))
+        except Exception as e:
+            conn.send(e)
+
+class ShardedSearcher:
+    """Scatter-gather search over shard indexes, each held by its own worker process.
+
+    A search sends the query vectors to every shard, collects each shard's
+    top k and merges them into one top k. Workers search in parallel, so a
+    query uses one core per shard. Requests are serialized per searcher;
+    callers batch queries (see MicroBatcher) to keep every shard busy.
+
+    Workers are started as "python -m data_pipeline.shardedIndex" and connect
+    back over an authenticated localhost socket. Unlike multiprocessing
+    spawn, they do not re-import the caller's __main__ (and with it torch and
+    the embedding model), so they start in the time it takes to read a shard.
+    If a worker exits or fails to load its shard, or they are not all ready
+    within start_timeout seconds, every worker is killed and RuntimeError
+    is raised.
+    """
+
+    def __init__(self, directory, nprobe=NPROBE, ef_search=EF_SEARCH, threads=SHARD_THREADS,
+                 start_timeout=SHARD_START_TIMEOUT):
+        self.directory = Path(directory)
+        self.manifest = load_shard_manifest(directory)
+        if self.manifest is None:
+            raise FileNotFoundError(f"No shard manifest in {self.directory / SHARD_DIR}")
+        self.num_shards = self.manifest['num_shards']
+        self.metric_type = METRICS[self.manifest['metric']]
+        self.ntotal = sum(self.manifest['counts'])
+        self._lock = threading.Lock()
+        self._processes = []
+        self._conns = []
+        try:
+            self._start_workers(nprobe, ef_search, threads, start_timeout)
+        except BaseException:
+            self._kill()
+            raise
+
+    def _start_workers(self, nprobe, ef_search, threads, start_timeout):
+        authkey = os.urandom(16)
+        env = dict(os.environ, SHARD_AUTHKEY=authkey.hex())
+        package_root = Path(__file__).resolve().parent.parent
+        deadline = time.monotonic() + start_timeout
+        self._conns = [None] * self.num_shards
+        loading = {}
+        ready = 0
+        with socket.create_server(('127.0.0.1', 0)) as server:
+            port = server.getsockname()[1]
+            for shard in range(self.num_shards):
+                path = (self.directory / SHARD_DIR / f"shard_{shard}.index").resolve()
+                args = [sys.executable, '-m', 'data_pipeline.shardedIndex', str(path), str(port), str(shard),
+                        str(nprobe), str(ef_search), str(threads)]
+                self._processes.append(subprocess.Popen(args, cwd=package_root, env=env))
+
+            # Poll rather than block in accept/recv, so a worker that dies before reporting in is noticed
+            while ready < self.num_shards:
+                for source in wait([server, *loading], timeout=0.5):
+                    if source is server:
+                        sock, _ = server.accept()
+                        sock.setblocking(True)
+                        conn = Connection(sock.detach())
+                        deliver_challenge(conn, authkey)
+                        answer_challenge(conn, authkey)
+                        shard = conn.recv()
+                        self._conns[shard] = conn
+                        loading[conn] = shard
+                    else:
+                        shard = loading.pop(source)
+                        loaded = source.recv()
+                        if isinstance(loaded, Exception):
+                            raise RuntimeError(f"Shard {shard} failed to load: {loaded}")
+                        ready += 1
+                if ready == self.num_shards:
+                    break
+                for shard, process in enumerate(self._processes):
+                    if process.poll() is not None:
+                        raise RuntimeError(f"Shard worker {shard} exited with code {process.returncode} before it was ready")
+                if time.monotonic() > deadline:
+                    raise RuntimeError(f"Shard workers not ready after {start_timeout:.0f}s")
+
+    def _kill(self):
+        for conn in self._conns:
+            if conn is not None:
+                conn.close()
+        for process in self._processes:
+            process.kill()
+            process.wait()
+        self._conns = []
+        self._processes = []
+
+    @classmethod
+    def exists(cls, directory):
+        return load_shard_manifest(directory) is not None
+
+    def search(self, vectors, k, allowed=None):
+        """Same return shape as faiss Index.search: (distances, ids), best first, -1 ids for missing results."""
+        vectors = np.ascontiguousarray(vectors, dtype='float32')
+        with self._lock:
+            for conn in self._conns:
+                conn.send((vectors, k, allowed))
+            replies = [conn.recv() for conn in self._conns]
+        for reply in replies:
+            if isinstance(reply, Exception):
+                raise reply
+
+        distances = np.hstack([d for d, _ in replies])
+        ids = np.hstack([i for _, i in replies])
+        # Inner product ranks high to low, L2 distance low to high; empty slots always sort last
+        if self.metric_type == faiss.METRIC_INNER_PRODUCT:
+            keys = np.where(ids >= 0, -distances, np.inf)
+        else:
+            keys = np.where(ids >= 0, distances, np.inf)
+        order = np.argsort(keys, axis=1, kind='stable')[:, :k]
+        return np.take_along_axis(distances, order, axis=1), np.take_along_axis(ids, order, axis=1)
+
+    def close(self):
+        with self._lock:
+            for conn in self._conns:
+                try:
+                    conn.send(None)
+                    conn.close()
+                except (BrokenPipeError, OSError):
+                    pass
+            for process in self._processes:
+                try:
+                    process.wait(timeout=5)
+                except subprocess.TimeoutExpired:
+                    process.kill()
+            self._conns = []
+            self._processes = []
+
+if __name__ == '__main__':
+    # Shard worker started by ShardedSearcher
+    path, port, shard, nprobe, ef_search, threads = sys.argv[1:]
+    conn = Client(('127.0.0.1', int(port)), authkey=bytes.fromhex(os.environ['SHARD_AUTHKEY']))
+    conn.send(int(shard))
+    _serve_shard(path, int(nprobe), int(ef_search), int(threads), conn)
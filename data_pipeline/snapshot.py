@@ -0,0 +1,68 @@
+from pathlib import Path
+import json
+import os
+import shutil
+import sys
+import numpy as np
+
+SNAPSHOT_DIR = "snapshot"
+SNAPSHOT_MANIFEST = "snapshot.json"
+SNAPSHOT_ENABLED = os.getenv('SNAPSHOT', '1') != '0'
+
+def write_snapshot(directory, sources):
+    """Unpack the .npz files named in sources into one .npy per array under directory/snapshot.
+
+    np.load cannot memory-map arrays inside an .npz, so every process that
+    loads the keyword or metadata index would otherwise read and hold its own
+    copy. The .npy files are opened with mmap_mode='r' instead: booting only
+    maps them, and forked or respawned workers share the pages through the
+    OS page cache. The manifest records each source's mtime, so a snapshot
+    left behind by an older ingestion is ignored.
+    """
+    directory = Path(directory)
+    tmp_dir = directory / (SNAPSHOT_DIR + ".tmp")
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    tmp_dir.mkdir(parents=True)
+
+    manifest = {}
+    for source in sources:
+        path = directory / source
+        if not path.exists():
+            continue
+        mtime = os.stat(path).st_mtime_ns
+        with np.load(path) as data:
+            names = list(data.files)
+            for name in names:
+                np.save(tmp_dir / f"{source}.{name}.npy", data[name])
+        manifest[source] = {'mtime': mtime, 'arrays': names}
+    with open(tmp_dir / SNAPSHOT_MANIFEST, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=2)
+
+    # Processes still mapping the old files keep them until they reload; new loads see the new directory
+    snapshot_dir = directory / SNAPSHOT_DIR
+    shutil.rmtree(snapshot_dir, ignore_errors=True)
+    os.replace(tmp_dir, snapshot_dir)
+    return manifest
+
+def load_snapshot(directory, source):
+    """Memory-mapped arrays of source (an .npz file name) from the snapshot, or None if missing or stale."""
+    if not SNAPSHOT_ENABLED:
+        return None
+    directory = Path(directory)
+    snapshot_dir = directory / SNAPSHOT_DIR
+    try:
+        with open(snapshot_dir / SNAPSHOT_MANIFEST, 'r', encoding='utf-8') as f:
+            entry = json.load(f).get(source)
+        if entry is None or entry['mtime'] != os.stat(directory / source).st_mtime_ns:
+            return None
+        return {name: np.load(snapshot_dir / f"{source}.{name}.npy", mmap_mode='r') for name in entry['arrays']}
+    except (OSError, ValueError):
+        return None
+
+if __name__ == '__main__':
+    # Snapshot an existing vector database without re-ingesting: python -m data_pipeline.snapshot [vector_db]
+    from data_pipeline.keywordIndex import KEYWORD_INDEX_FILE
+    from data_pipeline.metadataIndex import METADATA_INDEX_FILE
+    target = sys.argv[1] if len(sys.argv) > 1 else "vector_db"
+    written = write_snapshot(target, (KEYWORD_INDEX_FILE, METADATA_INDEX_FILE))
+    print(f"Snapshot of {', '.join(written) or 'nothing'} written to {Path(target) / SNAPSHOT_DIR}")
@@ -1,63 +1,296 @@
+import os
 import re
+import time
 from pathlib import Path
 from typing import List
+from data_pipeline.chunkStore import write_chunk_store
+from data_pipeline.contextAssembler import estimate_tokens
+from data_pipeline.metrics import record_ingest
 
-def chunk_documents(input_file, output_dir, max_chunk_size=4000, overlap=200):
-    with open(input_file, 'r', encoding='utf-8') as f:
-        content = f.read()
+# 'chars' sizes chunks in characters, 'tokens' in estimated LLM tokens (see contextAssembler.estimate_tokens)
+CHUNK_SIZING = os.getenv('CHUNK_SIZING', 'chars')
+SIZINGS = {'chars': len, 'tokens': estimate_tokens}
 
-    doc_pattern = r"DOCUMENT:\s*(.*)"
-    matches = list(re.finditer(doc_pattern, content))
-    
-    documents = {}
+_DOC_HEADER = re.compile(r"DOCUMENT:\s*(.*)")
 
-    for i, match in enumerate(matches):
-        raw_name = match.group(1).strip()
-        doc_label = raw_name if raw_name else f"document_{i+1}"
-        
-        start_index = match.end()
-        end_index = matches[i+1].start() if i + 1 < len(matches) else len(content)
-        doc_text = content[start_index:end_index].strip()
+def _iter_documents(lines):
+    """Yield (name, body_lines) for each DOCUMENT section. Each body must be consumed before the next."""
+    header = None
+    for line in lines:
+        header = _DOC_HEADER.match(line)
+        if header:
+            break
 
-        doc_key = f"DOCUMENT_{i+1}_{doc_label}"
+    while header is not None:
+        name = header.group(1).strip()
+        if not name:
+            # The header regex lets \s* run past the line end, taking the next non-blank line as the name
+            for line in lines:
+                if line.strip():
+                    name = line.strip()
+                    break
 
-        if len(doc_text) <= max_chunk_size:
-            documents[doc_key] = [doc_text]
-        else:
-            documents[doc_key] = _split_large_document(doc_text, max_chunk_size, overlap)
-    
+        following = []
+
+        def body():
+            for line in lines:
+                match = _DOC_HEADER.match(line)
+                if match:
+                    following.append(match)
+                    return
+                yield line
+
+        body_lines = body()
+        yield name, body_lines
+        for _ in body_lines:
+            pass
+        header = following[0] if following else None
+
+def chunk_documents(input_file, output_dir, max_chunk_size=4000, overlap=200, sizing=CHUNK_SIZING):
+    """Chunk extracted_text.txt one document at a time into a chunk store in output_dir.
+
+    Chunks are streamed into the store as they are produced and numbered
+    from 0 in document order. Returns the number of chunks per document key.
+    """
     output_path = Path(output_dir)
     output_path.mkdir(exist_ok=True)
-    
-    total_chunks = 0
-    for doc_name, chunks in documents.items():
-        clean_name = "".join([c if c.isalnum() or c in (' ', '_', '-') else '_' for c in doc_name])
-        
-        for i, chunk_text in enumerate(chunks):
-            if len(chunks) == 1:
-                filename = f"{clean_name}.txt"
-            else:
-                filename = f"{clean_name}_part{i+1}.txt"
-            
-            filepath = output_path / filename
-            with open(filepath, 'w', encoding='utf-8') as f:
-                f.write(chunk_text)
-            total_chunks += 1
 
-    _write_summary(output_path, documents, max_chunk_size, overlap, total_chunks)
-    
+    documents = {}
+
+    def records(f):
+        chunk_id = 0
+        for i, (raw_name, body_lines) in enumerate(_iter_documents(f)):
+            doc_label = raw_name if raw_name else f"document_{i+1}"
+            doc_key = f"DOCUMENT_{i+1}_{doc_label}"
+            documents[doc_key] = 0
+
+            for part, (chunk_text, start, end) in enumerate(iter_chunk_spans(body_lines, max_chunk_size, overlap, sizing), 1):
+                documents[doc_key] = part
+                yield chunk_record(chunk_id, doc_label, part, start, end, chunk_text)
+                chunk_id += 1
+
+    start = time.perf_counter()
+    with open(input_file, 'r', encoding='utf-8') as f:
+        total_chunks = write_chunk_store(output_path, records(f))
+    record_ingest('chunk', time.perf_counter() - start, total_chunks)
+
+    _write_summary(output_path, documents, max_chunk_size, overlap, total_chunks, sizing)
+
     print(f"Processed {len(documents)} documents")
     print(f"Created {total_chunks} chunks")
     return documents
 
-def _write_summary(output_path, documents, max_chunk_size, overlap, total_chunks):
+def chunk_record(chunk_id, source, part, start, end, text):
+    return {'id': chunk_id, 'source': source, 'part': part, 'start': start, 'end': end, 'text': text}
+
+def split_document(doc_text, max_chunk_size=4000, overlap=200):
+    if len(doc_text) <= max_chunk_size:
+        return [doc_text]
+    return _split_large_document(doc_text, max_chunk_size, overlap)
+
+_SENTENCE_BREAK = re.compile(r'(?<=[.!?])\s+')
+_WHITESPACE = re.compile(r'\s+')
+_WORD = re.compile(r'\S+')
+
+def iter_chunks(pieces, max_chunk_size=4000, overlap=200, sizing=CHUNK_SIZING):
+    """Streaming split_document: yield chunks from an iterable of text pieces.
+
+    Produces the same chunks as split_document on the concatenated text when
+    that text has no blank-line paragraph breaks, which holds for cleaned PDF
+    text. Memory is bounded by roughly one piece plus one chunk.
+    """
+    for chunk_text, _, _ in iter_chunk_spans(pieces, max_chunk_size, overlap, sizing):
+        yield chunk_text
+
+def iter_chunk_spans(pieces, max_chunk_size=4000, overlap=200, sizing=CHUNK_SIZING):
+    """Like iter_chunks, but yield (chunk_text, start, end) with character offsets into the stripped text.
+
+    sizing is 'chars' (the default, matching split_document) or 'tokens', in
+    which case max_chunk_size and overlap count estimated LLM tokens.
+    """
+    if sizing not in SIZINGS:
+        raise ValueError(f"Unknown chunk sizing '{sizing}', expected one of {', '.join(SIZINGS)}")
+    length = SIZINGS[sizing]
+
+    pieces = iter(pieces)
+    head = []
+    head_size = 0
+    # A text never has more tokens than characters, so it can only be too long once it has more
+    # than max_chunk_size characters; re-measure at doubling sizes to keep this linear
+    check_at = max_chunk_size
+    for piece in pieces:
+        head.append(piece)
+        head_size += len(piece)
+        if head_size > check_at:
+            if length(''.join(head).strip()) > max_chunk_size:
+                break
+            check_at = head_size * 2
+    else:
+        text = ''.join(head).strip()
+        if length(text) <= max_chunk_size:
+            if text:
+                yield text, 0, len(text)
+            return
+
+    chunker = _StreamingChunker(max_chunk_size, overlap, length)
+    yield from chunker.feed(''.join(head).lstrip())
+    for piece in pieces:
+        yield from chunker.feed(piece)
+    yield from chunker.finish()
+
+class _StreamingChunker:
+    """Incremental form of _split_by_sentences, falling back to _split_by_words for long sentences.
+
+    Works on offsets into a single text buffer: sentences and words are held
+    as (start, end, size) and only sliced out when a chunk is emitted, so
+    every chunk knows where it came from in the source text. The buffer is
+    trimmed once the text before the oldest held unit is at least half of it,
+    which keeps each feed linear in the size of the piece.
+    """
+
+    def __init__(self, max_size, overlap, length=len):
+        self.max_size = max_size
+        self.overlap = overlap
+        self.length = length
+        self.separator = length(' ')
+        self.buffer = ""
+        self.base = 0
+        self.pos = 0
+        self.sentences = []
+        self.sentences_size = 0
+        self.in_long_sentence = False
+        self.words = []
+        self.words_size = 0
+
+    def _size(self, start, end):
+        if self.length is len:
+            return end - start
+        return self.length(self.buffer[start - self.base:end - self.base])
+
+    def _join(self, units):
+        buffer, base = self.buffer, self.base
+        return ' '.join(buffer[start - base:end - base] for start, end, _ in units), units[0][0], units[-1][1]
+
+    def _trim(self):
+        keep = self.pos
+        if self.sentences:
+            keep = min(keep, self.sentences[0][0])
+        if self.words:
+            keep = min(keep, self.words[0][0])
+        drop = keep - self.base
+        if drop and drop * 2 >= len(self.buffer):
+            self.buffer = self.buffer[drop:]
+            self.base = keep
+
+    def feed(self, text):
+        self._trim()
+        self.buffer += text
+        buffer, base = self.buffer, self.base
+        while True:
+            match = _SENTENCE_BREAK.search(buffer, self.pos - base)
+            if match is None or match.end() == len(buffer):
+                break
+            start = self.pos
+            self.pos = base + match.end()
+            yield from self._end_sentence(start, base + match.start())
+
+        open_chars = len(buffer) - (self.pos - base)
+        if not self.in_long_sentence and open_chars > self.max_size:
+            end = base + len(buffer.rstrip())
+            if end > self.pos and self._size(self.pos, end) > self.max_size:
+                # The open sentence can only grow, so it is already known to need word splitting
+                self.in_long_sentence = True
+                yield from self._flush_sentences()
+
+        if self.in_long_sentence:
+            last_gap = None
+            for last_gap in _WHITESPACE.finditer(buffer, self.pos - base):
+                pass
+            if last_gap is not None and last_gap.end() < len(buffer):
+                words = [(base + m.start(), base + m.end())
+                         for m in _WORD.finditer(buffer, self.pos - base, last_gap.start())]
+                self.pos = base + last_gap.end()
+                yield from self._add_words(words)
+
+    def finish(self):
+        start = self.pos
+        end = self.base + len(self.buffer.rstrip())
+        self.pos = self.base + len(self.buffer)
+        if end > start or self.in_long_sentence:
+            yield from self._end_sentence(start, max(start, end))
+        yield from self._flush_sentences()
+
+    def _flush_sentences(self):
+        if self.sentences:
+            yield self._join(self.sentences)
+        self.sentences = []
+        self.sentences_size = 0
+
+    def _flush_words(self):
+        if self.words:
+            yield self._join(self.words)
+        self.words = []
+        self.words_size = 0
+
+    def _end_sentence(self, start, end):
+        sentence_size = self._size(start, end)
+
+        if self.in_long_sentence or sentence_size > self.max_size:
+            yield from self._flush_sentences()
+            offset = start - self.base
+            yield from self._add_words([(self.base + m.start(), self.base + m.end())
+                                        for m in _WORD.finditer(self.buffer, offset, end - self.base)])
+            yield from self._flush_words()
+            self.in_long_sentence = False
+
+        elif self.sentences_size + sentence_size + self.separator > self.max_size and self.sentences:
+            yield self._join(self.sentences)
+
+            tail = self.sentences[-2:]
+            overlap_size = sum(size for _, _, size in tail) + self.separator * (len(tail) - 1)
+            unit = (start, end, sentence_size)
+            if overlap_size and overlap_size < self.overlap:
+                self.sentences = tail + [unit]
+                self.sentences_size = overlap_size + sentence_size + self.separator
+            else:
+                self.sentences = [unit]
+                self.sentences_size = sentence_size
+        else:
+            self.sentences.append((start, end, sentence_size))
+            self.sentences_size += sentence_size + self.separator
+
+    def _add_words(self, words):
+        for start, end in words:
+            word_size = self._size(start, end) + self.separator
+            unit = (start, end, word_size - self.separator)
+
+            if self.words_size + word_size > self.max_size and self.words:
+                yield self._join(self.words)
+
+                overlap_words = []
+                overlap_size = 0
+                for w in reversed(self.words):
+                    if overlap_size + w[2] + self.separator < self.overlap:
+                        overlap_words.append(w)
+                        overlap_size += w[2] + self.separator
+                    else:
+                        break
+                overlap_words.reverse()
+
+                self.words = overlap_words + [unit]
+                self.words_size = overlap_size + word_size
+            else:
+                self.words.append(unit)
+                self.words_size += word_size
+
+def _write_summary(output_path, documents, max_chunk_size, overlap, total_chunks, sizing):
     summary_path = output_path / "_chunking_summary.txt"
     with open(summary_path, 'w', encoding='utf-8') as f:
         f.write(f"Chunking Summary\n{'='*80}\n")
-        f.write(f"Max size: {max_chunk_size} | Overlap: {overlap}\n")
+        f.write(f"Max size: {max_chunk_size} | Overlap: {overlap}" + (f" | Sizing: {sizing}" if sizing != 'chars' else "") + "\n")
         f.write(f"Docs: {len(documents)} | Chunks: {total_chunks}\n\n")
-        for doc_name, chunks in documents.items():
-            f.write(f"{doc_name}: {len(chunks)} chunk(s)\n")
+        for doc_name, chunk_count in documents.items():
+            f.write(f"{doc_name}: {chunk_count} chunk(s)\n")
 
 def _split_large_document(text: str, max_size: int, overlap: int) -> List[str]:
     chunks = []
@@ -149,10 +382,11 @@ def _split_by_words(text: str, max_size: int, overlap: int) -> List[str]:
             overlap_size = 0
             for w in reversed(current_chunk):
                 if overlap_size + len(w) + 1 < overlap:
-                    overlap_words.insert(0, w)
+                    overlap_words.append(w)
                     overlap_size += len(w) + 1
                 else:
                     break
+            overlap_words.reverse()
             
             current_chunk = overlap_words + [word]
             current_size = overlap_size + word_size
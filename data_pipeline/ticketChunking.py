@@ -0,0 +1,48 @@
+from pathlib import Path
+import time
+from data_pipeline.ticketStore import iter_tickets, TICKETS_JSON
+from data_pipeline.chunkStore import write_chunk_store
+from data_pipeline.embedding import chunk_embeddings, load_chunks, save_embeddings, VECTOR_DB_DIR
+from data_pipeline.incremental import MANIFEST_FILE
+from data_pipeline.metrics import record_ingest
+
+def ticket_text(ticket):
+    return (
+        f"Ticket {ticket['ticket_id']} (System: {ticket.get('system', 'Unknown')}, Day {ticket.get('day', '?')})\n"
+        f"Issue: {ticket.get('issue', '')}\n"
+        f"Resolution: {ticket.get('resolution', '')}"
+    )
+
+def iter_ticket_records(json_filepath=TICKETS_JSON):
+    """One chunk record per ticket, carrying its ticket_id, system and day alongside the text."""
+    source = Path(json_filepath).name
+    for chunk_id, ticket in enumerate(iter_tickets(json_filepath)):
+        text = ticket_text(ticket)
+        yield {
+            'id': chunk_id,
+            'source': source,
+            'part': 1,
+            'start': 0,
+            'end': len(text),
+            'text': text,
+            'ticket_id': ticket['ticket_id'],
+            'system': ticket.get('system'),
+            'day': ticket.get('day'),
+        }
+
+def ingest_tickets(json_filepath=TICKETS_JSON, vector_db_dir=VECTOR_DB_DIR):
+    """Rebuild the vector database from the ticket export, one chunk per ticket.
+
+    Replaces any PDF-based index. The incremental manifest is removed, so the
+    next incremental run rebuilds from the PDFs instead of patching this index.
+    """
+    directory = Path(vector_db_dir)
+    start = time.perf_counter()
+    count = write_chunk_store(directory, iter_ticket_records(json_filepath))
+    record_ingest('chunk', time.perf_counter() - start, count)
+    print(f"Created {count} ticket chunks from {json_filepath}")
+
+    (directory / MANIFEST_FILE).unlink(missing_ok=True)
+    ids, texts = load_chunks(directory)
+    save_embeddings(chunk_embeddings(texts), ids, directory)
+    return count
@@ -0,0 +1,216 @@
+from pathlib import Path
+import json
+import os
+import sqlite3
+import threading
+
+TICKETS_JSON = "document_bucket/tickets_export.json"
+TICKET_STORE_BACKEND = os.getenv('TICKET_STORE_BACKEND', 'memory')
+
+def iter_tickets(json_filepath, chunk_size=1 << 16):
+    """Yield tickets one at a time from a JSON array without loading the whole file."""
+    decoder = json.JSONDecoder()
+    with open(json_filepath, 'r', encoding='utf-8') as f:
+        buffer = f.read(chunk_size).lstrip()
+        if not buffer.startswith('['):
+            raise ValueError(f"Expected a JSON array in '{json_filepath}'")
+        buffer = buffer[1:]
+
+        while True:
+            buffer = buffer.lstrip(' \t\r\n,')
+            if buffer.startswith(']'):
+                return
+
+            try:
+                ticket, end = decoder.raw_decode(buffer)
+            except json.JSONDecodeError:
+                more = f.read(chunk_size)
+                if not more:
+                    raise
+                buffer += more
+                continue
+
+            yield ticket
+            buffer = buffer[end:]
+
+class TicketStore:
+    """Tickets from the JSON export held in a dict keyed by ticket_id.
+
+    The export is parsed once and parsed again only when its mtime changes.
+    """
+
+    def __init__(self, json_filepath=TICKETS_JSON):
+        self.json_filepath = Path(json_filepath)
+        self._tickets = {}
+        self._mtime = None
+        self._lock = threading.Lock()
+
+    def _refresh(self):
+        try:
+            mtime = os.stat(self.json_filepath).st_mtime_ns
+        except FileNotFoundError:
+            print(f"Error: JSON file '{self.json_filepath}' not found!")
+            return False
+
+        if mtime == self._mtime:
+            return True
+
+        with self._lock:
+            if mtime == self._mtime:
+                return True
+            try:
+                with open(self.json_filepath, 'r', encoding='utf-8') as f:
+                    tickets = json.load(f)
+            except json.JSONDecodeError:
+                print(f"Error: Could not parse JSON file '{self.json_filepath}'")
+                return False
+
+            self._tickets = {ticket['ticket_id']: ticket for ticket in tickets}
+            self._mtime = mtime
+            print(f"Loaded {len(self._tickets)} tickets from {self.json_filepath}")
+        return True
+
+    def warm(self):
+        return self._refresh()
+
+    def after_fork(self):
+        # The ticket dict is shared copy-on-write with the parent; nothing to reopen
+        pass
+
+    def get(self, ticket_id):
+        if not self._refresh():
+            return None
+        return self._tickets.get(ticket_id)
+
+    def get_many(self, ticket_ids):
+        """Return the tickets for ticket_ids in order, skipping unknown and repeated IDs."""
+        if not self._refresh():
+            return []
+        tickets = self._tickets
+        seen = set()
+        found = []
+        for ticket_id in ticket_ids:
+            if ticket_id in seen:
+                continue
+            seen.add(ticket_id)
+            ticket = tickets.get(ticket_id)
+            if ticket is not None:
+                found.append(ticket)
+        return found
+
+    def __len__(self):
+        self._refresh()
+        return len(self._tickets)
+
+class SqliteTicketStore:
+    """Tickets kept on disk in a SQLite table keyed by ticket_id.
+
+    The table is rebuilt by streaming the JSON export whenever the export is
+    newer than the database, so memory stays flat however many tickets exist.
+    """
+
+    def __init__(self, json_filepath=TICKETS_JSON, db_path=None):
+        self.json_filepath = Path(json_filepath)
+        self.db_path = Path(db_path) if db_path else self.json_filepath.with_suffix('.sqlite')
+        self._local = threading.local()
+        self._build_lock = threading.Lock()
+        self._source_mtime = None
+
+    def _connection(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(str(self.db_path))
+            self._local.conn = conn
+        return conn
+
+    def build(self):
+        tmp_path = self.db_path.with_suffix('.sqlite.tmp')
+        if tmp_path.exists():
+            tmp_path.unlink()
+
+        conn = sqlite3.connect(str(tmp_path))
+        conn.execute("CREATE TABLE tickets (ticket_id TEXT PRIMARY KEY, day INTEGER, system TEXT, data TEXT NOT NULL)")
+        batch = []
+        count = 0
+        for ticket in iter_tickets(self.json_filepath):
+            batch.append((ticket['ticket_id'], ticket.get('day'), ticket.get('system'), json.dumps(ticket, ensure_ascii=False)))
+            if len(batch) >= 10000:
+                conn.executemany("INSERT OR REPLACE INTO tickets VALUES (?, ?, ?, ?)", batch)
+                count += len(batch)
+                batch = []
+        conn.executemany("INSERT OR REPLACE INTO tickets VALUES (?, ?, ?, ?)", batch)
+        count += len(batch)
+        conn.commit()
+        conn.close()
+
+        os.replace(tmp_path, self.db_path)
+        print(f"Indexed {count} tickets into {self.db_path}")
+
+    def _refresh(self):
+        try:
+            source_mtime = os.stat(self.json_filepath).st_mtime_ns
+        except FileNotFoundError:
+            if self.db_path.exists():
+                return True
+            print(f"Error: JSON file '{self.json_filepath}' not found!")
+            return False
+
+        if source_mtime == self._source_mtime:
+            return True
+
+        with self._build_lock:
+            if source_mtime == self._source_mtime:
+                return True
+            if not self.db_path.exists() or os.stat(self.db_path).st_mtime_ns < source_mtime:
+                self.build()
+                # Drop connections to the replaced file; each thread reconnects lazily
+                self._local = threading.local()
+            self._source_mtime = source_mtime
+        return True
+
+    def warm(self):
+        return self._refresh()
+
+    def after_fork(self):
+        # SQLite connections must not be shared with the parent process, so each child opens its own
+        self._local = threading.local()
+
+    def get(self, ticket_id):
+        tickets = self.get_many([ticket_id])
+        return tickets[0] if tickets else None
+
+    def get_many(self, ticket_ids):
+        if not self._refresh():
+            return []
+        ids = list(dict.fromkeys(ticket_ids))
+        if not ids:
+            return []
+
+        placeholders = ','.join('?' * len(ids))
+        rows = self._connection().execute(
+            f"SELECT ticket_id, data FROM tickets WHERE ticket_id IN ({placeholders})", ids
+        ).fetchall()
+        by_id = {ticket_id: json.loads(data) for ticket_id, data in rows}
+        return [by_id[ticket_id] for ticket_id in ids if ticket_id in by_id]
+
+    def __len__(self):
+        if not self._refresh():
+            return 0
+        return self._connection().execute("SELECT COUNT(*) FROM tickets").fetchone()[0]
+
+_stores = {}
+_stores_lock = threading.Lock()
+
+def get_ticket_store(json_filepath=TICKETS_JSON):
+    key = str(json_filepath)
+    store = _stores.get(key)
+    if store is None:
+        with _stores_lock:
+            store = _stores.get(key)
+            if store is None:
+                if TICKET_STORE_BACKEND == 'sqlite':
+                    store = SqliteTicketStore(json_filepath)
+                else:
+                    store = TicketStore(json_filepath)
+                _stores[key] = store
+    return store
@@ -1,49 +1,112 @@
 from dotenv import load_dotenv
-from google import genai
-from google.genai import types
-from data_pipeline.embedding import search
-import os
+from data_pipeline.batching import batched_search_records
+from data_pipeline.reranker import get_reranker
+from data_pipeline.contextAssembler import assemble_context, estimate_tokens, record_prompt_tokens
+from data_pipeline.metrics import debug, stage
+from llmGateway import get_gateway, set_backend, GeminiBackend, LLMError
+import asyncio
+import re
 
 load_dotenv()
 
-client = genai.Client(api_key=os.getenv('API-KEY'))
+SYSTEM_INSTRUCTION = (
+    "You are a helpful assistant to IT helpdesk workers."
+    "Answer the question using the provided context."
+    "The answer may not explicitly be in the context, MAKE SURE to use the context to infer the answer."
+    "Please give 3 of the most relevant ticket numbers of the relevant tickets used in the answer. Format them like this: 'Relevant ticket numbers:\n 1. IT-12345, 2. IT-67890, 3. IT-24680' If there are no relevant tickets, say 'There are no relevant tickets.'"
+)
 
-def query_llm(user_prompt):
+def set_client(client):
+    """Swap in another client exposing models.generate_content, e.g. a local stub for tests."""
+    set_backend(GeminiBackend(client))
 
-    relevant_chunks = search(user_prompt, 3) # (user_prompt, top_k chunks)
+def build_prompt(user_prompt, relevant_chunks):
     context = "\n\n".join(relevant_chunks)
-    #print("RELEVANT CHUNKS: ", relevant_chunks)
     #print("CONTEXT: ", context)
-
-    try:
-        response = client.models.generate_content(
-            model="models/gemini-2.5-flash",
-            config=types.GenerateContentConfig(
-                system_instruction=(
-                    "You are a helpful assistant to IT helpdesk workers."
-                    "Answer the question using the provided context."
-                    "The answer may not explicitly be in the context, MAKE SURE to use the context to infer the answer."
-                    "Please give 3 of the most relevant ticket numbers of the relevant tickets used in the answer. Format them like this: 'Relevant ticket numbers:\n 1. IT-12345, 2. IT-67890, 3. IT-24680' If there are no relevant tickets, say 'There are no relevant tickets.'"
-                )
-            ),
-            contents=[
-                {
-                    "role": "user",
-                    "parts": [
-                        {
-                            "text": f"""
+    return f"""
                             Context:
                             {context}
 
                             Question:
                             {user_prompt}
                             """
-                        }
-                    ]
-                }
-            ]
-        )
-
-        return response.text
-    except Exception as e:
-        print(f"An error occured when formulating response: {e}")
\ No newline at end of file
+
+def retrieve(user_prompt, top_k=3, **filters):
+    """Chunk records for user_prompt, optionally filtered by system and days.
+
+    With re-ranking on, a larger candidate set is returned in cross-encoder
+    order, and build_context decides how many of them fit the token budget.
+    """
+    reranker = get_reranker()
+    with stage('retrieve'):
+        if reranker is None:
+            return batched_search_records(user_prompt, top_k, **filters)
+        return reranker.retrieve(user_prompt, lambda query, k: batched_search_records(query, k, **filters))
+
+def build_context(records):
+    """Passages for the prompt: overlapping chunks merged, repeated sentences dropped, fitted to the token budget."""
+    with stage('context'):
+        passages, stats = assemble_context(records)
+    debug(f"Context: {stats['chunks_in']} chunks -> {stats['passages_out']} passages, {stats['context_tokens']} tokens "
+          f"({stats['merged_chunks']} merged, {stats['duplicate_sentences']} duplicate sentences dropped)")
+    return passages
+
+def _prompt(user_prompt, relevant_chunks):
+    with stage('prompt_build'):
+        prompt = build_prompt(user_prompt, relevant_chunks)
+        tokens = estimate_tokens(SYSTEM_INSTRUCTION) + estimate_tokens(prompt)
+    record_prompt_tokens(tokens)
+    debug(f"Prompt tokens sent: {tokens}")
+    return prompt
+
+def extract_ticket_ids(response_text):
+    if not response_text:
+        return "", []
+    ticket_pattern = r'(?:The\s+)?(?:most\s+)?relevant ticket numbers?\s*(?:are|is)?[:\s]*\n?(?:\d+\.\s*IT-\d+\s*\n?)+'
+    
+    ticket_ids = re.findall(r'IT-\d+', response_text)
+
+    cleaned_response = re.sub(ticket_pattern, '', response_text, flags=re.IGNORECASE).strip()
+    
+    debug(f"Extracted ticket IDs: {ticket_ids}")
+    debug(f"Cleaned response: {cleaned_response}")
+    return cleaned_response, ticket_ids
+
+def ticket_ids_from(records, limit=3):
+    """Up to limit ticket IDs attached to retrieved chunks, best match first. Empty for chunks without ticket metadata."""
+    return list(dict.fromkeys(record['ticket_id'] for record in records if record.get('ticket_id')))[:limit]
+
+def query_llm(user_prompt, relevant_chunks=None):
+    """Answer user_prompt from relevant_chunks, or from retrieve(). Raises LLMError if the LLM call fails."""
+    if relevant_chunks is None:
+        relevant_chunks = build_context(retrieve(user_prompt))
+    #print("RELEVANT CHUNKS: ", relevant_chunks)
+    prompt = _prompt(user_prompt, relevant_chunks)
+
+    try:
+        with stage('llm'):
+            return get_gateway().generate(SYSTEM_INSTRUCTION, prompt)
+    except LLMError as e:
+        print(f"An error occured when formulating response: {e}")
+        raise
+
+def stream_llm(user_prompt, relevant_chunks):
+    """Yield the answer to user_prompt piece by piece, using relevant_chunks already retrieved by the caller."""
+    try:
+        yield from get_gateway().stream(SYSTEM_INSTRUCTION, _prompt(user_prompt, relevant_chunks))
+    except LLMError as e:
+        print(f"An error occured when formulating response: {e}")
+        raise
+
+async def aquery_llm(user_prompt):
+    """asyncio variant of query_llm, so many questions can wait on the LLM without holding a thread each."""
+    records = await asyncio.to_thread(retrieve, user_prompt)
+    relevant_chunks = build_context(records)
+    prompt = _prompt(user_prompt, relevant_chunks)
+
+    try:
+        with stage('llm'):
+            return await get_gateway().agenerate(SYSTEM_INSTRUCTION, prompt)
+    except LLMError as e:
+        print(f"An error occured when formulating response: {e}")
+        raise
@@ -0,0 +1,349 @@
+import asyncio
+import os
+import random
+import re
+import sys
+import threading
+import time
+
+LLM_BACKEND = os.getenv('LLM_BACKEND', 'gemini')
+LLM_MODEL = os.getenv('LLM_MODEL', 'models/gemini-2.5-flash')
+LLM_TIMEOUT = float(os.getenv('LLM_TIMEOUT', '30'))
+LLM_MAX_RETRIES = int(os.getenv('LLM_MAX_RETRIES', '2'))
+LLM_BACKOFF = float(os.getenv('LLM_BACKOFF', '0.5'))
+LLM_MAX_IN_FLIGHT = int(os.getenv('LLM_MAX_IN_FLIGHT', '8'))
+FAKE_LLM_LATENCY = float(os.getenv('FAKE_LLM_LATENCY', '0.5'))
+FAKE_LLM_TOKENS_PER_SECOND = float(os.getenv('FAKE_LLM_TOKENS_PER_SECOND', '0'))
+
+class LLMError(Exception):
+    """Raised when the LLM could not produce an answer within the deadline and retry budget."""
+
+# HTTP statuses worth retrying: request timeout, rate limit and server errors
+TRANSIENT_STATUSES = frozenset((408, 429))
+
+def is_transient(error):
+    """Whether an attempt that raised error could succeed if retried.
+
+    Timeouts, connection failures, 408/429 and 5xx responses are transient.
+    A bad API key, a rejected request or a bug in the backend fails the same
+    way every time, so retrying it only spends the caller's deadline. The
+    google-genai and httpx error types are looked up in sys.modules: if the
+    module was never imported, the error cannot have come from it.
+    """
+    if isinstance(error, (TimeoutError, asyncio.TimeoutError, ConnectionError)):
+        return True
+    genai_errors = sys.modules.get('google.genai.errors')
+    if genai_errors is not None and isinstance(error, genai_errors.APIError):
+        return error.code in TRANSIENT_STATUSES or (error.code or 0) >= 500
+    httpx = sys.modules.get('httpx')
+    if httpx is not None and isinstance(error, httpx.TransportError):
+        return True
+    return False
+
+class GeminiBackend:
+    """Calls Gemini through one shared google-genai client, created on first use."""
+
+    def __init__(self, client=None, model=LLM_MODEL):
+        self._client = client
+        self._lock = threading.Lock()
+        self.model = model
+
+    @property
+    def client(self):
+        if self._client is None:
+            with self._lock:
+                if self._client is None:
+                    from google import genai
+                    self._client = genai.Client(api_key=os.getenv('API-KEY'))
+        return self._client
+
+    def _config(self, system_instruction, timeout):
+        from google.genai import types
+        return types.GenerateContentConfig(
+            system_instruction=system_instruction,
+            http_options=types.HttpOptions(timeout=int(timeout * 1000)),
+        )
+
+    @staticmethod
+    def _contents(prompt):
+        return [{"role": "user", "parts": [{"text": prompt}]}]
+
+    def generate(self, system_instruction, prompt, timeout):
+        response = self.client.models.generate_content(
+            model=self.model,
+            config=self._config(system_instruction, timeout),
+            contents=self._contents(prompt),
+        )
+        return response.text
+
+    async def agenerate(self, system_instruction, prompt, timeout):
+        response = await self.client.aio.models.generate_content(
+            model=self.model,
+            config=self._config(system_instruction, timeout),
+            contents=self._contents(prompt),
+        )
+        return response.text
+
+    def stream(self, system_instruction, prompt, timeout):
+        for chunk in self.client.models.generate_content_stream(
+            model=self.model,
+            config=self._config(system_instruction, timeout),
+            contents=self._contents(prompt),
+        ):
+            if chunk.text:
+                yield chunk.text
+
+class FakeBackend:
+    """Local stand-in for load tests: waits latency seconds, plus token time if tokens_per_second is set.
+
+    The answer cites the first three IT-<n> ticket numbers found in the prompt,
+    one per line so extract_ticket_ids strips the whole list.
+    """
+
+    def __init__(self, latency=FAKE_LLM_LATENCY, tokens_per_second=FAKE_LLM_TOKENS_PER_SECOND, answer=None):
+        self.latency = latency
+        self.tokens_per_second = tokens_per_second
+        self.answer = answer
+
+    def _answer(self, prompt):
+        if self.answer is not None:
+            return self.answer
+        tickets = list(dict.fromkeys(re.findall(r'IT-\d+', prompt)))[:3]
+        if not tickets:
+            return "This is a placeholder answer.\nThere are no relevant tickets."
+        numbered = "\n".join(f"{i}. {ticket}" for i, ticket in enumerate(tickets, 1))
+        return f"This is a placeholder answer.\nRelevant ticket numbers:\n{numbered}"
+
+    def _delay(self, answer):
+        delay = self.latency
+        if self.tokens_per_second > 0:
+            delay += len(answer.split()) / self.tokens_per_second
+        return delay
+
+    def generate(self, system_instruction, prompt, timeout):
+        answer = self._answer(prompt)
+        delay = self._delay(answer)
+        time.sleep(min(delay, timeout))
+        if delay > timeout:
+            raise TimeoutError(f"Fake LLM took longer than {timeout:.2f}s")
+        return answer
+
+    async def agenerate(self, system_instruction, prompt, timeout):
+        answer = self._answer(prompt)
+        delay = self._delay(answer)
+        await asyncio.sleep(min(delay, timeout))
+        if delay > timeout:
+            raise TimeoutError(f"Fake LLM took longer than {timeout:.2f}s")
+        return answer
+
+    def stream(self, system_instruction, prompt, timeout):
+        # Pay the latency up front as time to first token, then emit one word at a time
+        time.sleep(min(self.latency, timeout))
+        if self.latency > timeout:
+            raise TimeoutError(f"Fake LLM took longer than {timeout:.2f}s")
+        for token in re.findall(r'\S+\s*|\s+', self._answer(prompt)):
+            if self.tokens_per_second > 0:
+                time.sleep(1 / self.tokens_per_second)
+            yield token
+
+BACKENDS = {'gemini': GeminiBackend, 'fake': FakeBackend}
+
+class LLMGateway:
+    """Single entry point for LLM calls with a deadline, retries and a cap on in-flight calls.
+
+    Each call gets timeout seconds in total, shared by all of its attempts.
+    Attempts that fail with a transient error (see is_transient) are retried
+    up to max_retries times with jittered exponential backoff, as long as
+    the deadline leaves room; any other error fails the call at once, as
+    does an empty answer (Gemini returns no text for a blocked response). At most
+    max_in_flight calls run at once across threads; the asyncio variant
+    has its own limit of the same size per event loop.
+    """
+
+    def __init__(self, backend, timeout=LLM_TIMEOUT, max_retries=LLM_MAX_RETRIES, backoff=LLM_BACKOFF,
+                 max_in_flight=LLM_MAX_IN_FLIGHT):
+        self.backend = backend
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.max_in_flight = max_in_flight
+        self._semaphore = threading.BoundedSemaphore(max_in_flight)
+        self._async_semaphores = {}
+        self._lock = threading.Lock()
+        self.stats = {
+            'calls': 0,
+            'attempts': 0,
+            'retries': 0,
+            'failures': 0,
+            'in_flight': 0,
+            'peak_in_flight': 0,
+            'seconds_total': 0.0,
+        }
+
+    def _backoff_delay(self, attempt):
+        return random.uniform(0, self.backoff * (2 ** attempt))
+
+    def _record(self, key, amount=1):
+        with self._lock:
+            self.stats[key] += amount
+
+    def _enter(self):
+        with self._lock:
+            self.stats['in_flight'] += 1
+            self.stats['peak_in_flight'] = max(self.stats['peak_in_flight'], self.stats['in_flight'])
+
+    def _exit(self, started):
+        with self._lock:
+            self.stats['in_flight'] -= 1
+            self.stats['seconds_total'] += time.perf_counter() - started
+
+    def _next_wait(self, attempt, deadline, error):
+        """Seconds to sleep before the next attempt, or raise LLMError when error is permanent or out of retries or time."""
+        if not is_transient(error):
+            self._record('failures')
+            raise LLMError(f"LLM call failed: {type(error).__name__}: {error}") from error
+        remaining = deadline - time.monotonic()
+        delay = self._backoff_delay(attempt)
+        if attempt >= self.max_retries or remaining <= delay:
+            self._record('failures')
+            raise LLMError(f"LLM call failed after {attempt + 1} attempt(s): {error}") from error
+        self._record('retries')
+        print(f"LLM attempt {attempt + 1} failed ({error}), retrying in {delay:.2f}s")
+        return delay
+
+    def _answer(self, text):
+        """text, or raise LLMError if it is empty. A blocked or empty response would fail the same way again."""
+        if not text or not text.strip():
+            self._record('failures')
+            raise LLMError("LLM returned an empty answer")
+        return text
+
+    def generate(self, system_instruction, prompt, timeout=None):
+        deadline = time.monotonic() + (timeout or self.timeout)
+        self._record('calls')
+        if not self._semaphore.acquire(timeout=max(0.0, deadline - time.monotonic())):
+            self._record('failures')
+            raise LLMError("Timed out waiting for a free LLM slot")
+
+        started = time.perf_counter()
+        self._enter()
+        try:
+            attempt = 0
+            while True:
+                self._record('attempts')
+                try:
+                    text = self.backend.generate(system_instruction, prompt, max(0.001, deadline - time.monotonic()))
+                except Exception as e:
+                    time.sleep(self._next_wait(attempt, deadline, e))
+                    attempt += 1
+                    continue
+                return self._answer(text)
+        finally:
+            self._exit(started)
+            self._semaphore.release()
+
+    def stream(self, system_instruction, prompt, timeout=None):
+        """Yield text pieces as the backend produces them.
+
+        Attempts that fail before the first piece are retried like generate;
+        once text has been yielded a failure raises LLMError straight away.
+        The backend's own timeout only bounds each wait for a piece, so the
+        deadline is also checked between pieces: a stream still trickling
+        text when it passes is cut off with LLMError.
+        """
+        deadline = time.monotonic() + (timeout or self.timeout)
+        self._record('calls')
+        if not self._semaphore.acquire(timeout=max(0.0, deadline - time.monotonic())):
+            self._record('failures')
+            raise LLMError("Timed out waiting for a free LLM slot")
+
+        started = time.perf_counter()
+        self._enter()
+        try:
+            attempt = 0
+            while True:
+                self._record('attempts')
+                streamed = False
+                try:
+                    for text in self.backend.stream(system_instruction, prompt, max(0.001, deadline - time.monotonic())):
+                        if time.monotonic() > deadline:
+                            self._record('failures')
+                            raise LLMError(f"LLM stream ran past its {timeout or self.timeout:.0f}s deadline")
+                        streamed = streamed or bool(text.strip())
+                        yield text
+                    if not streamed:
+                        self._answer("")
+                    return
+                except LLMError:
+                    raise
+                except Exception as e:
+                    if streamed:
+                        self._record('failures')
+                        raise LLMError(f"LLM stream failed part way through: {e}") from e
+                    time.sleep(self._next_wait(attempt, deadline, e))
+                    attempt += 1
+        finally:
+            self._exit(started)
+            self._semaphore.release()
+
+    def _async_semaphore(self):
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            semaphore = self._async_semaphores.get(loop)
+            if semaphore is None:
+                semaphore = asyncio.Semaphore(self.max_in_flight)
+                self._async_semaphores[loop] = semaphore
+        return semaphore
+
+    async def agenerate(self, system_instruction, prompt, timeout=None):
+        deadline = time.monotonic() + (timeout or self.timeout)
+        self._record('calls')
+        semaphore = self._async_semaphore()
+        try:
+            await asyncio.wait_for(semaphore.acquire(), max(0.0, deadline - time.monotonic()))
+        except asyncio.TimeoutError:
+            self._record('failures')
+            raise LLMError("Timed out waiting for a free LLM slot") from None
+
+        started = time.perf_counter()
+        self._enter()
+        try:
+            attempt = 0
+            while True:
+                self._record('attempts')
+                remaining = max(0.001, deadline - time.monotonic())
+                try:
+                    text = await asyncio.wait_for(self.backend.agenerate(system_instruction, prompt, remaining), remaining)
+                except Exception as e:
+                    await asyncio.sleep(self._next_wait(attempt, deadline, e))
+                    attempt += 1
+                    continue
+                return self._answer(text)
+        finally:
+            self._exit(started)
+            semaphore.release()
+
+    def get_stats(self):
+        with self._lock:
+            stats = dict(self.stats)
+        stats['backend'] = type(self.backend).__name__
+        stats['avg_call_seconds'] = stats['seconds_total'] / stats['calls'] if stats['calls'] else 0.0
+        return stats
+
+_gateway = None
+_gateway_lock = threading.Lock()
+
+def get_gateway():
+    """Process-wide gateway using the backend named by LLM_BACKEND (gemini or fake)."""
+    global _gateway
+    if _gateway is None:
+        with _gateway_lock:
+            if _gateway is None:
+                if LLM_BACKEND not in BACKENDS:
+                    raise ValueError(f"Unknown LLM backend '{LLM_BACKEND}', expected one of {', '.join(BACKENDS)}")
+                _gateway = LLMGateway(BACKENDS[LLM_BACKEND]())
+    return _gateway
+
+def set_backend(backend):
+    """Route all LLM calls through backend, e.g. a FakeBackend or a GeminiBackend wrapping a stub client."""
+    get_gateway().backend = backend
@@ -1,53 +1,34 @@
-import re
 from data_pipeline.textChunking import chunk_documents
 from data_pipeline.readPDF import process_document_bucket
-from data_pipeline.embedding import embed_and_save
+from data_pipeline.embedding import embed_and_save, VECTOR_DB_DIR
+from data_pipeline.incremental import incremental_ingest
+from data_pipeline.ticketChunking import ingest_tickets
+from data_pipeline.shardedIndex import build_shards, SHARDING_ENABLED, VECTOR_SHARDS
+from data_pipeline.ticketStore import get_ticket_store, TICKETS_JSON
 from llm import query_llm
-import os
-import json
+from llmGateway import LLMError
 
 INPUT_FILE = "raw_text/extracted_text.txt"
 OUTPUT_DIR = "chunks"
 MAX_SIZE = 2000
 
+def rebuild_shards():
+    # Shards are derived from the main index, so they are rebuilt after every ingestion when sharding is on
+    if SHARDING_ENABLED:
+        build_shards(VECTOR_DB_DIR, VECTOR_SHARDS)
+
 def ask_question():
     user_prompt = input("\n\nAsk a question: ")
-    response = query_llm(user_prompt)
-    print(response)
-
-def find_ticket_by_id(ticket_id, json_filepath='document_bucket/tickets_export.json'):
-    if not os.path.exists(json_filepath):
-        print(f"Error: JSON file '{json_filepath}' not found!")
-        return None
-    
     try:
-        with open(json_filepath, 'r', encoding='utf-8') as f:
-            tickets = json.load(f)
-        
-        for ticket in tickets:
-            if ticket['ticket_id'] == ticket_id:
-                return ticket
-        
-        print(f"Ticket ID '{ticket_id}' not found in the JSON file.")
-        return None
-    
-    except json.JSONDecodeError:
-        print(f"Error: Could not parse JSON file '{json_filepath}'")
-        return None
-    except Exception as e:
-        print(f"Error reading file: {e}")
-        return None
-    
-def extract_ticket_ids(response_text):
-    ticket_pattern = r'(?:The\s+)?(?:most\s+)?relevant ticket numbers?\s*(?:are|is)?[:\s]*\n?(?:\d+\.\s*IT-\d+\s*\n?)+'
-    
-    ticket_ids = re.findall(r'IT-\d+', response_text)
+        print(query_llm(user_prompt))
+    except LLMError:
+        print("The assistant is unavailable right now, please try again.")
 
-    cleaned_response = re.sub(ticket_pattern, '', response_text, flags=re.IGNORECASE).strip()
-    
-    print(f"Extracted ticket IDs: {ticket_ids}")
-    print(f"Cleaned response: {cleaned_response}")
-    return cleaned_response, ticket_ids
+def find_ticket_by_id(ticket_id, json_filepath=TICKETS_JSON):
+    ticket = get_ticket_store(json_filepath).get(ticket_id)
+    if ticket is None:
+        print(f"Ticket ID '{ticket_id}' not found in the JSON file.")
+    return ticket
     
 if __name__ == "__main__":
 
@@ -56,20 +37,31 @@ if __name__ == "__main__":
     while choice != 1 or choice != 2 or choice != 3:
         print("Welcome to the IT Ticket Knowledge Base AI Assistant!")
         print("\nOptions: ")
-        print("1. Process Data")
+        print("1. Process Data (new and changed files)")
         print("2. Use the Assistant")
         print("3. Exit")
+        print("4. Rebuild All Data")
+        print("5. Rebuild From Ticket Export (one chunk per ticket)")
         choice = int(input("Choose your action: "))
 
         if choice == 1:
-            process_document_bucket()
-            chunk_documents(INPUT_FILE, OUTPUT_DIR, MAX_SIZE)
-            embed_and_save()
+            incremental_ingest(max_chunk_size=MAX_SIZE)
+            rebuild_shards()
             print("\n")
         elif choice == 2:
             ask_question()
             print("\n")
         elif choice == 3:
             break
+        elif choice == 4:
+            process_document_bucket()
+            chunk_documents(INPUT_FILE, OUTPUT_DIR, MAX_SIZE)
+            embed_and_save()
+            rebuild_shards()
+            print("\n")
+        elif choice == 5:
+            ingest_tickets()
+            rebuild_shards()
+            print("\n")
         else:
             print("Invalid choice.\n")
\ No newline at end of file
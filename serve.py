@@ -0,0 +1,57 @@
+import os
+import sys
+from app import app, warm_up
+from data_pipeline.embedding import get_retriever
+from data_pipeline.ticketStore import get_ticket_store
+
+SERVE_BIND = os.getenv('SERVE_BIND', '0.0.0.0:5000')
+SERVE_WORKERS = int(os.getenv('SERVE_WORKERS', str(min(4, os.cpu_count() or 1))))
+SERVE_THREADS = int(os.getenv('SERVE_THREADS', '8'))
+SERVE_TIMEOUT = int(os.getenv('SERVE_TIMEOUT', '120'))
+SERVE_TORCH_THREADS = int(os.getenv('SERVE_TORCH_THREADS', '1'))
+
+def post_fork(server, worker):
+    """Per-worker setup before it accepts requests.
+
+    The model weights, FAISS index and tickets were loaded once in the
+    master and are shared copy-on-write (the index is also mmapped). Each
+    worker only needs its own SQLite connections, its own shard workers
+    when the index is sharded, and one warm-up encode, run here instead of
+    in the master because torch's thread pools do not survive a fork.
+    """
+    if 'torch' in sys.modules:
+        sys.modules['torch'].set_num_threads(SERVE_TORCH_THREADS)
+    get_ticket_store().after_fork()
+    retriever = get_retriever()
+    retriever.refresh()
+    retriever.model.encode(["warm up"])
+    print(f"Worker {worker.pid} ready")
+
+def run():
+    """Serve the app with gunicorn: SERVE_WORKERS forked processes with SERVE_THREADS threads each."""
+    try:
+        from gunicorn.app.base import BaseApplication
+    except ImportError:
+        raise SystemExit("serve.py needs gunicorn (pip install gunicorn); use python app.py for development")
+
+    class TriageApplication(BaseApplication):
+        def load_config(self):
+            self.cfg.set('bind', SERVE_BIND)
+            self.cfg.set('workers', SERVE_WORKERS)
+            self.cfg.set('threads', SERVE_THREADS)
+            self.cfg.set('worker_class', 'gthread')
+            self.cfg.set('timeout', SERVE_TIMEOUT)
+            self.cfg.set('preload_app', True)
+            self.cfg.set('post_fork', post_fork)
+
+        def load(self):
+            # Runs once in the master before any worker is forked
+            warm_up()
+            # Shard sockets would be shared by every forked worker; post_fork opens a set per worker
+            get_retriever().close_shards()
+            return app
+
+    TriageApplication().run()
+
+if __name__ == '__main__':
+    run()
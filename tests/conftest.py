@@ -0,0 +1,44 @@
+import os
+import sys
+from pathlib import Path
+
+import pytest
+
+# The modules live at the repository root, next to main.py, rather than in an installed package
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+# Read at import time by the modules under test: the hash embedder and an instant fake LLM,
+# so nothing is downloaded or sent to Gemini, and no shared embedding cache is written
+os.environ.update({
+    'EMBED_BACKEND': 'hash',
+    'LLM_BACKEND': 'fake',
+    'FAKE_LLM_LATENCY': '0',
+    'RERANK': '0',
+    'EMBED_CACHE': '0',
+    'DEBUG_PRINTS': '0',
+})
+
+@pytest.fixture(scope='session')
+def ticket_db(tmp_path_factory):
+    """A synthetic ticket export ingested one chunk per ticket, with the working directory set to it.
+
+    The app, retriever and ticket store resolve document_bucket/ and
+    vector_db/ against the working directory, as they do when served.
+    """
+    from benchmarks.load_test import build_corpus
+    from data_pipeline.ticketChunking import ingest_tickets
+
+    workdir = tmp_path_factory.mktemp("tickets")
+    previous = os.getcwd()
+    os.chdir(workdir)
+    try:
+        tickets = build_corpus(workdir, 200, 20)
+        ingest_tickets()
+        yield tickets
+    finally:
+        os.chdir(previous)
+
+@pytest.fixture
+def client(ticket_db):
+    import app
+    return app.app.test_client()
@@ -0,0 +1,95 @@
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+import answerCache
+from answerCache import AnswerCache
+from llmGateway import get_gateway, FakeBackend
+
+VPN = np.array([1.0, 0.0, 0.0, 0.0])
+VPN_REWORDED = np.array([0.98, 0.2, 0.0, 0.0])
+PRINTER = np.array([0.0, 1.0, 0.0, 0.0])
+EMAIL = np.array([0.0, 0.0, 1.0, 0.0])
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(answerCache, 'time', SimpleNamespace(time=lambda: now[0]))
+    return now
+
+def test_exact_hit_ignores_case_and_spacing():
+    cache = AnswerCache()
+    cache.store("How do I reset my VPN password?", VPN, "Use the portal.", ["IT-1"])
+    hit = cache.lookup("how do I  reset my vpn password?")
+    assert hit == {'answer': "Use the portal.", 'ticket_ids': ["IT-1"], 'cached': 'exact'}
+
+def test_semantic_hit_above_threshold_only():
+    cache = AnswerCache(threshold=0.9)
+    cache.store("VPN will not connect", VPN, "Reinstall the client.", ["IT-1"])
+    assert cache.lookup("VPN keeps failing to connect", VPN_REWORDED)['cached'] == 'semantic'
+    assert cache.lookup("Printer is jammed", PRINTER) is None
+    assert cache.lookup("VPN keeps failing to connect") is None
+    stats = cache.get_stats()
+    assert (stats['semantic_hits'], stats['misses']) == (1, 2)
+
+def test_questions_naming_tickets_only_match_exactly():
+    cache = AnswerCache(threshold=0.9)
+    cache.store("How was ticket IT-1005 resolved?", VPN, "Replaced the router.", ["IT-1005"])
+    assert cache.lookup("How was ticket IT-1006 resolved?", VPN) is None
+    assert cache.lookup("How was this ticket resolved?", VPN) is None
+    assert cache.lookup("How was ticket IT-1005 resolved?", VPN)['cached'] == 'exact'
+
+    # An entry without ticket IDs is not served to a question that names one either
+    cache.store("How was the VPN outage resolved?", VPN, "Restarted the gateway.", [])
+    assert cache.lookup("How was the VPN outage in IT-1007 resolved?", VPN) is None
+
+def test_entries_expire_after_ttl(clock):
+    cache = AnswerCache(ttl=60)
+    cache.store("VPN will not connect", VPN, "Reinstall the client.", [])
+    clock[0] += 59
+    assert cache.lookup("VPN will not connect") is not None
+    clock[0] += 2
+    assert cache.lookup("VPN will not connect") is None
+    assert cache.lookup("VPN is down", VPN) is None
+    assert cache.get_stats()['entries'] == 0
+
+def test_least_recently_used_entry_is_evicted():
+    cache = AnswerCache(max_entries=2)
+    cache.store("vpn", VPN, "vpn answer", [])
+    cache.store("printer", PRINTER, "printer answer", [])
+    assert cache.lookup("vpn") is not None
+    cache.store("email", EMAIL, "email answer", [])
+
+    assert cache.lookup("printer") is None
+    assert cache.lookup("printer again", PRINTER) is None
+    assert cache.lookup("vpn again", VPN)['answer'] == "vpn answer"
+    assert cache.lookup("email again", EMAIL)['answer'] == "email answer"
+    assert cache.get_stats()['entries'] == 2
+
+def test_storing_the_same_question_replaces_it():
+    cache = AnswerCache(max_entries=2)
+    cache.store("vpn", VPN, "old", [])
+    cache.store("vpn", VPN, "new", [])
+    cache.store("printer", PRINTER, "printer answer", [])
+    assert cache.lookup("vpn")['answer'] == "new"
+    assert cache.lookup("vpn again", VPN)['answer'] == "new"
+    assert cache.get_stats()['entries'] == 2
+
+def test_new_index_version_clears_the_cache():
+    cache = AnswerCache()
+    cache.store("vpn", VPN, "vpn answer", [], index_version=1)
+    assert cache.lookup("vpn", index_version=1) is not None
+    assert cache.lookup("vpn", index_version=2) is None
+    assert cache.lookup("vpn again", VPN, index_version=2) is None
+    assert cache.get_stats()['invalidations'] == 1
+
+def test_answer_that_is_only_a_ticket_list_is_not_cached(client, monkeypatch):
+    monkeypatch.setattr(get_gateway(), 'backend', FakeBackend(latency=0, answer="Relevant ticket numbers:\n1. IT-5"))
+    cache = answerCache.get_answer_cache()
+    cache.clear()
+    for _ in range(2):
+        response = client.post('/api/question', json={'question': "Why does the VPN drop every hour?"})
+        assert response.status_code == 200
+        assert response.get_json()['answer'] == ""
+    assert cache.get_stats()['entries'] == 0
@@ -0,0 +1,93 @@
+import pytest
+
+from app import request_filters
+from data_pipeline.chunkStore import ChunkStore
+from data_pipeline.embedding import VECTOR_DB_DIR
+from data_pipeline.metadataIndex import MetadataIndex
+
+@pytest.mark.parametrize("data, filters", [
+    ({}, {}),
+    ({'system': "VPN"}, {'system': "VPN"}),
+    ({'system': ["VPN", "Printer"]}, {'system': ["VPN", "Printer"]}),
+    ({'system': ""}, {}),
+    ({'days': 3}, {'days': 3}),
+    ({'days': "3"}, {'days': 3}),
+    ({'days': [2, "4"]}, {'days': (2, 4)}),
+    ({'days': [4, 4]}, {'days': (4, 4)}),
+    ({'system': "VPN", 'days': [1, 2]}, {'system': "VPN", 'days': (1, 2)}),
+])
+def test_request_filters(data, filters):
+    assert request_filters(data) == filters
+
+@pytest.mark.parametrize("data", [
+    {'system': 5},
+    {'system': ["VPN", 5]},
+    {'system': {'name': "VPN"}},
+    {'days': "monday"},
+    {'days': True},
+    {'days': 2.5},
+    {'days': [1]},
+    {'days': [1, 2, 3]},
+    {'days': [5, 2]},
+    {'days': [1, None]},
+])
+def test_malformed_filters(data):
+    with pytest.raises(ValueError):
+        request_filters(data)
+
+@pytest.mark.parametrize("path", ['/api/question', '/api/question/stream'])
+@pytest.mark.parametrize("data", [{'system': 5}, {'days': [5, 2]}, {'days': "monday"}])
+def test_malformed_filters_are_a_400(client, path, data):
+    response = client.post(path, json=dict(data, question="Why does the VPN drop?"))
+    assert response.status_code == 400
+    assert 'error' in response.get_json()
+
+@pytest.fixture(scope='module')
+def metadata(ticket_db):
+    return MetadataIndex(VECTOR_DB_DIR)
+
+@pytest.fixture(scope='module')
+def ticket_of_chunk(ticket_db):
+    store = ChunkStore(VECTOR_DB_DIR)
+    try:
+        return {record['id']: record['ticket_id'] for record in store.iter_records()}
+    finally:
+        store.close()
+
+def expected(ticket_db, systems=None, first=None, last=None):
+    return {ticket['id'] for ticket in ticket_db
+            if (systems is None or ticket['system'].lower() in systems)
+            and (first is None or first <= int(ticket['id'][3:]) // 1000 <= last)}
+
+def test_select_everything(metadata, ticket_db):
+    assert len(metadata.select()) == len(metadata) == len(ticket_db)
+
+@pytest.mark.parametrize("system", ["VPN", "vpn", ["Printer", "wi-fi"], ["VPN", "Mainframe"]])
+def test_select_by_system(metadata, ticket_of_chunk, ticket_db, system):
+    names = {name.lower() for name in ([system] if isinstance(system, str) else system)}
+    assert {ticket_of_chunk[int(i)] for i in metadata.select(system=system)} == expected(ticket_db, names)
+
+@pytest.mark.parametrize("days, first, last", [(3, 3, 3), ((2, 4), 2, 4), ((9, 20), 9, 10)])
+def test_select_by_days(metadata, ticket_of_chunk, ticket_db, days, first, last):
+    selected = metadata.select(days=days)
+    assert len(selected) == 20 * (last - first + 1)
+    assert {ticket_of_chunk[int(i)] for i in selected} == expected(ticket_db, first=first, last=last)
+
+def test_select_by_system_and_days(metadata, ticket_of_chunk, ticket_db):
+    selected = metadata.select(system="VPN", days=(1, 5))
+    assert {ticket_of_chunk[int(i)] for i in selected} == expected(ticket_db, {"vpn"}, 1, 5)
+
+@pytest.mark.parametrize("filters", [{'system': "Mainframe"}, {'system': []}, {'days': 11}, {'days': (0, 0)}])
+def test_select_nothing(metadata, filters):
+    assert len(metadata.select(**filters)) == 0
+
+def test_unknown_system_finds_no_tickets(client):
+    response = client.post('/api/question', json={'question': "Why does the VPN drop?", 'system': "Mainframe"})
+    assert response.status_code == 200
+    assert response.get_json()['tickets'] == []
+
+def test_filtered_question_only_finds_matching_tickets(client, ticket_db):
+    response = client.post('/api/question', json={'question': "Why does the VPN drop?", 'system': "VPN", 'days': [2, 3]})
+    tickets = response.get_json()['tickets']
+    systems = {ticket['id']: ticket['system'] for ticket in ticket_db}
+    assert tickets and all(systems[ticket['ticket_id']] == "VPN" for ticket in tickets)
@@ -0,0 +1,95 @@
+import random
+
+import faiss
+import pytest
+
+from benchmarks.pdf_extraction import synthetic_tickets
+from data_pipeline.chunkStore import ChunkStore
+from data_pipeline.embedding import INDEX_FILE
+from data_pipeline.incremental import incremental_ingest, load_manifest, RETRAIN_GROWTH
+from data_pipeline.indexFactory import index_type_of
+from generate_test_content.prepareTickets import create_pdf_for_day
+
+def write_day(bucket, day, seed=0):
+    create_pdf_for_day(day, synthetic_tickets(random.Random(seed * 1000 + day), day, 6), str(bucket))
+
+def ingest(bucket, db):
+    return incremental_ingest(bucket, 600, 50, db, workers=1, index_type='ivf_flat')
+
+def index_ids(index):
+    if hasattr(index, 'id_map'):
+        return set(faiss.vector_to_array(index.id_map).tolist())
+    invlists = faiss.extract_index_ivf(index).invlists
+    return {int(chunk_id) for nlist in range(invlists.nlist) if invlists.list_size(nlist)
+            for chunk_id in faiss.rev_swig_ptr(invlists.get_ids(nlist), invlists.list_size(nlist))}
+
+def stored_ids(db):
+    """The chunk ids in the manifest, after checking the chunk store and the index hold exactly those."""
+    manifest = load_manifest(db)
+    ids = {chunk_id for entry in manifest['files'].values() for chunk_id in entry['chunk_ids']}
+    store = ChunkStore(db)
+    try:
+        assert set(store.ids.tolist()) == ids
+    finally:
+        store.close()
+    index = faiss.read_index(str(db / INDEX_FILE))
+    assert index_type_of(index) == 'ivf_flat'
+    assert index.ntotal == len(ids) and index_ids(index) == ids
+    return ids
+
+@pytest.fixture
+def bucket(tmp_path):
+    bucket = tmp_path / "document_bucket"
+    bucket.mkdir()
+    return bucket
+
+def test_incremental_ingest(bucket, tmp_path):
+    db = tmp_path / "vector_db"
+    write_day(bucket, 1)
+    write_day(bucket, 2)
+
+    report = ingest(bucket, db)
+    assert (report['files_added'], report['files_skipped'], report['files_failed']) == (2, 0, 0)
+    first = stored_ids(db)
+    assert report['chunks_added'] == len(first) > 2
+    assert load_manifest(db)['trained_on'] == len(first)
+
+    report = ingest(bucket, db)
+    assert (report['files_skipped'], report['chunks_skipped']) == (2, len(first))
+    assert report['files_added'] == report['files_modified'] == report['files_removed'] == report['chunks_added'] == 0
+    assert stored_ids(db) == first
+
+    write_day(bucket, 1, seed=1)
+    (bucket / "IT_Tickets_Day_02.pdf").unlink()
+    write_day(bucket, 3)
+    report = ingest(bucket, db)
+    assert (report['files_modified'], report['files_removed'], report['files_added'], report['files_skipped']) == (1, 1, 1, 0)
+    assert report['chunks_removed'] == len(first)
+    second = stored_ids(db)
+    assert report['chunks_added'] == len(second)
+    assert min(second) > max(first)
+    assert load_manifest(db)['trained_on'] == len(first)
+
+    # The IVF index is retrained on everything the first time it reaches RETRAIN_GROWTH times its training set
+    day = 3
+    ids = second
+    while len(ids) < RETRAIN_GROWTH * len(first):
+        day += 1
+        write_day(bucket, day)
+        report = ingest(bucket, db)
+        assert report['files_added'] == 1
+        ids = stored_ids(db)
+        expected = len(ids) if len(ids) >= RETRAIN_GROWTH * len(first) else len(first)
+        assert load_manifest(db)['trained_on'] == expected
+    assert day > 4
+
+def test_unreadable_pdf_keeps_its_previous_chunks(bucket, tmp_path):
+    db = tmp_path / "vector_db"
+    write_day(bucket, 1)
+    ingest(bucket, db)
+    before = stored_ids(db)
+
+    (bucket / "IT_Tickets_Day_01.pdf").write_bytes(b"%PDF-1.4 truncated")
+    report = ingest(bucket, db)
+    assert report['files_failed'] == 1 and report['chunks_removed'] == 0
+    assert stored_ids(db) == before
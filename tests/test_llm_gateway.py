@@ -0,0 +1,111 @@
+import asyncio
+import time
+
+import pytest
+
+from llmGateway import is_transient, FakeBackend, LLMError, LLMGateway
+
+class FlakyBackend:
+    """Raises each error in errors on successive attempts, then answers."""
+
+    def __init__(self, *errors):
+        self.errors = list(errors)
+        self.attempts = 0
+
+    def _attempt(self):
+        self.attempts += 1
+        if self.errors:
+            raise self.errors.pop(0)
+        return "answer"
+
+    def generate(self, system_instruction, prompt, timeout):
+        return self._attempt()
+
+    async def agenerate(self, system_instruction, prompt, timeout):
+        return self._attempt()
+
+    def stream(self, system_instruction, prompt, timeout):
+        yield self._attempt()
+
+def gateway(backend, **kwargs):
+    return LLMGateway(backend, **dict({'timeout': 5, 'max_retries': 2, 'backoff': 0.001}, **kwargs))
+
+@pytest.mark.parametrize("error", [TimeoutError("slow"), ConnectionResetError("reset")])
+def test_transient_errors_are_retried(error):
+    backend = FlakyBackend(error)
+    llm = gateway(backend)
+    assert llm.generate("system", "prompt") == "answer"
+    assert asyncio.run(gateway(FlakyBackend(error)).agenerate("system", "prompt")) == "answer"
+    assert list(gateway(FlakyBackend(error)).stream("system", "prompt")) == ["answer"]
+    assert backend.attempts == 2 and llm.stats['retries'] == 1
+
+@pytest.mark.parametrize("error", [TypeError("backend bug"), ValueError("bad request"), PermissionError("bad key")])
+def test_permanent_errors_fail_at_once(error):
+    for call in (lambda llm: llm.generate("system", "prompt"),
+                 lambda llm: asyncio.run(llm.agenerate("system", "prompt")),
+                 lambda llm: list(llm.stream("system", "prompt"))):
+        backend = FlakyBackend(error)
+        llm = gateway(backend)
+        with pytest.raises(LLMError):
+            call(llm)
+        assert backend.attempts == 1 and llm.stats['retries'] == 0
+
+def test_retries_stop_after_max_retries():
+    backend = FlakyBackend(*[TimeoutError("slow")] * 5)
+    with pytest.raises(LLMError):
+        gateway(backend, max_retries=2).generate("system", "prompt")
+    assert backend.attempts == 3
+
+def test_genai_status_codes():
+    errors = pytest.importorskip("google.genai.errors")
+    assert is_transient(errors.ServerError(503, {}))
+    assert is_transient(errors.ClientError(429, {}))
+    assert not is_transient(errors.ClientError(400, {}))
+    assert not is_transient(errors.ClientError(401, {}))
+
+class TricklingBackend:
+    """Streams a piece every interval seconds, each well within the per-piece timeout."""
+
+    def __init__(self, interval, pieces):
+        self.interval = interval
+        self.pieces = pieces
+
+    def stream(self, system_instruction, prompt, timeout):
+        for i in range(self.pieces):
+            time.sleep(self.interval)
+            yield f"piece {i} "
+
+def test_stream_is_cut_off_at_the_deadline():
+    llm = gateway(TricklingBackend(0.05, 100), timeout=0.3)
+    received = []
+    start = time.monotonic()
+    with pytest.raises(LLMError, match="deadline"):
+        for text in llm.stream("system", "prompt"):
+            received.append(text)
+    assert time.monotonic() - start < 1
+    assert 0 < len(received) < 100
+    assert llm.stats['failures'] == 1 and llm.stats['in_flight'] == 0
+
+class BlockedBackend:
+    """Like Gemini on a blocked prompt: response.text is None and the stream has no text."""
+
+    def generate(self, system_instruction, prompt, timeout):
+        return None
+
+    async def agenerate(self, system_instruction, prompt, timeout):
+        return None
+
+    def stream(self, system_instruction, prompt, timeout):
+        return iter(())
+
+@pytest.mark.parametrize("backend", [BlockedBackend(), FakeBackend(latency=0, answer=""),
+                                     FakeBackend(latency=0, answer="  \n")])
+def test_empty_answer_is_a_failure(backend):
+    llm = gateway(backend)
+    with pytest.raises(LLMError, match="empty"):
+        llm.generate("system", "prompt")
+    with pytest.raises(LLMError, match="empty"):
+        asyncio.run(llm.agenerate("system", "prompt"))
+    with pytest.raises(LLMError, match="empty"):
+        list(llm.stream("system", "prompt"))
+    assert llm.stats['retries'] == 0 and llm.stats['failures'] == 3
@@ -0,0 +1,50 @@
+import pytest
+
+from answerCache import get_answer_cache
+from data_pipeline import metrics
+from llmGateway import get_gateway, FakeBackend
+
+LLM_LATENCY = 0.2
+
+def request_seconds(endpoint):
+    histogram = metrics._histograms.get(('triage_request_seconds', (('endpoint', endpoint),)))
+    return (histogram.count, histogram.sum) if histogram else (0, 0.0)
+
+@pytest.fixture
+def slow_llm(monkeypatch):
+    monkeypatch.setattr(get_gateway(), 'backend', FakeBackend(latency=LLM_LATENCY))
+    get_answer_cache().clear()
+
+@pytest.mark.parametrize("path, body, endpoint", [
+    ('/api/question/stream', {'question': "Why does the VPN drop every hour?"}, 'ask_question_stream'),
+    ('/api/triage/batch', ["Why does the VPN drop every hour?"], 'triage_batch'),
+])
+def test_streamed_latency_covers_the_body(client, slow_llm, path, body, endpoint):
+    count, total = request_seconds(endpoint)
+    response = client.post(path, json=body)
+    assert response.status_code == 200
+    assert request_seconds(endpoint)[0] == count
+    response.get_data()
+    response.close()
+    after_count, after_total = request_seconds(endpoint)
+    assert after_count == count + 1
+    assert after_total - total >= LLM_LATENCY
+
+def test_streamed_trace_ends_with_the_body(client, slow_llm, monkeypatch, capsys):
+    monkeypatch.setattr(metrics, 'DEBUG_PRINTS', True)
+    response = client.post('/api/question/stream', json={'question': "Why does the VPN drop every hour?"},
+                           headers={'X-Trace': '1'})
+    # None of the stages have run by the time the headers are sent
+    assert 'Server-Timing' not in response.headers
+    assert 'event: done' in response.get_data(as_text=True)
+    response.close()
+    assert metrics._trace.get() is None
+    logged = [line for line in capsys.readouterr().out.splitlines() if line.startswith('ask_question_stream stages')]
+    assert len(logged) == 1 and 'llm;dur=' in logged[0] and 'total;dur=' in logged[0]
+
+def test_trace_header_on_a_buffered_response(client):
+    response = client.post('/api/question', json={'question': "Why does the VPN drop every hour?"},
+                           headers={'X-Trace': '1'})
+    assert response.status_code == 200
+    assert 'embed;dur=' in response.headers['Server-Timing']
+    assert metrics._trace.get() is None
@@ -0,0 +1,84 @@
+import shutil
+import subprocess
+import sys
+
+import numpy as np
+import pytest
+
+from benchmarks.load_test import make_questions
+from data_pipeline import embedding, shardedIndex
+from data_pipeline.embedding import load_model, Retriever, INDEX_FILE, VECTOR_DB_DIR
+from data_pipeline.indexFactory import read_index
+from data_pipeline.shardedIndex import build_shards, ShardedSearcher, SHARD_DIR
+
+@pytest.fixture(scope='module')
+def shards(ticket_db):
+    return build_shards(VECTOR_DB_DIR, 2)
+
+def top_k_distances(index, vectors, ranked_ids):
+    """Squared L2 distance of each returned id to its query. The hash embedder ties often, so results
+    are compared by distance: any id in a tied group is an equally correct answer."""
+    return [sorted(float(np.sum((index.reconstruct(int(chunk_id)) - vector) ** 2)) for chunk_id in ids)
+            for vector, ids in zip(vectors, ranked_ids)]
+
+def test_shards_split_tickets_by_day(shards):
+    assert shards['by'] == 'day'
+    assert all(count > 0 for count in shards['counts'])
+
+@pytest.mark.parametrize("filters", [{}, {'system': 'VPN'}, {'days': (2, 5)}])
+def test_sharded_search_matches_single_index(ticket_db, shards, monkeypatch, filters):
+    questions = make_questions(ticket_db, 25)
+    single = Retriever().search_batch_records(questions, 5, mode='vector', **filters)
+
+    monkeypatch.setattr(embedding, 'SHARDING_ENABLED', True)
+    retriever = Retriever()
+    try:
+        sharded = retriever.search_batch_records(questions, 5, mode='vector', **filters)
+        assert isinstance(retriever.index, ShardedSearcher)
+    finally:
+        retriever.close_shards()
+
+    index = read_index(f"{VECTOR_DB_DIR}/{INDEX_FILE}", mmap=False)
+    vectors = np.asarray(load_model(embedding.MODEL).encode(questions), dtype='float32')
+    single_ids = [[record['id'] for record in records] for records in single]
+    sharded_ids = [[record['id'] for record in records] for records in sharded]
+    assert all(len(ids) == 5 for ids in single_ids + sharded_ids)
+    np.testing.assert_allclose(sum(top_k_distances(index, vectors, sharded_ids), []),
+                               sum(top_k_distances(index, vectors, single_ids), []), rtol=1e-5)
+
+@pytest.fixture
+def started(monkeypatch):
+    """Every shard worker process the test starts."""
+    processes = []
+    popen = subprocess.Popen
+
+    def record(*args, **kwargs):
+        process = popen(*args, **kwargs)
+        processes.append(process)
+        return process
+
+    monkeypatch.setattr(shardedIndex.subprocess, 'Popen', record)
+    return processes
+
+def test_worker_that_exits_is_reported(shards, started, monkeypatch):
+    monkeypatch.setattr(sys, 'executable', shutil.which('false'))
+    with pytest.raises(RuntimeError, match="exited"):
+        ShardedSearcher(VECTOR_DB_DIR, start_timeout=10)
+    assert len(started) == 2 and all(process.poll() is not None for process in started)
+
+def test_slow_workers_are_killed_at_the_timeout(shards, started, monkeypatch, tmp_path):
+    sleeper = tmp_path / "sleeper"
+    sleeper.write_text("#!/bin/sh\nexec sleep 60\n")
+    sleeper.chmod(0o755)
+    monkeypatch.setattr(sys, 'executable', str(sleeper))
+    with pytest.raises(RuntimeError, match="not ready"):
+        ShardedSearcher(VECTOR_DB_DIR, start_timeout=0.5)
+    assert len(started) == 2 and all(process.poll() is not None for process in started)
+
+def test_shard_that_fails_to_load_is_reported(shards, started, tmp_path):
+    directory = tmp_path / "vector_db"
+    shutil.copytree(VECTOR_DB_DIR, directory)
+    (directory / SHARD_DIR / "shard_1.index").write_bytes(b"not an index")
+    with pytest.raises(RuntimeError, match="Shard 1 failed to load"):
+        ShardedSearcher(directory, start_timeout=30)
+    assert len(started) == 2 and all(process.poll() is not None for process in started)
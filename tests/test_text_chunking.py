@@ -0,0 +1,59 @@
+# The streaming chunker must produce exactly what split_document, the original
+# whole-text chunker, produces: however the text arrives, with spans that point
+# back at each chunk's words, and through chunk_documents into the chunk store.
+# Timings stay in benchmarks/chunking.py.
+
+import random
+
+import pytest
+
+from benchmarks.chunking import check_spans, random_pieces, synthetic_text
+from data_pipeline.chunkStore import ChunkStore
+from data_pipeline.textChunking import chunk_documents, iter_chunk_spans, split_document
+
+@pytest.mark.parametrize("seed", range(24))
+def test_iter_chunk_spans_matches_split_document(seed):
+    rng = random.Random(seed)
+    text = synthetic_text(rng, rng.choice([100, 3000, 50_000, 300_000]))
+    max_size = rng.choice([80, 500, 2000, 4000])
+    overlap = rng.choice([0, 50, 200])
+    expected = split_document(text.strip(), max_size, overlap)
+
+    for name, pieces in (("lines", text.splitlines(keepends=True)),
+                         ("random pieces", random_pieces(rng, text)),
+                         ("one piece", [text])):
+        spans = list(iter_chunk_spans(pieces, max_size, overlap))
+        assert [chunk for chunk, _, _ in spans] == expected, f"{name}, max {max_size}, overlap {overlap}"
+        assert check_spans(text, spans), f"{name} spans do not cover their chunks"
+
+@pytest.mark.parametrize("seed", range(200))
+def test_texts_near_max_chunk_size(seed):
+    # Short texts are measured only at doubling sizes before the chunker starts; one that ends up
+    # just over the limit must still be split, never yielded whole
+    rng = random.Random(seed)
+    max_size = rng.choice([80, 500])
+    text = synthetic_text(rng, rng.randint(max_size // 2, max_size * 3))
+    cuts = sorted(rng.sample(range(1, len(text)), min(len(text) - 1, rng.randint(1, 12))))
+    pieces = [text[i:j] + " " * rng.randint(0, 3) for i, j in zip([0] + cuts, cuts + [len(text)])]
+    padded = "".join(pieces)
+    spans = list(iter_chunk_spans(pieces, max_size, 0))
+    assert [chunk for chunk, _, _ in spans] == split_document(padded.strip(), max_size, 0)
+    assert check_spans(padded, spans)
+
+def test_chunk_documents_matches_split_document(tmp_path):
+    rng = random.Random(0)
+    documents = [synthetic_text(rng, rng.choice([500, 20_000, 200_000])) for _ in range(5)]
+    input_file = tmp_path / "extracted_text.txt"
+    with open(input_file, 'w', encoding='utf-8') as f:
+        for i, document in enumerate(documents):
+            f.write(f"DOCUMENT: doc_{i}.pdf\n{document}\n")
+
+    chunk_documents(input_file, tmp_path / "chunks", 2000, 200)
+    store = ChunkStore(tmp_path / "chunks")
+    written = {}
+    for record in store.iter_records():
+        written.setdefault(record['source'], []).append(record['text'])
+    store.close()
+
+    for i, document in enumerate(documents):
+        assert written.get(f"doc_{i}.pdf") == split_document(document.strip(), 2000, 200), f"doc_{i}.pdf"
@@ -0,0 +1,56 @@
+import json
+
+import pytest
+
+import app
+
+def results(response):
+    lines = [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+    return lines[:-1], lines[-1]['summary']
+
+def test_json_list(client):
+    response = client.post('/api/triage/batch', json=["VPN client cannot connect", {'id': 'x', 'question': "Printer jam"}])
+    assert response.status_code == 200
+    answered, summary = results(response)
+    assert {result['id'] for result in answered} == {'0', 'x'}
+    assert all(result['answer'] and 'error' not in result for result in answered)
+    assert summary['answered'] == 2 and summary['failed'] == 0
+
+def test_questions_object(client):
+    ticket = {'ticket_id': 'NEW-1', 'system': 'Email', 'issue': "Outlook crashes on start"}
+    response = client.post('/api/triage/batch', json={'questions': ["VPN client cannot connect", ticket]})
+    assert response.status_code == 200
+    answered, summary = results(response)
+    by_id = {result['id']: result for result in answered}
+    assert by_id['NEW-1']['question'] == "Email: Outlook crashes on start"
+    assert summary['items'] == 2
+
+def test_jsonl_body(client):
+    body = '{"id": "a", "question": "VPN client cannot connect"}\n\nPrinter jam\n"Outlook crashes"\n'
+    response = client.post('/api/triage/batch', data=body, content_type='application/x-ndjson')
+    assert response.status_code == 200
+    answered, summary = results(response)
+    assert sorted(result['question'] for result in answered) == ["Outlook crashes", "Printer jam", "VPN client cannot connect"]
+    assert summary['answered'] == 3
+
+@pytest.mark.parametrize("body", [
+    {'questions': 5},
+    {'questions': "abc"},
+    {'question': "not wrapped in a list"},
+    [3],
+    [{'id': 'no question'}],
+    None,
+])
+def test_malformed_json(client, body):
+    response = client.post('/api/triage/batch', data=json.dumps(body), content_type='application/json')
+    assert response.status_code == 400
+    assert 'error' in response.get_json()
+
+def test_malformed_jsonl(client):
+    response = client.post('/api/triage/batch', data='{"id": 1}\n', content_type='text/plain')
+    assert response.status_code == 400
+
+def test_too_many_questions(client, monkeypatch):
+    monkeypatch.setattr(app, 'TRIAGE_MAX_ITEMS', 2)
+    response = client.post('/api/triage/batch', json=["a", "b", "c"])
+    assert response.status_code == 413
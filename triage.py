@@ -0,0 +1,188 @@
+# Bulk triage: suggested resolutions and related tickets for a whole queue of new tickets.
+#
+# python triage.py new_tickets.jsonl suggestions.jsonl --concurrency 8
+#
+# Each input line is a JSON object with a 'question' (or a ticket with 'issue', as in
+# tickets_export.json) and an optional 'id', a JSON string, or plain text. Results are
+# appended to the output as they finish. Re-running with the same output skips
+# questions that already have an answer, so an interrupted run picks up where it
+# stopped and failed questions are retried.
+
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from pathlib import Path
+import argparse
+import json
+import os
+import sys
+import time
+from llm import build_context, extract_ticket_ids, query_llm, ticket_ids_from
+from llmGateway import LLMError
+from data_pipeline import metrics
+from data_pipeline.embedding import get_retriever
+from data_pipeline.reranker import get_reranker, RERANK_CANDIDATES
+
+TRIAGE_CONCURRENCY = int(os.getenv('TRIAGE_CONCURRENCY', '8'))
+TRIAGE_BATCH_SIZE = int(os.getenv('TRIAGE_BATCH_SIZE', '256'))
+TRIAGE_TOP_K = int(os.getenv('TRIAGE_TOP_K', '3'))
+TRIAGE_MAX_ITEMS = int(os.getenv('TRIAGE_MAX_ITEMS', '1000'))
+
+def parse_item(item, position):
+    """(id, question) for one input item: a question string, or an object with 'question' or a ticket's 'issue'."""
+    if isinstance(item, str):
+        return str(position), item
+    if not isinstance(item, dict):
+        raise ValueError(f"Item {position} is not a question or an object")
+    question = item.get('question')
+    if not question and item.get('issue'):
+        question = f"{item['system']}: {item['issue']}" if item.get('system') else item['issue']
+    if not question:
+        raise ValueError(f"Item {position} has no 'question' or 'issue'")
+    item_id = item.get('id', item.get('ticket_id', position))
+    return str(item_id), question
+
+def parse_jsonl(lines):
+    """Items from JSONL lines. Lines that are not JSON are taken as plain question text."""
+    items = []
+    for line in lines:
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            item = json.loads(line)
+        except ValueError:
+            item = line
+        items.append(item if isinstance(item, (str, dict)) else line)
+    return [parse_item(item, position) for position, item in enumerate(items)]
+
+def _answer(item_id, question, records):
+    start = time.perf_counter()
+    try:
+        response = query_llm(question, build_context(records))
+    except LLMError as e:
+        return {'id': item_id, 'question': question, 'error': str(e), 'seconds': time.perf_counter() - start}
+    cleaned_response, cited_ids = extract_ticket_ids(response)
+    return {
+        'id': item_id,
+        'question': question,
+        'answer': cleaned_response,
+        'ticket_ids': ticket_ids_from(records) or cited_ids[:3],
+        'seconds': time.perf_counter() - start,
+    }
+
+def triage(items, top_k=TRIAGE_TOP_K, concurrency=TRIAGE_CONCURRENCY, batch_size=TRIAGE_BATCH_SIZE, stats=None):
+    """Yield a result dict per (id, question) in items, in completion order.
+
+    Questions are retrieved batch_size at a time: one embedding call and one
+    FAISS search per batch, then a cross-encoder re-rank per question when
+    re-ranking is on. LLM calls run on concurrency threads (and still under
+    the gateway's in-flight cap). The next batch is retrieved while the
+    previous one waits on the LLM, with at most about two batches in flight.
+    stats, if given, is filled in with counts and timings as the run goes.
+    """
+    stats = {} if stats is None else stats
+    stats.update({'items': len(items), 'answered': 0, 'failed': 0, 'retrieval_seconds': 0.0, 'seconds': 0.0})
+    start = time.perf_counter()
+    retriever = get_retriever()
+    reranker = get_reranker()
+    depth = max(top_k, RERANK_CANDIDATES) if reranker is not None else top_k
+
+    def finished(futures):
+        for future in futures:
+            result = future.result()
+            stats['failed' if 'error' in result else 'answered'] += 1
+            stats['seconds'] = time.perf_counter() - start
+            yield result
+
+    pool = ThreadPoolExecutor(max_workers=concurrency)
+    pending = set()
+    try:
+        for first in range(0, len(items), batch_size):
+            batch = items[first:first + batch_size]
+            retrieval_start = time.perf_counter()
+            found = retriever.search_batch_records([question for _, question in batch], depth)
+            if reranker is not None:
+                found = [reranker.rerank(question, records) for (_, question), records in zip(batch, found)]
+            stats['retrieval_seconds'] += time.perf_counter() - retrieval_start
+
+            for (item_id, question), records in zip(batch, found):
+                pending.add(pool.submit(_answer, item_id, question, records))
+            while len(pending) > batch_size:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                yield from finished(done)
+
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            yield from finished(done)
+    finally:
+        # Stop queued questions if the consumer goes away (an interrupted CLI run or a closed HTTP stream)
+        for future in pending:
+            future.cancel()
+        pool.shutdown(wait=True)
+        stats['seconds'] = time.perf_counter() - start
+        stats['questions_per_second'] = (stats['answered'] + stats['failed']) / stats['seconds'] if stats['seconds'] else 0.0
+
+def completed_ids(output_path):
+    """Ids already answered in output_path. A partial last line left by an interrupted run is cut off."""
+    path = Path(output_path)
+    if not path.exists():
+        return set()
+    with open(path, 'rb+') as f:
+        data = f.read()
+        end = data.rfind(b'\n') + 1
+        if end < len(data):
+            f.truncate(end)
+    done = set()
+    for line in data[:end].decode('utf-8').splitlines():
+        try:
+            result = json.loads(line)
+        except ValueError:
+            continue
+        if 'error' not in result and 'id' in result:
+            done.add(str(result['id']))
+    return done
+
+def format_report(stats):
+    return (f"{stats['answered']} answered, {stats['failed']} failed, {stats.get('skipped', 0)} already done "
+            f"in {stats['seconds']:.1f}s ({stats.get('questions_per_second', 0.0):.2f} questions/sec, "
+            f"retrieval {stats['retrieval_seconds']:.1f}s)")
+
+def main():
+    parser = argparse.ArgumentParser(description="Suggest resolutions for a queue of tickets")
+    parser.add_argument("input", help="JSONL file of questions or tickets, or - for stdin")
+    parser.add_argument("output", help="JSONL file results are appended to")
+    parser.add_argument("--concurrency", type=int, default=TRIAGE_CONCURRENCY)
+    parser.add_argument("--batch-size", type=int, default=TRIAGE_BATCH_SIZE)
+    parser.add_argument("--top-k", type=int, default=TRIAGE_TOP_K)
+    parser.add_argument("--verbose", action="store_true", help="Keep the per-question debug prints")
+    args = parser.parse_args()
+
+    if not args.verbose:
+        metrics.DEBUG_PRINTS = False
+
+    if args.input == '-':
+        items = parse_jsonl(sys.stdin)
+    else:
+        with open(args.input, 'r', encoding='utf-8') as f:
+            items = parse_jsonl(f)
+
+    done = completed_ids(args.output)
+    todo = [(item_id, question) for item_id, question in items if item_id not in done]
+    print(f"{len(items)} questions, {len(items) - len(todo)} already answered in {args.output}")
+    if not get_retriever().warm():
+        raise SystemExit("No index found. Run option 1 in main.py first.")
+
+    stats = {}
+    with open(args.output, 'a', encoding='utf-8') as out:
+        try:
+            for count, result in enumerate(triage(todo, args.top_k, args.concurrency, args.batch_size, stats), 1):
+                out.write(json.dumps(result, ensure_ascii=False) + "\n")
+                out.flush()
+                if count % 50 == 0:
+                    print(f"{count}/{len(todo)} done ({count / stats['seconds']:.2f} questions/sec)")
+        except KeyboardInterrupt:
+            print("Interrupted, re-run the same command to resume")
+    stats['skipped'] = len(items) - len(todo)
+    print(format_report(stats))
+
+if __name__ == '__main__':
+    main()
@@ -25,7 +25,9 @@ function handleSubmit() {
     responseContent.innerHTML = '<div class="loading">Analyzing your question</div>';
     ticketList.innerHTML = '';
 
-    fetch('/api/question', {
+    let streamedAnswer = '';
+
+    fetch('/api/question/stream', {
         method: 'POST',
         headers: {
             'Content-Type': 'application/json',
@@ -35,17 +37,26 @@ function handleSubmit() {
         })
     })
     .then(response => {
-        if (!response.ok) {
+        if (!response.ok || !response.body) {
             throw new Error('Network response was not ok');
         }
-        return response.json();
+        return readEventStream(response.body, (event, data) => {
+            if (event === 'tickets') {
+                displayTickets(data.tickets || []);
+            } else if (event === 'token') {
+                streamedAnswer += data.text;
+                responseContent.innerHTML = formatAnswer(streamedAnswer);
+            } else if (event === 'done') {
+                displayResponse({
+                    answer: data.answer,
+                    tickets: data.tickets || []
+                });
+            } else if (event === 'error') {
+                throw new Error(data.error);
+            }
+        });
     })
-    .then(data => {
-        const responseData = {
-            answer: data.answer,
-            tickets: data.tickets || []
-        };
-        displayResponse(responseData);
+    .then(() => {
         submitBtn.disabled = false;
         submitBtn.textContent = 'Submit';
     })
@@ -57,16 +68,49 @@ function handleSubmit() {
     });
 }
 
-function displayResponse(data) {
-    let answer = data.answer;
-    let tickets = data.tickets || [];
+async function readEventStream(body, onEvent) {
+    const reader = body.getReader();
+    const decoder = new TextDecoder();
+    let buffer = '';
+
+    while (true) {
+        const { value, done } = await reader.read();
+        if (done) {
+            break;
+        }
+        buffer += decoder.decode(value, { stream: true });
+
+        let boundary;
+        while ((boundary = buffer.indexOf('\n\n')) !== -1) {
+            const message = buffer.slice(0, boundary);
+            buffer = buffer.slice(boundary + 2);
+
+            let event = 'message';
+            let data = '';
+            for (const line of message.split('\n')) {
+                if (line.startsWith('event: ')) {
+                    event = line.slice(7);
+                } else if (line.startsWith('data: ')) {
+                    data += line.slice(6);
+                }
+            }
+            onEvent(event, data ? JSON.parse(data) : {});
+        }
+    }
+}
 
+function formatAnswer(answer) {
     answer = answer.replace(/\*\*(.*?)\*\*/g, '<strong>$1</strong>');
 
-    answer = answer.replace(/\n/g, '<br>');
+    return answer.replace(/\n/g, '<br>');
+}
 
-    responseContent.innerHTML = answer;
+function displayResponse(data) {
+    responseContent.innerHTML = formatAnswer(data.answer);
+    displayTickets(data.tickets || []);
+}
 
+function displayTickets(tickets) {
     if (tickets && tickets.length > 0) {
         ticketList.innerHTML = tickets.map(ticket => `
             <li class="ticket-item">